@@ -2,18 +2,38 @@
 #
 # 25 Feb 2025
 
-#from eink.utils import swap_pixel_order_1, swap_pixel_order_2
 import framebuf
 from struct import unpack
+from array import array
+from micropython import const
+from time import ticks_us, ticks_diff
+from img.utils import swap_pixel_order_2
+from img.sprites import sprites
+
+# Default pallet: black, red, white
+_DEFAULT_PAL = (1,2,0)
+
+# How many measure() results to remember
+_MEASURE_MEMO = const(32)
+
+# Head flags (byte 0x0C)
+# Fonts without this flag have their leftmost pixel in the most significant bits,
+# which is the opposite way round to the framebuffer formats we draw onto
+_FLAG_LSB_FIRST = const(0x01)
 
 class Font:
   
-  def __init__(self,f):
+  # f: Path to the .2f file
+  # budget: Optional glyph cache size, in bytes.  If given, the font is paged:
+  #         only the index and width table stay resident, and glyphs are read
+  #         from the (kept open) file on demand, into an LRU cache of this size.
+  def __init__(self,f,budget=None):
     
-    with open(f,'rb') as fd:
+    fd = open(f,'rb')
+    try:
       
       # Get the initial params
-      head = unpack( '>8B2H', fd.read(12) )
+      head = unpack( '>8B2HB', fd.read(13) )
       
       '''
       0x00 1   Format version (must be 1)
@@ -26,7 +46,8 @@ class Font:
       0x07 1   Index length
       0x08 2   Pointer to start of image data
       0x0A 2   Pointer to optional table of individual glyph widths.  If zero, assume monospace
-      0C   4   Reserved
+      0C   1   Flags
+      0D   3   Reserved
       10   x   Glyph Index Table
       '''
       
@@ -55,13 +76,32 @@ class Font:
         assert len( self.vw ) == head[3]
       else: # Constant width
         self.vw = None
+      
+      # Glyph width for each character code (from ASCII 32), so measuring text doesn't need the index
+      # Codes outside the index are drawn as index[0], so use its width
+      self.cw = bytearray( head[7] )
+      for i in range( head[7] ):
+        self.cw[i] = head[5] if self.vw is None else self.vw[ self.index[i] ]
+      self.mw = {} # Remembered measure() results
     
-      # Get the image
-      ilen = self.stride * self.ng
-      self.glyphs = bytearray( ilen )
-      fd.seek( head[8], 0 )
-      assert ilen == fd.readinto( self.glyphs )
-      del ilen
+      # Paged: remember where the image is, and keep the file for later
+      if budget is not None:
+        self.sheet = head[8]
+        self.fd = fd
+        fd = None
+      
+      # Otherwise get the whole image now
+      else:
+        ilen = self.stride * self.ng
+        self.glyphs = bytearray( ilen )
+        fd.seek( head[8], 0 )
+        assert ilen == fd.readinto( self.glyphs )
+        del ilen
+        self.fd = None
+    
+    finally:
+      if fd is not None:
+        fd.close()
     
     # Set up the pallette - needed for blitting
     # Pallet format must match destination format, but width is related to source by w=2**bpp
@@ -71,75 +111,266 @@ class Font:
     
     # Set up bpp-specific stuff
     if self.bpp == 1:
-      #swap_pixel_order_1(self.glyphs)
-      self.f = framebuf.MONO_HMSB
+      # MONO_HLSB matches MSB-first data as-is
+      self.f = framebuf.MONO_HMSB if head[10] & _FLAG_LSB_FIRST else framebuf.MONO_HLSB
+      self.swap = False
     elif self.bpp == 2:
-      #swap_pixel_order_2(self.glyphs)
+      # There's no GS2_HLSB, so MSB-first data gets swapped as it's loaded
       self.f = framebuf.GS2_HMSB
+      self.swap = not head[10] & _FLAG_LSB_FIRST
+      if self.swap and self.fd is None:
+        swap_pixel_order_2(self.glyphs)
     else:
       raise NotImplementedError('bpp more than 2 is not supported')
     
-    # Set up the framebuffer object
-    self.fb = framebuf.FrameBuffer( self.glyphs, head[1], head[2]*head[3], self.f )
+    # Cache statistics (paged fonts only)
+    self.hits = 0
+    self.misses = 0
+    
+    if self.fd is None:
+      
+      # Set up the framebuffer object
+      self.fb = framebuf.FrameBuffer( self.glyphs, head[1], head[2]*head[3], self.f )
+      
+      # Per-glyph framebuffers, each a window onto the glyph sheet (no copying)
+      # Built the first time each glyph is drawn, then kept
+      self.gfbs = [None] * self.ng
+    
+    else:
+      
+      # No resident sheet
+      self.fb = None
+      self.gfbs = None
+      
+      # Fixed number of cache slots, each holding one glyph, with a framebuffer over it
+      # All glyphs are the same size, so a slot can be reused for any glyph without allocating
+      s = self.stride
+      n = min( max( 1, budget // s ), self.ng )
+      self.glyphs = bytearray( s * n )
+      mv = memoryview( self.glyphs )
+      self.slot_mv = [ mv[ s*i : s*(i+1) ] for i in range(n) ]
+      self.slot_fb = [ framebuf.FrameBuffer( m, self.fbw, self.height, self.f ) for m in self.slot_mv ]
+      self.slot_ci = [-1] * n # Glyph in each slot
+      self.slot_t = [0] * n   # When each slot was last used
+      self.ci_slot = bytearray( b'\xff' * self.ng ) # Slot holding each glyph (0xff = not cached)
+      self.t = 0
+      del mv
+  
+  # Framebuffer for glyph number ci, viewing its slice of the sheet
+  def glyph_fb( self, ci ):
+    
+    # Paged font: look in the cache
+    if self.gfbs is None:
+      return self._paged_fb( ci )
+    
+    gfb = self.gfbs[ci]
+    if gfb is None:
+      s = self.stride
+      gfb = framebuf.FrameBuffer( memoryview( self.glyphs )[ s*ci : s*(ci+1) ], self.fbw, self.height, self.f )
+      self.gfbs[ci] = gfb
+    return gfb
+  
+  # Paged font: get glyph ci from the cache, reading it from file if needed
+  def _paged_fb( self, ci ):
+    self.t += 1
+    
+    # Hit
+    slot = self.ci_slot[ci]
+    if slot != 0xff:
+      self.hits += 1
+      self.slot_t[slot] = self.t
+      return self.slot_fb[slot]
+    
+    # Miss: evict the least recently used slot
+    self.misses += 1
+    slot_t = self.slot_t
+    slot = 0
+    for i in range( 1, len(slot_t) ):
+      if slot_t[i] < slot_t[slot]:
+        slot = i
+    old = self.slot_ci[slot]
+    if old >= 0:
+      self.ci_slot[old] = 0xff
+    
+    # Read in the glyph
+    self.fd.seek( self.sheet + self.stride * ci, 0 )
+    if self.fd.readinto( self.slot_mv[slot] ) != self.stride:
+      raise RuntimeError('Font file was shorter than expected!')
+    
+    # Swap the pixel order if needed
+    # Plain Python, because viper can't be trusted with a memoryview slice
+    if self.swap:
+      g = self.glyphs
+      for i in range( self.stride * slot, self.stride * (slot+1) ):
+        b = g[i]
+        g[i] = (b>>6) | ((b>>2)&12) | ((b<<2)&48) | ((b<<6)&192)
+    
+    self.slot_ci[slot] = ci
+    self.ci_slot[ci] = slot
+    slot_t[slot] = self.t
+    return self.slot_fb[slot]
+  
+  # Cache hit rate report, eg. 'Vermin.2f: 40 hits, 8 misses (83%), 8/37 glyphs in 224 bytes'
+  # Resets the counters
+  def cache_report( self, name='font' ):
+    n = self.hits + self.misses
+    if self.gfbs is None:
+      cached = f'{len(self.slot_fb)}/{self.ng} glyphs in {len(self.glyphs)} bytes'
+    else:
+      cached = f'resident, {len(self.glyphs)} bytes'
+    r = f'{name}: {self.hits} hits, {self.misses} misses ({ 100*self.hits//n if n else 0 }%), {cached}'
+    self.hits = 0
+    self.misses = 0
+    return r
+  
+  # Width of the given text, in px, as write_to() would draw it
+  # Multi-line text gives the width of the longest line
+  # Results for the default spacing are remembered, so repeat calls are O(1)
+  def measure( self, txt, cspacing=1 ) -> int:
+    if cspacing == 1:
+      w = self.mw.get( txt )
+      if w is not None:
+        return w
+    
+    gw = self.gw
+    cw = self.cw
+    n = len(cw)
+    w = 0
+    lw = 0
+    for i in range(len(txt)):
+      char = txt[i]
+      if type(char) is not int:
+        char = ord(char)
+      if char == 10:
+        w = max( w, lw )
+        lw = 0
+      elif char == 32:
+        lw += gw
+      else:
+        char -= 32
+        lw += ( cw[char] if 0 <= char < n else cw[0] ) + cspacing
+    w = max( w, lw )
+    
+    if cspacing == 1:
+      if len( self.mw ) >= _MEASURE_MEMO:
+        self.mw.clear()
+      self.mw[txt] = w
+    return w
+  
+  # Cumulative widths of single-line text: prefix(txt)[i] is the width of txt[:i]
+  # Worth keeping for fixed strings that get fitted repeatedly
+  def prefix( self, txt, cspacing=1 ):
+    gw = self.gw
+    cw = self.cw
+    n = len(cw)
+    pw = array( 'H', bytes( 2 * ( len(txt)+1 ) ) )
+    w = 0
+    for i in range(len(txt)):
+      char = txt[i]
+      if type(char) is not int:
+        char = ord(char)
+      if char == 32:
+        w += gw
+      else:
+        char -= 32
+        w += ( cw[char] if 0 <= char < n else cw[0] ) + cspacing
+      pw[i+1] = w
+    return pw
+  
+  # Longest start of the (single-line) text that fits in max_px
+  # prefix: Optional result of prefix(txt), to avoid measuring again
+  def fit( self, txt, max_px:int, cspacing=1, prefix=None ):
+    if prefix is None:
+      if self.measure( txt, cspacing ) <= max_px:
+        return txt
+      prefix = self.prefix( txt, cspacing )
+    
+    # Binary search for the longest start that fits
+    lo = 0
+    hi = len(txt)
+    while lo < hi:
+      mid = ( lo + hi + 1 ) // 2
+      if prefix[mid] <= max_px:
+        lo = mid
+      else:
+        hi = mid - 1
+    return txt if lo == len(txt) else txt[:lo]
+  
+  # Close the file (paged fonts only).  The font can't be used afterwards.
+  def close( self ):
+    if self.fd is not None:
+      self.fd.close()
+      self.fd = None
   
   # fb: The framebugf instance to write to
-  # txt: The string to write
+  # txt: The string to write (str, or ASCII bytes)
   # x, y: Starting position.  y is text baseline, not top-left
   # p: Optional pallet tuple: (main, fill, hilight)
   # cspacing: Character spacing, in px
   # lspacing: Line spacing, in px
-  def write_to( self, fb, txt, x, y, p=None, cspacing=1, lspacing=1 ):
+  # cache: Draw via the sprite cache (see img.sprites)
+  def write_to( self, fb, txt, x, y, p=None, cspacing=1, lspacing=1, cache=True ):
     
     # Default pallette
     if p is None:
-      p = (1,2,0) # Black, red, white
+      p = _DEFAULT_PAL
+    
+    # Sprites are only keyed on font, text and pallet, so only cache the default spacing
+    # Colour 3 is the sprites' transparent colour, so text using it can't be cached either
+    if cache and cspacing == 1 and lspacing == 1 and 3 not in p:
+      
+      # Cached already?
+      top = y - self.blh
+      if sprites.blit( fb, x, top, self, txt, p ):
+        return
+      
+      # Render into a new sprite.  Glyphs can overhang their advance width by up to the sheet width.
+      nl = 1 + ( txt.count('\n') if type(txt) is str else txt.count(b'\n') )
+      s = sprites.new( self.measure( txt ) + self.fbw, nl * (self.height+1) - 1 )
+      if s is not None:
+        t = ticks_us()
+        self._draw( s[0], txt, 0, self.blh, p, 1, 1 )
+        sprites.add( fb, x, top, self, txt, p, s, ticks_diff( ticks_us(), t ) )
+        return
+    
+    self._draw( fb, txt, x, y, p, cspacing, lspacing )
+  
+  # Draws text directly, glyph by glyph.  See write_to()
+  def _draw( self, fb, txt, x, y, p, cspacing, lspacing ):
+    
+    # Nothing in here should allocate, once each glyph has been drawn once
     
     # Gather params
-    g = self.glyphs
     h = self.height
     gw = self.gw
     vw = self.vw
     bpp = self.bpp
-    fbw = self.fbw
-    f = self.f
     index = self.index
-    s = self.stride
+    gfbs = self.gfbs # None if paged
     
     # Pallette validation
     # TODO: validate the contents of the pallet tuple?
+    # Create the pallette
+    # 3 is always at the zero position, for transparency
     if bpp == 1:
       assert len(p) >= 1
-      # Zeroes are filler: they won't get used, the code just needs 3 elements
-      p = ( p[0], 0, 0 )
+      self.pal[0] = 3 | (p[0]<<2)
     elif bpp == 2:
       assert len(p) >= 3
+      self.pal[0] = 3 | (p[0]<<2) | (p[1]<<4) | (p[2]<<6)
+    palfb = self.palfb
     
     # Adjust top-left corner to be above the baseline
     y -= self.blh
     
-    # w() : Glyph width
-    if vw is None:
-      # Constant width
-      w = lambda ci : gw
-    else:
-      # Lookup table
-      w = lambda ci : vw[ ci ]
-    
-    # Create the pallette
-    # 3 is always at the zero position, for transparency
-    self.pal[0] = 3 | (p[0]<<2) | (p[1]<<4) | (p[2]<<6)
-    palfb = self.palfb
-    
-    # Set up temporary fb
-    glyph = bytearray( s )
-    glyph_fb = framebuf.FrameBuffer( glyph, fbw, h, f )
-    
     # Step through the string
     cx = x
     for i in range(len(txt)):
       
       # Get the char
-      char = ord(txt[i])
+      char = txt[i]
+      if type(char) is not int:
+        char = ord(char)
       
       # If this is a space (ascii 32)
       if char == 32:
@@ -156,17 +387,23 @@ class Font:
       char -= 32
       
       # Check we have this value in the index
-      if char >= len(index):
+      if not 0 <= char < len(index):
         char = 0
       
       # Get the index position
       ci = index[char]
       
-      # Extract the glyph from the full image
-      glyph[:] = g[ s*ci : s*(ci+1) ]
-      
-      # Blit the glyph
-      fb.blit( glyph_fb, cx, y, 3, palfb )
+      # Blit the glyph, straight from the sheet (or glyph cache)
+      if gfbs is None:
+        gfb = self._paged_fb( ci )
+      else:
+        gfb = gfbs[ci]
+        if gfb is None:
+          gfb = self.glyph_fb( ci )
+      fb.blit( gfb, cx, y, 3, palfb )
       
       # Increment current x
-      cx += w( ci ) + cspacing
+      if vw is None:
+        cx += gw + cspacing # Constant width
+      else:
+        cx += vw[ ci ] + cspacing # Lookup table
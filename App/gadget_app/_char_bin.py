@@ -0,0 +1,281 @@
+# Binary savefile (stats.bin) for character.py
+# Consider as part of character.py
+#
+# A struct-packed copy of Character.data and Character.levels, written
+# alongside stats.json whenever the character is saved (or on a PC, by
+# Tooling/savecheck.py --bin).  Loading it avoids building a JSON tree and
+# re-validating every field at boot.
+#
+# stats.json stays the master copy: it's what gets edited on a PC.  So the
+# sidecar is only used if it's at least as new as the JSON, and the JSON is
+# still the size it was when the sidecar was written (PC clocks can't be
+# trusted to move file times forwards).  The sidecar is also checked against
+# its CRC.  Anything wrong with it and the JSON gets loaded instead.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+from micropython import const
+from os import stat
+from array import array
+from struct import pack, pack_into, unpack_from, calcsize
+from binascii import crc32
+
+# Head format
+# 00 4s Magic
+# 04 1b Version
+# 05 1b Reserved
+# 06 2b Body length
+# 08 4b CRC32 of body
+# 0C 4b Size of stats.json when this was written
+# 10 BODY
+#
+# Body format
+# Strings are a 1b length, then UTF-8
+#   str   Name
+#   I     XP
+#   5H    Currency (copper, silver, electrum, gold, platinum)
+#   3B    Death (status, successes, failures)
+#   B     Current level index
+#   B     Number of levels, then for each:
+#     str   Name
+#     B     0 if the level has been loaded, then:
+#       4H    HP (current, max, temporary, original temporary)
+#       2B    Hit dice (current, max)
+#       B     Number of spell levels, then that many current values, then that many max values
+#       B     Number of items, then for each:
+#         2I    Current, max
+#         B     Reset bitfield
+#         str   Name
+#     Or 1 if it hasn't been needed yet (see Character._level()), then:
+#       H     Length, then the level's JSON, as it was in stats.json
+_HEAD = const('>4sBxHII')
+_HEAD_SIZE = const(16)
+_MAGIC = const(b'TTsb')
+_VERSION = const(2)
+
+# Indexes into the Character.data object
+_XP = const(2)
+_CURRENCY = const(3)
+_DEATH = const(8)
+
+# Index into the Levels tuples
+# ( name, hp, hd, spells, items )
+_LV_NAME = const(0)
+_LV_HP = const(1)
+_LV_HD = const(2)
+_LV_SPELLS = const(3)
+_LV_ITEMS = const(4)
+#
+# Levels that haven't been loaded yet are ( name, JSON bytes )
+_LV_RAW = const(1)
+#
+_SPELLS_CURR = const(0)
+_SPELLS_MAX = const(1)
+#
+# Items are a tuple of ( current array I, max array I, reset bytearray, names separated by newlines )
+_ITEMS_CURR = const(0)
+_ITEMS_MAX = const(1)
+_ITEMS_RESET = const(2)
+_ITEMS_NAME = const(3)
+
+# Append a length-prefixed string
+def _pstr( b:bytearray, s:str ):
+  s = s.encode()
+  b.append( len(s) )
+  b.extend( s )
+
+# Builds the complete file contents
+# jsize: Size of stats.json, bytes
+def dumps( jsize:int, name:str, data:list, levels:list, current_level:int ) -> bytearray:
+  b = bytearray( _HEAD_SIZE ) # Head gets filled in at the end
+  _pack( b, name, data, levels, current_level )
+  body = memoryview(b)[_HEAD_SIZE:]
+  pack_into( _HEAD, b, 0, _MAGIC, _VERSION, len(body), crc32(body), jsize )
+  return b
+
+# CRC of everything that gets saved, whatever the savefile format
+# If it's the same as at the last save, there's nothing new to save
+def digest( name:str, data:list, levels:list, current_level:int ) -> int:
+  b = bytearray()
+  _pack( b, name, data, levels, current_level )
+  return crc32( b )
+
+# Append the body to b
+def _pack( b:bytearray, name:str, data:list, levels:list, current_level:int ):
+  
+  _pstr( b, name )
+  b.extend( pack( '>I', data[_XP] ) )
+  b.extend( pack( '>5H', *data[_CURRENCY] ) )
+  b.extend( data[_DEATH] )
+  b.append( current_level )
+  b.append( len(levels) )
+  
+  for lv in levels:
+    _pstr( b, lv[_LV_NAME] )
+    
+    # Not loaded: keep it as it is
+    raw = lv[_LV_RAW]
+    if type(raw) is bytes:
+      if len(raw) > 0xffff:
+        raise ValueError('Level too big')
+      b.append( 1 )
+      b.extend( pack( '>H', len(raw) ) )
+      b.extend( raw )
+      continue
+    
+    b.append( 0 )
+    b.extend( pack( '>4H', *lv[_LV_HP] ) )
+    b.extend( lv[_LV_HD] )
+    b.append( len(lv[_LV_SPELLS][_SPELLS_CURR]) )
+    b.extend( lv[_LV_SPELLS][_SPELLS_CURR] )
+    b.extend( lv[_LV_SPELLS][_SPELLS_MAX] )
+    it = lv[_LV_ITEMS]
+    n = len(it[_ITEMS_CURR])
+    b.append( n )
+    if n:
+      for cur, mx, rst, nm in zip( it[_ITEMS_CURR], it[_ITEMS_MAX], it[_ITEMS_RESET], it[_ITEMS_NAME].split('\n') ):
+        b.extend( pack( '>2IB', cur, mx, rst ) )
+        _pstr( b, nm )
+
+# Write the sidecar, for the just-saved stats.json at jf.  Returns the number of bytes written, or 0 on failure.
+def save( f:str, jf:str, name:str, data:list, levels:list, current_level:int ) -> int:
+  try:
+    b = dumps( stat(jf)[6], name, data, levels, current_level )
+    with open( f, 'wb' ) as fd:
+      fd.write( b )
+  except ( OSError, ValueError, OverflowError ) as e:
+    print(f'Binary save failed: {e}')
+    return 0
+  return len(b)
+
+# Read a length-prefixed string at o.  Returns ( string, next offset ).
+def _ustr( raw, o:int ):
+  n = raw[o]
+  o += 1
+  return str( raw[o:o+n], 'utf-8' ), o+n
+
+# Read the sidecar, and check its head and CRC
+# jsize: Current size of stats.json, bytes
+# Returns the whole file
+# Raises ValueError if the file is damaged, out of date, or isn't one we understand.  OSError if it can't be read.
+def _read( f:str, jsize:int ) -> bytes:
+  
+  with open( f, 'rb' ) as fd:
+    raw = fd.read()
+  
+  # Check the head
+  if len(raw) < _HEAD_SIZE:
+    raise ValueError('Truncated')
+  magic, ver, blen, crc, js = unpack_from( _HEAD, raw, 0 )
+  if magic != _MAGIC:
+    raise ValueError('Not a binary savefile')
+  if ver != _VERSION:
+    raise ValueError('Unsupported version')
+  if len(raw) != _HEAD_SIZE + blen:
+    raise ValueError('Truncated')
+  if crc32( memoryview(raw)[_HEAD_SIZE:] ) != crc:
+    raise ValueError('Bad CRC')
+  if js != jsize:
+    raise ValueError('stats.json has changed')
+  
+  return raw
+
+# Load the sidecar
+# jsize: Current size of stats.json, bytes
+# Returns ( name, xp, currency, death, current level index, levels ), in the same types Character uses
+# Raises ValueError if the file is damaged, out of date, or isn't one we understand.  OSError if it can't be read.
+def load( f:str, jsize:int ):
+  
+  raw = _read( f, jsize )
+  
+  # The CRC passed, and both writers validate first: the device when it loaded the JSON, and savecheck.py, which only writes a savefile with no errors
+  # IndexError/struct errors now mean a bug rather than a bad file, but report them the same way
+  try:
+    
+    name, o = _ustr( raw, _HEAD_SIZE )
+    v = unpack_from( '>I5H3BBB', raw, o )
+    o += calcsize( '>I5H3BBB' )
+    xp = v[0]
+    currency = array( 'H', v[1:6] )
+    death = bytearray( v[6:9] )
+    lvi = v[9]
+    
+    levels = [None] * v[10]
+    for i in range( v[10] ):
+      lvname, o = _ustr( raw, o )
+      
+      # Not loaded yet
+      if raw[o]:
+        n = unpack_from( '>H', raw, o+1 )[0]
+        o += 3
+        levels[i] = ( lvname, bytes( raw[o:o+n] ) )
+        o += n
+        continue
+      
+      o += 1
+      v = unpack_from( '>4H2BB', raw, o )
+      o += 11
+      ns = v[6]
+      sp_curr = bytearray( raw[o:o+ns] )
+      sp_max = bytearray( raw[o+ns:o+ns+ns] )
+      o += ns + ns
+      
+      n = raw[o]
+      o += 1
+      it_curr = array( 'I', range(n) ) # Values get overwritten
+      it_max = array( 'I', range(n) )
+      it_rst = bytearray( n )
+      names = [None] * n
+      for j in range( n ):
+        it_curr[j], it_max[j], it_rst[j] = unpack_from( '>2IB', raw, o )
+        names[j], o = _ustr( raw, o+9 )
+      
+      levels[i] = (
+        lvname,
+        array( 'H', v[0:4] ),
+        bytearray( v[4:6] ),
+        ( sp_curr, sp_max ),
+        ( it_curr, it_max, it_rst, '\n'.join( names ) ),
+      )
+  
+  except ( IndexError, ValueError ) as e:
+    raise ValueError(f'Bad contents: {e}')
+  
+  if o != len(raw) or not 0 <= lvi < len(levels):
+    raise ValueError('Bad contents')
+  
+  return name, xp, currency, death, lvi, levels
+
+# Just the name and the current level's name, for the select screen
+# Steps over everything else without unpacking it
+# Returns ( name, title ).  Raises as load() does.
+def summary( f:str, jsize:int ) -> tuple[str,str]:
+  
+  raw = _read( f, jsize )
+  
+  try:
+    name, o = _ustr( raw, _HEAD_SIZE )
+    lvi = raw[o+17]
+    o += 19 # XP, currency, death, current level index, number of levels
+    
+    # Skip to the current level
+    for _ in range( lvi ):
+      o += raw[o] + 1      # Name
+      if raw[o]:           # Not loaded: JSON
+        o += 3 + unpack_from( '>H', raw, o+1 )[0]
+        continue
+      o += 1 + 10          # HP, hit dice
+      o += raw[o] * 2 + 1  # Spells
+      n = raw[o]
+      o += 1
+      for _ in range( n ):
+        o += 9               # Item current, max, reset
+        o += raw[o] + 1      # Item name
+    
+    title, o = _ustr( raw, o )
+  
+  except IndexError as e:
+    raise ValueError(f'Bad contents: {e}')
+  
+  return name, title
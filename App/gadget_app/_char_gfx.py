@@ -12,12 +12,20 @@ from framebuf import FrameBuffer, MONO_HLSB, GS2_HMSB
 
 # Our libraries
 import img
+from font import Font
 from .common import CHAR_HEAD, CHAR_BG
 
 # ASSETS
 _IMG_SKULL    = const('/assets/skull.pi')
 _IMG_LOWBATT  = const('/assets/low_batt.2ink')
 
+# Fonts for the play screen titles
+# Paged, so only a few glyphs are in RAM at a time
+_FONT_NAME   = const('/assets/Gallaecia_variable.2f')
+_FONT_TITLE  = const('/assets/Vermin.2f')
+_FONT_BUDGET = const(256) # Glyph cache size per font, bytes
+_DEBUG_FONT_CACHE = const(False) # Print the title fonts' glyph cache hit rates on each redraw
+
 
 # Universal constants
 # MP-1.24.1 seems to round floats to 7 d.p.
@@ -111,7 +119,7 @@ _HP_ORIGTEMP = const(3)
 _SPELLS_CURR = const(0)
 #_SPELLS_MAX = const(1)
 #
-#_CHARGES_CURR = const(0)
+_ITEMS_CURR = const(0)
 #_CHARGES_MAX = const(1)
 #_CHARGES_RESET = const(2)
 _ITEMS_NAME = const(3)
@@ -407,18 +415,33 @@ def tick(fb, angle,c=1,direction=0):
   return tp
 
 # Adds a label, centred in x and y on a point
-def tick_txt(fb, txt, pt, c ):
-  
-  # This function assumes all characters are 8x8
+def tick_txt(fb, txt, pt, c, font=img.sysfont ):
   
   # Draw the text so that the centre of it ends up on the point
   fb.label(
     txt,
-    pt[0] - round( len(txt)*8 /2 ),
-    pt[1] - 4, # 8/2
-    c
+    pt[0] - font.measure(txt)//2,
+    pt[1] - font.height//2,
+    c,
+    font=font
   )
 
+# Title fonts, opened on first use: ( name font, title font )
+# Either can be the builtin font (img.sysfont), if the font file couldn't be opened
+_fonts = None
+def _title_fonts():
+  global _fonts
+  if _fonts is None:
+    _fonts = ( _open_font( _FONT_NAME ), _open_font( _FONT_TITLE ) )
+  return _fonts
+
+def _open_font( path ):
+  try:
+    return Font( path, _FONT_BUDGET )
+  except (OSError, NotImplementedError) as e:
+    print(f'Font {path} unavailable: {e}')
+    return img.sysfont
+
 # Draws the play screen to the given framebuffer
 # Expects 360x240 2bpp framebuffer
 # Needs the Character object
@@ -428,13 +451,13 @@ def draw_play_screen( fb, char, lowbatt=False, scratchmem=None ):
   # Localisation
   data = char.data
   hp = data[_HP]
-  head = char.dir / CHAR_HEAD
+  head = str( char.dir / CHAR_HEAD )
   
   # Character-specific background
-  bg = char.dir / CHAR_BG
-  if bg.is_file():
+  bg = str( char.dir / CHAR_BG )
+  if img.exists( bg ):
     try:
-      img.load_into( fb.buf, str(bg) )
+      img.load_into( fb.buf, bg )
     except (RuntimeError, NotImplementedError) as e:
       fb.fill(0)
   else:
@@ -445,11 +468,11 @@ def draw_play_screen( fb, char, lowbatt=False, scratchmem=None ):
     chs2 = _CHAR_HEAD_SIZE//2
     img.blit_onto( fb, _X-chs2, _HEAD_MIDPOINT_Y-chs2, _IMG_LOWBATT )
   else:
-    headok = head.is_file()
+    headok = img.exists( head )
     if headok:
       try:
         chs2 = _CHAR_HEAD_SIZE//2
-        img.blit_onto( fb, _X-chs2, _HEAD_MIDPOINT_Y-chs2, str( head ) )
+        img.blit_onto( fb, _X-chs2, _HEAD_MIDPOINT_Y-chs2, head )
       except (RuntimeError, NotImplementedError) as e:
         headok = False
     if not headok:
@@ -458,13 +481,21 @@ def draw_play_screen( fb, char, lowbatt=False, scratchmem=None ):
   
   ######## TITLES ########
   
-  #f = eink.Font('/assets/Gallaecia_variable.2f')
-  #f.write_to( fb, 'BONK', *XY, (1,) )
-  #f = eink.Font('/assets/Vermin.2f')
-  #f.write_to( fb, 'L3 Artificer', XY[0], XY[1]+14, (2,) )
-  fb.label( char.name, _X - (chs2+(len(char.name) * 8)+5), _TIT_MIDPOINT_Y-4, 1 )
+  nf, tf = _title_fonts()
+  
+  # Name, to the left of the head
+  fb.label( char.name, _X - (chs2+nf.measure( char.name )+5), _TIT_MIDPOINT_Y - nf.height//2, 1, font=nf )
+  
+  # Title, to the right
   if len( char.get_title() ) > 0:
-    fb.label( char.get_title(), _X + chs2 + 5, _TIT_MIDPOINT_Y-4, 1 )
+    fb.label( char.get_title(), _X + chs2 + 5, _TIT_MIDPOINT_Y - tf.height//2, 1, font=tf )
+  
+  # Glyph cache performance
+  if _DEBUG_FONT_CACHE:
+    if isinstance( nf, Font ):
+      print( nf.cache_report('Name font') )
+    if isinstance( tf, Font ):
+      print( tf.cache_report('Title font') )
   
   ######## SPELLS BAR ########
   
@@ -480,9 +511,10 @@ def draw_play_screen( fb, char, lowbatt=False, scratchmem=None ):
   
   ######## ITEMS ########
   if data[_DEATH][_DEATH_STATUS] == _DEATH_STATUS_OK:
-    for i,itm in enumerate( data[_ITEMS] ):
-      fb.label( itm[_ITEMS_NAME], _ITEM_X, _ITEM_Y+round( _ITEM_DY * i ), _ITEM_C )
-    del i,itm
+    if len( data[_ITEMS][_ITEMS_CURR] ):
+      for i,itm in enumerate( data[_ITEMS][_ITEMS_NAME].split('\n') ): # Names are newline-separated
+        fb.label( itm, _ITEM_X, _ITEM_Y+round( _ITEM_DY * i ), _ITEM_C )
+      del i,itm
   elif data[_DEATH][_DEATH_STATUS] == _DEATH_STATUS_SV:
     fb.label( 'SUCCESS', _ITEM_X, _ITEM_Y, 1 )
     fb.label( 'FAILURE', _ITEM_X, _ITEM_Y+round( _ITEM_DY ), 2 )
@@ -572,12 +604,12 @@ def draw_play_screen( fb, char, lowbatt=False, scratchmem=None ):
     
   
   # Add the skull
-  skull = img.load( _IMG_SKULL )
   start = (
     round( _X +_RI*sin(_ASTART) ),
     round( _Y -_RI*cos(_ASTART) ),
   )
-  fb.blit( skull, start[0]-16, start[1]-6, 3 )
+  with img.load( _IMG_SKULL, into_pool=True ) as skull:
+    fb.blit( skull.fb, start[0]-16, start[1]-6, 3 )
   
   # Start tick (skull instead)
   #tick(_ASTART,2,1)
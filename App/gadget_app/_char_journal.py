@@ -0,0 +1,144 @@
+# Mutation journal (stats.jnl) for character.py
+# Consider as part of character.py
+#
+# Rewriting the whole of stats.json for every spell slot or hit point is a
+# lot of writing for a small change.  Instead, each change is recorded as a
+# fixed-size record, and the records are appended to the journal when the
+# character is saved.  The journal gets compacted into stats.json (and then
+# deleted) when it gets long, when the character has been idle for a while,
+# and when we're done with the character.
+#
+# At load, stats.json is replayed forward through the journal.
+#
+# Records hold the new value of a field, rather than the change to it, so
+# replaying is just assignment: no game logic needs to run twice.  It also
+# means a journal can safely be replayed over a stats.json that already
+# includes it, as every field ends up at its latest value either way.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+from micropython import const
+from os import stat, remove
+from struct import pack, unpack_from
+
+# Head format
+# 00 3s Magic
+# 03 1b Version
+# 04 4b Size of stats.json when the journal was started
+# 08 4b Modification time of stats.json when the journal was started
+# 0C RECORDS
+# If either has changed, so has stats.json (eg. on a PC), and the journal no longer applies.
+# The size alone would miss an edit that happened to keep it the same, eg. 15 gold to 20.
+_HEAD = const('>3sBII')
+_HEAD_SIZE = const(12)
+_MAGIC = const(b'TTj')
+_VERSION = const(2)
+
+# Record format
+# 00 1b Field code (J_ codes, below)
+# 01 1b Sub-index: which coin, spell level, item, etc.
+# 02 1b Level index, for fields that belong to a level
+# 03 1b Check byte
+# 04 4b New value
+_REC = const('>BBBBI')
+_REC_SIZE = const(8)
+
+# Field codes
+J_XP       = const(1) # Sub unused
+J_CURRENCY = const(2) # Sub is the coin
+J_HP       = const(3) # Sub is the index into the HP array
+J_HD       = const(4) # Sub is the index into the hit dice bytearray
+J_SPELL    = const(5) # Sub is the spell level.  Value is current slots.
+J_ITEM     = const(6) # Sub is the item number.  Value is current charges.
+J_DEATH    = const(7) # Sub is the index into the death bytearray
+J_LEVEL    = const(8) # Value is the new current level
+
+# Catches torn or corrupted records
+def _check( code:int, sub:int, lvl:int, val:int ) -> int:
+  return ( 0xa5 ^ code ^ sub ^ lvl ^ val ^ (val>>8) ^ (val>>16) ^ (val>>24) ) & 0xff
+
+class Journal:
+  
+  # size: Size of the journal file, bytes (0 if there isn't one)
+  # ok: False if the journal file can't be appended to, because it ends in a damaged record
+  def __init__( self, size:int=0, ok:bool=True ):
+    self.pending = bytearray() # Records not written yet
+    self.size = size
+    self.ok = ok
+  
+  # Record a change
+  def log( self, code:int, sub:int, lvl:int, val:int ):
+    self.pending.extend( pack( _REC, code, sub, lvl, _check( code, sub, lvl, val ), val ) )
+  
+  # Append the pending records to the journal file f, for stats.json at jf
+  # Returns bool indicating success.  If it fails, the records are kept for next time.
+  def flush( self, f:str, jf:str ) -> bool:
+    if not self.ok:
+      return False
+    if not self.pending:
+      return True
+    try:
+      # A new journal replaces any file that's still there (eg. discard() couldn't remove it), rather than appending a head part way through it
+      with open( f, 'ab' if self.size else 'wb' ) as fd:
+        if self.size == 0:
+          st = stat(jf)
+          fd.write( pack( _HEAD, _MAGIC, _VERSION, st[6], st[8] ) )
+        fd.write( self.pending )
+    except OSError:
+      self.ok = False # Might have written part of a record
+      return False
+    self.size += len(self.pending) + ( 0 if self.size else _HEAD_SIZE )
+    self.pending = bytearray()
+    return True
+  
+  # Delete the journal file f, eg. once it's been compacted into stats.json
+  def discard( self, f:str ):
+    try:
+      remove( f )
+    except OSError: # Not there
+      pass
+    self.size = 0
+    self.ok = True
+
+# Replay the journal file f, if it applies to stats.json at jf
+# apply( code, sub, lvl, val ) is called for each record, and may raise IndexError or ValueError for a bad one,
+# or RuntimeError (eg. CharacterError) if the record is fine but what it applies to isn't (eg. a level that won't load)
+# Replay stops at the first record that raises.
+# Returns a Journal to carry on with.  Its size is zero if the journal file was missing or out of date (and has been deleted).
+def replay( f:str, jf:str, apply ) -> Journal:
+  
+  try:
+    with open( f, 'rb' ) as fd:
+      raw = fd.read()
+  except OSError: # Usual case: no journal
+    return Journal()
+  
+  # Check it's for this stats.json
+  try:
+    magic, ver, size, mtime = unpack_from( _HEAD, raw, 0 )
+    st = stat(jf)
+    if magic != _MAGIC or ver != _VERSION or size != st[6] or mtime != st[8]:
+      raise ValueError
+  except ( ValueError, OSError ):
+    print('Discarding out of date journal')
+    j = Journal()
+    j.discard( f )
+    return j
+  
+  # Apply records until the end, or a damaged one (eg. the power went while writing it)
+  o = _HEAD_SIZE
+  n = 0
+  try:
+    while o + _REC_SIZE <= len(raw):
+      code, sub, lvl, chk, val = unpack_from( _REC, raw, o )
+      if chk != _check( code, sub, lvl, val ):
+        break
+      apply( code, sub, lvl, val )
+      o += _REC_SIZE
+      n += 1
+  except ( IndexError, ValueError, RuntimeError ) as e:
+    print(f'Bad journal record: {e}')
+  
+  print(f'Replayed {n} journal records')
+  return Journal( len(raw), o == len(raw) )
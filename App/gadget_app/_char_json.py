@@ -0,0 +1,276 @@
+# Streaming JSON reader and writer for character.py
+# Consider as part of character.py
+#
+# json.load() builds the whole savefile as dicts and lists before the loader
+# copies it into arrays, so for a big character the peak heap is several
+# times what's kept.  This reads the file a chunk at a time instead, and the
+# loader can ask for the elements of particular arrays (eg. each level, each
+# item) to be converted as soon as each one has been read.  Then only one
+# element's worth of dicts exists at a time.
+#
+# Tokens are found here, a byte at a time, but strings and numbers are still
+# decoded by the json module.  Errors raise ValueError, as json.load() does.
+#
+# The elements of chosen arrays can also be captured as they were in the file,
+# so the loader can keep them as JSON and only convert them if they're needed.
+#
+# Saving had the same problem the other way round: the whole savefile was
+# built as dicts before json.dump().  Writer lets the saver write the JSON
+# piece by piece instead, through one small buffer.  Numbers and constant
+# pieces (keys, punctuation) don't allocate anything; strings get encoded one
+# at a time.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+from micropython import const
+import json
+
+_CHUNK = const(256) # Bytes read from the file at a time
+_WBUF = const(256)  # Bytes written to the file at a time
+
+_wbuf = bytearray( _WBUF ) # Writer's buffer.  Shared, since only one file gets written at a time.
+
+# Bytes we look for
+_QUOTE = const(0x22)   # "
+_COMMA = const(0x2c)   # ,
+_COLON = const(0x3a)   # :
+_LSQUARE = const(0x5b) # [
+_BSLASH = const(0x5c)  # \
+_RSQUARE = const(0x5d) # ]
+_LCURLY = const(0x7b)  # {
+_RCURLY = const(0x7d)  # }
+_SPACE = const(0x20)   # This and below are all treated as whitespace
+
+class _Reader:
+  
+  # fd: File open in binary mode
+  # hooks, raw: See load()
+  def __init__(self, fd, hooks:dict, raw ):
+    self.fd = fd
+    self.hooks = hooks
+    self.raw = raw
+    self.b = b''    # Current chunk
+    self.i = 0      # Position in the chunk
+    self.path = []  # Keys leading to the current value
+    self.cap = None # While capturing an element: what's been captured from previous chunks
+    self.capi = 0   # Where the capture carries on from in the current chunk
+  
+  # Move on to the next chunk, keeping the rest of this one if it's being captured
+  def _next(self):
+    if self.cap is not None:
+      self.cap.extend( memoryview( self.b )[self.capi:] )
+      self.capi = 0
+    self.b = self.fd.read( _CHUNK )
+    self.i = 0
+  
+  # Returns the next non-whitespace byte without consuming it, or -1 at the end of the file
+  def _peek(self) -> int:
+    while True:
+      b = self.b
+      i = self.i
+      while i < len(b):
+        if b[i] > _SPACE:
+          self.i = i
+          return b[i]
+        i += 1
+      self._next()
+      if not self.b:
+        return -1
+  
+  # Consume the next non-whitespace byte, which must be c
+  def _expect(self, c:int ):
+    if self._peek() != c:
+      raise ValueError(f'Expected {chr(c)}')
+    self.i += 1
+  
+  # Read any value
+  def value(self):
+    c = self._peek()
+    if c == _LCURLY:
+      return self._object()
+    if c == _LSQUARE:
+      return self._array()
+    if c == _QUOTE:
+      return self._str()
+    if c < 0:
+      raise ValueError('Unexpected end of file')
+    return self._scalar()
+  
+  def _object(self) -> dict:
+    self.i += 1
+    d = {}
+    if self._peek() == _RCURLY:
+      self.i += 1
+      return d
+    path = self.path
+    while True:
+      if self._peek() != _QUOTE:
+        raise ValueError('Expected key')
+      k = self._str()
+      self._expect( _COLON )
+      path.append( k )
+      d[k] = self.value()
+      path.pop()
+      c = self._peek()
+      self.i += 1
+      if c == _RCURLY:
+        return d
+      if c != _COMMA:
+        raise ValueError('Expected , or }')
+  
+  def _array(self) -> list:
+    self.i += 1
+    a = []
+    if self._peek() == _RSQUARE:
+      self.i += 1
+      return a
+    path = '/'.join( self.path )
+    hook = self.hooks.get( path )
+    raw = path in self.raw
+    n = 0
+    while True:
+      if raw:
+        self._peek()
+        self.cap = bytearray()
+        self.capi = self.i
+      v = self.value()
+      if raw:
+        self.cap.extend( memoryview( self.b )[self.capi:self.i] )
+        v = hook( n, v, bytes( self.cap ) )
+        self.cap = None
+        n += 1
+      elif hook is not None:
+        v = hook( n, v )
+        n += 1
+      if v is not None or hook is None:
+        a.append( v )
+      c = self._peek()
+      self.i += 1
+      if c == _RSQUARE:
+        return a
+      if c != _COMMA:
+        raise ValueError('Expected , or ]')
+  
+  # Read a string, starting at its opening quote
+  def _str(self) -> str:
+    self.i += 1
+    s = b'' # Anything from previous chunks
+    while True:
+      b = self.b
+      j = b.find( b'"', self.i )
+      
+      # Not in this chunk.  Keep what we've got and read the next one.
+      if j < 0:
+        s += b[self.i:]
+        self._next()
+        if not self.b:
+          raise ValueError('Unterminated string')
+        continue
+      
+      s += b[self.i:j]
+      self.i = j + 1
+      
+      # Escaped quote?  Odd number of backslashes before it.
+      k = len(s)
+      while k > 0 and s[k-1] == _BSLASH:
+        k -= 1
+      if ( len(s) - k ) & 1:
+        s += b'"'
+        continue
+      
+      # Leave anything escaped to the json module
+      if b'\\' in s:
+        return json.loads( b'"' + s + b'"' )
+      return str( s, 'utf-8' )
+  
+  # Read a number, true, false or null
+  def _scalar(self):
+    s = b''
+    while True:
+      b = self.b
+      i = self.i
+      while i < len(b):
+        c = b[i]
+        if c <= _SPACE or c == _COMMA or c == _RSQUARE or c == _RCURLY:
+          break
+        i += 1
+      s += b[self.i:i]
+      self.i = i
+      if i < len(b):
+        break
+      self._next()
+      if not self.b:
+        break
+    return json.loads( s )
+
+# Read the whole file, like json.load()
+# fd: File open in binary mode
+# hooks: Dict of functions to convert array elements as they're read.  Keys are the path to the array, eg. 'data/levels' (array indexes don't count).
+#   Each is called as hook( index, element ), and the array gets whatever it returns instead, or nothing if it returns None.
+#   Inner arrays' hooks run first.
+# raw: Paths (from hooks) whose elements should also be captured.  Those hooks are called as hook( index, element, bytes ), with the element's JSON as it was in the file.
+#   Captures can't be nested.
+def load( fd, hooks:dict={}, raw=() ):
+  r = _Reader( fd, hooks, raw )
+  v = r.value()
+  if r._peek() >= 0:
+    raise ValueError('Extra data')
+  return v
+
+# Writes JSON to a file, through _wbuf
+# The caller provides the structure, as raw pieces: eg. w.raw( b'{"xp": ' ), w.num( xp ), w.raw( b'}' )
+class Writer:
+  
+  # fd: File open in binary mode
+  def __init__(self, fd ):
+    self.fd = fd
+    self.n = 0     # Bytes in _wbuf
+    self.total = 0 # Bytes written to the file so far
+  
+  # Write bytes as they are
+  def raw(self, b ):
+    n = self.n
+    if n + len(b) > _WBUF:
+      self.flush()
+      n = 0
+      if len(b) > _WBUF: # Too big to buffer
+        self.fd.write( b )
+        self.total += len(b)
+        return
+    _wbuf[n:n+len(b)] = b
+    self.n = n + len(b)
+  
+  # Write a non-negative integer
+  def num(self, v:int ):
+    
+    # How many digits?
+    d = 1
+    t = v
+    while t >= 10:
+      t //= 10
+      d += 1
+    
+    if self.n + d > _WBUF:
+      self.flush()
+    
+    # Fill them in from the right
+    b = _wbuf
+    i = self.n + d
+    self.n = i
+    while d:
+      i -= 1
+      b[i] = 0x30 + v % 10
+      v //= 10
+      d -= 1
+  
+  # Write a string, quoted and escaped
+  def text(self, s:str ):
+    self.raw( json.dumps( s ).encode() )
+  
+  # Send what's buffered to the file
+  def flush(self):
+    if self.n:
+      self.fd.write( memoryview( _wbuf )[:self.n] )
+      self.total += self.n
+      self.n = 0
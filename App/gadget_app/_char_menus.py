@@ -66,7 +66,7 @@ def make_matrix_menu_stable( hal, char ) -> menu.MatrixMenu:
   
   # Calculate matrix geometry
   n_spls = len(char.data[_SPELLS][_SPELLS_CURR]) # Allow as many spells as we have
-  n_chgs = min( 16-n_spls, len(char.data[_CHARGES]) ) # Cut off charges if there are too many to fit
+  n_chgs = min( 16-n_spls, len(char.data[_CHARGES][_CHARGES_CURR]) ) # Cut off charges if there are too many to fit
   n_rows = n_chgs + n_spls # Number of active rows
   gap = 16 - n_rows
   
@@ -85,7 +85,7 @@ def make_matrix_menu_stable( hal, char ) -> menu.MatrixMenu:
     if row < n_chgs: # Charges
       char.set_charge(
         row,
-        n + char.data[_CHARGES][row][_CHARGES_CURR],
+        n + char.data[_CHARGES][_CHARGES_CURR][row],
         show=True
       )
     else: # Spells
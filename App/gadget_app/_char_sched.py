@@ -0,0 +1,95 @@
+# Save scheduling for character.py
+# Consider as part of character.py
+#
+# Changes get saved once the character has been left alone for a while (see
+# Character.save()).  How long that is used to be fixed, at 30s.  But a save
+# to the journal on internal flash takes a few ms, while compacting to an SD
+# card can take most of a second, and the card and the battery are both busy
+# while it happens.  So each save_now() is timed, and the wait is set to keep
+# the time spent saving to a small fraction of the time in play.  Cheap saves
+# happen sooner (less to lose if the power goes), expensive ones less often.
+#
+# On a low battery, the shortest wait is used regardless: losing the changes
+# matters more than the power the save costs.
+#
+# Also keeps the numbers, for SaveScheduler.stats().
+#
+# T. Lloyd
+# 19 Oct 2026
+
+from micropython import const
+
+_DUTY_PCT = const(1)      # Target share of the time spent saving, %
+_WINDOW_MIN = const(5000) # Shortest wait before saving, ms
+_WINDOW_MAX = const(60000) # Longest wait before saving, ms
+_WINDOW_INIT = const(30000) # Wait before the first save has been timed, ms
+
+class SaveScheduler:
+  
+  def __init__(self):
+    self.window = _WINDOW_INIT # Current wait before saving, ms
+    self.avg = 0      # Smoothed save time, ms.  Zero until the first save.
+    self.lowbatt = False
+    self.saves = 0    # Successful saves
+    self.compacts = 0 # ...of which were to stats.json, rather than the journal
+    self.fails = 0    # Failed saves
+    self.skips = 0    # Saves not needed, because nothing had changed
+    self.bytes = 0    # Total written
+    self.ms = 0       # Total time spent saving
+  
+  # Record a save, and work out the next wait
+  # ms: How long it took
+  # n: Bytes written
+  # compacted: Whether it went to stats.json (True) or the journal (False)
+  # ok: Whether it worked
+  # Returns the new wait, in ms
+  def record(self, ms:int, n:int, compacted:bool, ok:bool ) -> int:
+    
+    self.ms += ms
+    if ok:
+      self.saves += 1
+      self.compacts += compacted
+      self.bytes += n
+    else:
+      self.fails += 1
+    
+    # Smooth out one-off slow saves (eg. the card doing housekeeping), but follow a change of card within a few saves
+    self.avg = ms if self.avg == 0 else ( 3 * self.avg + ms ) // 4
+    
+    return self._update()
+  
+  # Record a save that wasn't needed
+  # Doesn't change the wait: it took no time, so says nothing about what a save costs
+  def skipped(self):
+    self.skips += 1
+  
+  # The battery has gone low (True), or is charging again (False)
+  # Returns the new wait, in ms
+  def set_lowbatt(self, low:bool ) -> int:
+    self.lowbatt = low
+    return self._update()
+  
+  # Work out the wait, from the average save time and the battery
+  def _update(self) -> int:
+    if self.lowbatt:
+      self.window = _WINDOW_MIN
+    elif self.avg:
+      # If saving takes avg, waiting this long between saves keeps it to _DUTY_PCT of the time
+      w = self.avg * ( 100 - _DUTY_PCT ) // _DUTY_PCT
+      self.window = min( max( w, _WINDOW_MIN ), _WINDOW_MAX )
+    else:
+      self.window = _WINDOW_INIT
+    return self.window
+  
+  # Returns a dict of the numbers so far
+  def stats(self) -> dict:
+    return {
+      'saves'    : self.saves,
+      'compacts' : self.compacts,
+      'fails'    : self.fails,
+      'skips'    : self.skips,
+      'bytes'    : self.bytes,
+      'ms'       : self.ms,
+      'avg_ms'   : self.avg,
+      'window'   : self.window,
+    }
@@ -0,0 +1,160 @@
+# Savefile schema for character.py
+# Consider as part of character.py
+#
+# Describes the numeric parts of a savefile, so one loop (section()) can
+# validate and convert all of them.  This used to be a long hand-written block
+# per section, most of them repeated between the v0 and v1 loaders, and all
+# that bytecode stayed in RAM.
+#
+# Also holds the savefile's limits, which character.py uses for values set in
+# play as well, so there's only one of each.
+#
+# Nothing in here needs the device, so Tooling/savecheck.py uses it too.
+#
+# Sections are ( key, missing, bad type, bad value, fields, slots )
+#   key        Key of the section's dict within its parent, or None if the fields are in the parent itself
+#   missing    Error if the key isn't there, or None to treat it as an empty dict
+#   bad type   Error if it isn't a dict
+#   bad value  Error if a field isn't a number
+#   fields     See below.  Processed in order.
+#   slots      Length of the resulting list
+#
+# Fields are ( key, slot, default, limit, error )
+#   key        Key in the section's dict
+#   slot       Where the value goes, in the resulting list
+#   default    Used if the key isn't there.  None if it's required.  Negative values refer to a slot that's already been filled: -1 is slot 0, -2 is slot 1, etc.
+#   limit      Largest allowed value (smallest is always zero), or a slot, as for default.  Or a tuple of strings, for a field that's one of them, which becomes the index (unrecognised ones become the default).
+#   error      Error if the value is out of range
+#
+# T. Lloyd
+# 19 Oct 2026
+
+from micropython import const
+
+# Constants
+_SIZE_MPY_SMALLINT = const(0x3fffffff) # https://github.com/orgs/micropython/discussions/10315#discussioncomment-4490600
+_SIZE_UINT8 = const(0xff)
+_SIZE_UINT16 = const(0xffff)
+
+# Raised for anything wrong with a character or its savefile
+# Here so that section() can raise it.  Import it from character.py.
+class CharacterError( RuntimeError ):
+  pass
+
+# Length limits
+MAX_NAMELEN = const(16) # Most that'll fit on the screen
+MAX_TITLELEN = const(16) # Most that'll fit on the screen
+MAX_SPELL_LEVELS = const(9) # 5e SRD
+MAX_N_ITEMS = const(16) # (MatrixMenu display limitation) When loading from file, load no more than this many of each item
+MAX_ITEMNAME_LEN = const(45) # The most characters that will fit on the eink: 360/8
+
+# Value limits
+MAX_XP = const(_SIZE_MPY_SMALLINT) # Kept in memory as a Python integer.
+MAX_CURRENCY = const(_SIZE_UINT16) # (array H) Highest value for all currency counters
+MAX_HITDICE = const(_SIZE_UINT8) # (bytearray) Max possible number of hit dice
+MAX_HP = const(_SIZE_UINT16) # (array H) Highest value for hit points
+MAX_TEMPHP = const(_SIZE_UINT16) # (array H) Highest value for temporary hit points
+MAX_SPELLSLOTS = const(6) # (MatrixMenu display limitation) Max number of spell slots at each level
+MAX_ITEM_LEVEL = const(_SIZE_MPY_SMALLINT) # (Python integer) The most charges an item can have
+MAX_DEATH_SAVES = const(3) # (5e SRD) How many successes or failures can we have?
+
+# Item reset strings, in bit order
+RESETS = ('sr', 'lr', 'dawn')
+
+# Death status strings, in order of the status values
+DEATH_STATUSES = ('stable', 'saves', 'dead')
+
+XP = ( None, None, None, 'Invalid XP', (
+  ( 'xp', 0, 0, MAX_XP, 'Invalid XP' ),
+), 1 )
+
+# Copper, silver, electrum, gold, platinum
+_CURRENCY_FIELDS = (
+  ( 'copper',   0, 0, MAX_CURRENCY, 'Invalid currency value' ),
+  ( 'silver',   1, 0, MAX_CURRENCY, 'Invalid currency value' ),
+  ( 'electrum', 2, 0, MAX_CURRENCY, 'Invalid currency value' ),
+  ( 'gold',     3, 0, MAX_CURRENCY, 'Invalid currency value' ),
+  ( 'platinum', 4, 0, MAX_CURRENCY, 'Invalid currency value' ),
+)
+CURRENCY = ( 'currency', None, 'Invalid currency section', 'Invalid currency', _CURRENCY_FIELDS, 5 )
+CURRENCY_V0 = ( None, None, None, 'Invalid currency', _CURRENCY_FIELDS, 5 ) # Top-level in v0
+
+# Status, successes, failures
+DEATH = ( 'death', None, 'Invalid death section', 'Invalid death section', (
+  ( 'status',    0, 0, DEATH_STATUSES, None ),
+  ( 'successes', 1, 0, MAX_DEATH_SAVES, 'Invalid number of successful death saves' ),
+  ( 'failures',  2, 0, MAX_DEATH_SAVES, 'Invalid number of failed death saves' ),
+), 3 )
+
+# Current, max, temporary, original temporary
+HP = ( 'hp', 'Missing hp', 'Invalid hp', 'Invalid hp', (
+  ( 'max',       1, None, MAX_HP,     'Invalid hp' ),
+  ( 'current',   0, -2,   -2,         'Invalid hp' ),
+  ( 'temporary', 2, 0,    MAX_TEMPHP, 'Invalid temporary hp' ),
+  ( 'temporary', 3, 0,    MAX_TEMPHP, 'Invalid temporary hp' ),
+), 4 )
+
+# Current, max
+HITDICE = ( 'hitdice', 'Missing hitdice', 'Invalid hitdice', 'Invalid hitdice', (
+  ( 'max',     1, None, MAX_HITDICE, 'Invalid hitdice' ),
+  ( 'current', 0, -2,   -2,          'Invalid hitdice' ),
+), 2 )
+
+# Each spell level: current, max
+SPELL = ( None, None, 'Bad spell slot', 'Bad spell slot', (
+  ( 'max',     1, None, MAX_SPELLSLOTS, 'Bad spell slot' ),
+  ( 'current', 0, -2,   -2,             'Bad spell slot' ),
+), 2 )
+
+# Each item: current, max, reset, name
+# Reset and name aren't numbers, so get filled in by character.py
+ITEM = ( None, None, 'Bad item', 'Bad item format', (
+  ( 'max',     1, 0,  MAX_ITEM_LEVEL, 'Bad item max level' ),
+  ( 'current', 0, -2, MAX_ITEM_LEVEL, 'Bad item current level' ),
+), 4 )
+
+# Validates and converts a section of numbers from a savefile, as described by one of the schemas above
+# d: The dict the section is in (or the section itself, if the schema has no key)
+# sfx: Added to error messages (eg. which item it is)
+# Returns a list of ints, in the order of the schema's slots.  Raises CharacterError if anything's wrong.
+def section( d, sch, sfx:str='' ) -> list:
+  key, missing, bad_type, bad_val, fields, n = sch
+  
+  # Find the section
+  if key is not None:
+    if key in d:
+      d = d[key]
+    elif missing is not None:
+      raise CharacterError( missing + sfx )
+    else:
+      d = {}
+  if type(d) is not dict:
+    raise CharacterError( bad_type + sfx )
+  
+  out = [0] * n
+  for k, slot, dflt, lim, err in fields:
+    
+    # One of a set of strings
+    if type(lim) is tuple:
+      v = d.get( k )
+      if type(v) is list or type(v) is dict:
+        raise CharacterError( bad_val + sfx )
+      out[slot] = lim.index( v ) if v in lim else dflt
+      continue
+    
+    # A number, defaulting to a number or the value of an earlier slot
+    if dflt is not None and dflt < 0:
+      dflt = out[-1-dflt]
+    try:
+      v = int( d.get( k, dflt ) )
+    except ( ValueError, TypeError, OverflowError ) as e: # OverflowError: inf, from a number too big for a float
+      raise CharacterError( bad_val + sfx )
+    
+    # Zero to a limit, or the value of an earlier slot
+    if lim < 0:
+      lim = out[-1-lim]
+    if not 0 <= v <= lim:
+      raise CharacterError( err + sfx )
+    out[slot] = v
+  
+  return out
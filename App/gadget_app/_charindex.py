@@ -0,0 +1,177 @@
+# Character directory index (system.json)
+#
+# Finding the characters for the select screen used to take a glob, then an
+# is_dir(), is_file() and stat() for each directory, then reading each
+# stats.json: all through FAT on the SD card.  Instead, each character
+# directory gets listed once with os.ilistdir(), which gives every file and
+# its size in one go, and stats.json gets a stat() for its time.  If those
+# still match the index, the name and title come from the index.  Only
+# directories that have changed get read.
+#
+# The index also keeps the time, since the RTC forgets it whenever the power
+# is off.
+#
+# system.json is only a cache, and can be deleted at any time.  The size alone
+# would miss a change that kept it the same (eg. a PC edit to the name, or a
+# level switch between names of the same length), hence the time as well.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+from micropython import const
+import os
+import json
+from .pathlib import Path
+from .common import CHAR_STATS, CHAR_STATS_NEW, CHAR_HEAD, CHAR_BG
+from .character import CharacterSummary, CharacterError, recover_save
+
+# Character file info
+MANDATORY_CHAR_FILES = [ # Files that must exist in a character directory for it to be recognised
+  CHAR_STATS,
+]
+
+_VERSION = const(1)
+_RTC_RESAVE = const(600) # Don't rewrite the index just to move its time on by less than this, in seconds
+
+# os.ilistdir() entry types
+_S_IFDIR = const(0x4000)
+_S_IFREG = const(0x8000)
+
+# Index entries, keyed by directory name
+# [ name, title, head.pi exists, background.pi exists, stats.json size, stats.json time ]
+_E_NAME = const(0)
+_E_TITLE = const(1)
+_E_HEAD = const(2)
+_E_BG = const(3)
+_E_SIZE = const(4)
+_E_TIME = const(5)
+_E_LEN = const(6)
+
+class CharIndex:
+  
+  # f: Path to system.json
+  def __init__(self, f:Path ):
+    self.f = f
+    self.rtc = 0      # Latest time we know of
+    self.chars = {}   # See _E_ fields, above
+    self.dirty = False
+    
+    # Anything missing or wrong and we start again
+    try:
+      with f.open( 'r' ) as fd:
+        j = json.load( fd )
+      if j.get('version') == _VERSION:
+        self.rtc = int( j.get('rtc',0) )
+        chars = j.get('chars')
+        if type(chars) is dict:
+          self.chars = chars
+    except OSError: # Not there yet
+      pass
+    except ( ValueError, TypeError, AttributeError ):
+      print(f'Ignoring damaged {f.name}')
+  
+  # Move the RTC forward to the latest time in the index, if it's behind
+  def sync_rtc(self, rtc ):
+    ts = self.rtc
+    for e in self.chars.values():
+      try:
+        ts = max( ts, e[_E_TIME] )
+      except ( TypeError, IndexError ): # Damaged entry.  It'll get replaced.
+        pass
+    if ts > rtc.uts():
+      rtc.uts( ts )
+      print(f'Set RTC based on {self.f.name}: {ts}')
+  
+  # Write the index, if anything has changed
+  # ts: The time now, to keep.  Only written if there's something else to save, or it's well past the last one.
+  # Returns bool indicating success
+  def save(self, ts:int=0 ) -> bool:
+    if ts > self.rtc:
+      self.dirty = self.dirty or ts - self.rtc >= _RTC_RESAVE
+      self.rtc = ts
+    if not self.dirty:
+      return True
+    try:
+      with self.f.open( 'w' ) as fd:
+        json.dump( { 'version':_VERSION, 'rtc':self.rtc, 'chars':self.chars }, fd )
+    except OSError as e:
+      print(f'Could not save {self.f.name}: {e}')
+      return False
+    self.dirty = False
+    return True
+
+# Files in a directory, with their sizes
+def _files( d:str ) -> dict:
+  return { e[0] : e[3] for e in os.ilistdir( d ) if e[1] == _S_IFREG }
+
+# Time of the stats.json in character directory x, as CharacterSummary.mtime has it, or 0 if it can't be read
+def _mtime( x:Path ) -> int:
+  try:
+    return max( os.stat( str( x / CHAR_STATS ) )[7:10] )
+  except OSError:
+    return 0
+
+# Looks at the directory cd and generates a list of available characters, as CharacterSummary objects, in directory name order
+# hal: The HAL object from hal.py
+# index: CharIndex to use and update, or None to read every character
+# skip: Directories (as strings) to leave out
+def find( hal, cd:Path, index, skip ) -> list:
+  
+  if index is not None:
+    index.sync_rtc( hal.rtc )
+  
+  chars = []
+  present = set()
+  for e in sorted( os.ilistdir( str(cd) ) ):
+    
+    # Have we found a directory?
+    if e[1] != _S_IFDIR:
+      continue
+    dn = e[0]
+    x = cd / dn
+    present.add( dn )
+    if str(x) in skip:
+      continue
+    files = _files( str(x) )
+    
+    # Finish off any save that got interrupted, so that stats.json is there to find
+    if CHAR_STATS_NEW in files:
+      recover_save( x )
+      files = _files( str(x) )
+    
+    # Is everything present that should be?
+    ok = True
+    for f in MANDATORY_CHAR_FILES:
+      if f not in files:
+        print( f'{f} is not present in /{dn}/' )
+        ok = False
+    if not ok:
+      continue
+    
+    # Use the index entry if nothing's changed, else read just the name and title
+    head = CHAR_HEAD in files
+    bg = CHAR_BG in files
+    ie = None if index is None else index.chars.get( dn )
+    if type(ie) is list and len(ie) == _E_LEN and ie[_E_SIZE] == files[CHAR_STATS] and ie[_E_HEAD] == head and ie[_E_BG] == bg and ie[_E_TIME] == _mtime( x ):
+      c = CharacterSummary( hal, x, head, ie[_E_NAME], ie[_E_TITLE] )
+    else:
+      try:
+        c = CharacterSummary( hal, x, head )
+      except CharacterError as e:
+        print( f'Failed to load from /{dn}/: {str(e)}' )
+        continue
+      if index is not None:
+        index.chars[dn] = [ c.name, c.title, head, bg, files[CHAR_STATS], c.mtime ]
+        index.dirty = True
+    
+    # If we're here, we're good
+    print(f'Found: {c.get_name()} ({c.get_title()}) in /{dn}/')
+    chars.append( c )
+  
+  # Forget directories that have gone
+  if index is not None:
+    for dn in [ k for k in index.chars if k not in present ]:
+      del index.chars[dn]
+      index.dirty = True
+  
+  return chars
@@ -8,6 +8,7 @@ from gc import mem_alloc as gcma, mem_free as gcmf
 from micropython import const
 
 from .common import HAL_PRIORITY_IDLE
+from img import sysfont
 from . import gfx
 
 # Store this figure for future use
@@ -92,7 +93,7 @@ class OledIdle:
         txt = f'{pc}%'
       
       # Add the text next to the battery
-      t( txt, x - 12 -( 8*len(txt) ), y, 1 )
+      t( txt, x - 12 - sysfont.measure(txt), y, 1 )
       
       # Add the actual voltage, below the battery
       #t( f'{round(self.hal.hw.voltage_stable(),4)}v', x-47, y+8, 1 )
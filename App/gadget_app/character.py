@@ -7,39 +7,31 @@
 import os
 from micropython import const
 from array import array
+from io import BytesIO
 from gc import collect as gc_collect
 import json
 import errno
+from time import ticks_ms, ticks_diff
 
 # Our stuff
 from .pathlib import Path # Not a builtin in MicroPython (but mirrors CPython)
+from img import sprites
 from . import menu
 from . import _char_menus as _cm
 from . import _char_gfx as gfx
-from .common import DeferredTask, CHAR_STATS, INTERNAL_SAVEDIR, HAL_PRIORITY_MENU, HAL_PRIORITY_IDLE
+from . import _char_bin
+from . import _char_journal
+from . import _char_json
+from . import _char_schema as _sch
+from ._char_schema import CharacterError, section as _section
+from ._char_schema import MAX_NAMELEN, MAX_TITLELEN, MAX_SPELL_LEVELS, MAX_N_ITEMS, MAX_ITEMNAME_LEN # Global maximums
+from ._char_schema import MAX_XP, MAX_CURRENCY, MAX_HP, MAX_TEMPHP, MAX_ITEM_LEVEL, MAX_DEATH_SAVES
+from . import _char_sched
+from .common import DeferredTask, CHAR_STATS, CHAR_STATS_NEW, CHAR_STATS_BIN, CHAR_JOURNAL, INTERNAL_SAVEDIR, HAL_PRIORITY_MENU, HAL_PRIORITY_IDLE
 
 # Config
-_SAVE_TIMEOUT = const(30000) # Save contdown, in ms
-
-# Constants
-_SIZE_MPY_SMALLINT = const(0x3fffffff) # https://github.com/orgs/micropython/discussions/10315#discussioncomment-4490600
-_SIZE_UINT8 = const(0xff)
-_SIZE_UINT16 = const(0xffff)
-
-# Global maximums
-_MAX_NAMELEN = const(16) # Most that'll fit on the screen
-_MAX_TITLELEN = const(16) # Most that'll fit on the screen
-_MAX_XP = const(_SIZE_MPY_SMALLINT) # Kept in memory as a Python integer.  
-_MAX_CURRENCY = const(_SIZE_UINT16) # (array H) Highest value for all currency counters
-_MAX_HITDICE = const(_SIZE_UINT8) # (bytearray) Max possible number of hit dice
-_MAX_HP = const(_SIZE_UINT16) # (array H) Highest value for hit points
-_MAX_TEMPHP = const(_SIZE_UINT16) # (array H) Highest value for hit points
-_MAX_SPELL_LEVELS = const(9) # 5e SRD
-_MAX_SPELLSLOTS = const(6) # (MatrixMenu display limitation) Max number of spell slots at each level
-_MAX_N_ITEMS = const(16) # (MatrixMenu display limitation) When loading from file, load no more than this many of each item
-_MAX_ITEMNAME_LEN = const(45) # The most characters that will fit on the eink: 360/8
-_MAX_ITEM_LEVEL = const(_SIZE_MPY_SMALLINT) # (Python integer) The most charges an item can have
-_MAX_DEATH_SAVES = const(3) # (5e SRD) How many successes or failures can we have?
+_COMPACT_TIMEOUT = const(600000) # How long to be idle before compacting the journal into stats.json, in ms
+_JOURNAL_MAX = const(1024) # Compact the journal once it gets this big, in bytes
 
 # Indexes into the Character.data object
 #_NAME = const(0) # NO LONGER USED - replaced with Character.name
@@ -69,6 +61,8 @@ _HD_MAX = const(1)
 _SPELLS_CURR = const(0)
 _SPELLS_MAX = const(1)
 #
+# Items are a tuple of ( current array I, max array I, reset bytearray, names ), one entry per item in each
+# Names are a single string, with a newline between each name.  Use _item_names() to get them as a list.
 _ITEMS_CURR = const(0)
 _ITEMS_MAX = const(1)
 _ITEMS_RESET = const(2)
@@ -86,7 +80,7 @@ _ITEM_RESET_DAWN = const(0x04)
 _DEATH_STATUS_OK = const(0)
 _DEATH_STATUS_SV = const(1)
 _DEATH_STATUS_DD = const(2)
-_DEATH_STATUS_TUPLE = ('stable','saves','dead')
+_DEATH_STATUS_TUPLE = _sch.DEATH_STATUSES
 
 # Index into the Levels tuples
 # ( name, hp, hd, spells, items )
@@ -95,10 +89,19 @@ _LV_HP = const(1)
 _LV_HD = const(2)
 _LV_SPELLS = const(3)
 _LV_ITEMS = const(4)
+#
+# Levels that haven't been needed yet are ( name, JSON bytes ) instead.  See Character._level().
+_LV_RAW = const(1)
 
-# Exists so that a consistent error type can be passed from the Character object
-class CharacterError( RuntimeError ):
-  pass
+# Journal record field codes (see _char_journal.py)
+_J_XP       = const(1)
+_J_CURRENCY = const(2)
+_J_HP       = const(3)
+_J_HD       = const(4)
+_J_SPELL    = const(5)
+_J_ITEM     = const(6)
+_J_DEATH    = const(7)
+_J_LEVEL    = const(8)
 
 # Calls os.sync(), but wrapped for compatibility with different Python behaviours
 # https://github.com/micropython/micropython/issues/11449
@@ -119,25 +122,185 @@ def try_sync() -> bool:
   
   return ok
 
-# Save helper function
-# Converts charge's reset bitarray to a string tuple
-def _rst_to_list(bf:int) -> list:
-  # Strings appear in savefiles.
-  # Order corresponds to _ITEM_RESET_SR, _ITEM_RESET_LR etc.
-  a = ( 'sr', 'lr', 'dawn' )
-  b = []
-  i = 0
-  while i < len(a):
-    if bf & 1:
-      b.append( a[i] )
-    bf = bf >> 1
-    i += 1
-  return b
+# Finishes off a save that was interrupted (eg. by power loss), so that stats.json is the latest complete savefile
+# Character.save_now() writes stats.json.new, syncs it, then renames it over stats.json
+# Safe to call on any character directory, at any time a save isn't in progress
+def recover_save( chardir:Path ):
+  
+  n = chardir / CHAR_STATS_NEW
+  f = chardir / CHAR_STATS
+  
+  # Usual case: nothing to do
+  try:
+    ns = n.stat()
+  except OSError:
+    return
+  
+  # The new file is only wanted if it's complete, and stats.json hasn't been edited (eg. on a PC) since
+  keep = False
+  try:
+    newer = f.stat()[8] > ns[8]
+  except OSError: # Power went during the rename
+    newer = False
+  if not newer:
+    try:
+      with n.open( 'r' ) as fd:
+        json.load( fd )
+      keep = True
+    except ( OSError, ValueError ): # Power went during the write
+      pass
+  
+  try:
+    if keep:
+      os.rename( str(n), str(f) )
+      print(f'Recovered interrupted save in /{chardir.name}/')
+      
+      # The binary copy and journal (if any) are from the save before
+      for b in ( chardir / CHAR_STATS_BIN, chardir / CHAR_JOURNAL ):
+        if b.is_file():
+          b.unlink()
+    else:
+      n.unlink()
+      print(f'Discarded unfinished save in /{chardir.name}/')
+  except OSError as e:
+    print(f'Could not recover save in /{chardir.name}/: {e}')
+
+# Save helper constants
+# Item reset and death status strings, ready quoted for _char_json.Writer.raw()
+# Order corresponds to _ITEM_RESET_SR, _ITEM_RESET_LR etc., and the death status values
+_RESETS_JSON = tuple([ json.dumps( x ).encode() for x in _sch.RESETS ])
+_DEATH_STATUS_JSON = tuple([ json.dumps( x ).encode() for x in _sch.DEATH_STATUSES ])
+
+# Load helper function
+# Checks a level section from a v1 savefile is a dict, and returns its name
+def _level_name( lvl ) -> str:
+  
+  # Validate level object itself
+  if not type(lvl) is dict:
+    raise CharacterError('Invalid level data')
+  
+  # Get name
+  name = lvl.get('name')
+  if name is None:
+    raise CharacterError('No level name given')
+  try:
+    return str(name)[:MAX_TITLELEN]
+  except ( ValueError, TypeError ) as e:
+    raise CharacterError('Invalid level name')
+
+# Load helper function
+# Converts a list of [ current, max, reset, name ] items into the items tuple (see _ITEMS_CURR etc.)
+def _pack_items( its:list ) -> tuple:
+  return (
+    array( 'I', [ it[_ITEMS_CURR] for it in its ] ),
+    array( 'I', [ it[_ITEMS_MAX] for it in its ] ),
+    bytearray([ it[_ITEMS_RESET] for it in its ]),
+    '\n'.join([ it[_ITEMS_NAME] for it in its ]),
+  )
+
+# Returns the names from an items tuple, as a list
+def _item_names( items:tuple ) -> list:
+  return items[_ITEMS_NAME].split('\n') if len(items[_ITEMS_CURR]) else []
 
 # Given a number, returns a byte to send to the matrix to represent that number
 # LSB is at left of display
 num2mtx = lambda x : 256 - ( 1 << (8-x) )
 
+# The RTC doesn't keep time while the power's off, so move it forward to the savefile time, if that's newer
+# st: Result of stat() on the savefile
+def _rtc_from_file( rtc, st, chardir:Path ):
+  ts = max( st[7:10] )
+  if ts > rtc.uts():
+    rtc.uts( ts )
+    print(f'Set RTC based on {chardir.name}: {ts}')
+
+# Path (as a string) to the binary savefile, if there is one at least as new as stats.json, else None
+# js: Result of stat() on stats.json
+def _fresh_bin( chardir:Path, js ):
+  f = chardir / CHAR_STATS_BIN
+  try:
+    if f.stat()[8] < js[8]: # The JSON has been edited since (eg. on a PC)
+      return None
+  except OSError: # No binary savefile
+    return None
+  return str(f)
+
+# For Character: levels to keep as JSON until they're needed (see Character._lazy_level())
+_LAZY_PATHS = ( 'data/levels', )
+
+# For CharacterSummary: the levels are only wanted for their names
+_SUMMARY_HOOKS = {
+  'data/levels/spells' : lambda i, sp : None,
+  'data/levels/items' : lambda i, it : None,
+}
+
+# Just enough of a character for the select screen: its directory, name and title
+# Takes them from the binary savefile if it's up to date, else picks them out of stats.json.
+# Nothing else is kept or validated, so a full Character only gets loaded for the one that's chosen.
+# (A level change that's still in the journal won't show in the title)
+# hal: The HAL object from hal.py
+# chardir: Path object to the character directory
+# head: Whether there's a head.pi
+# name, title: Already known (eg. from system.json), so nothing needs reading
+class CharacterSummary:
+  def __init__(self, hal, chardir:Path, head:bool=True, name:str=None, title:str=None ):
+    
+    self.dir:Path = chardir
+    self.head = head
+    self.mtime = 0 # stats.json time, if it was read
+    
+    if name is not None:
+      self.name = name
+      self.title = title
+      return
+    
+    try:
+      js = ( chardir / CHAR_STATS ).stat()
+    except OSError as e:
+      raise CharacterError(f'Could not open save file: {errno.errorcode[e.errno]}')
+    _rtc_from_file( hal.rtc, js, chardir )
+    self.mtime = max( js[7:10] )
+    
+    # Binary savefile
+    f = _fresh_bin( chardir, js )
+    if f is not None:
+      try:
+        name, title = _char_bin.summary( f, js[6] )
+      except ( OSError, ValueError ) as e:
+        print(f'Ignoring {CHAR_STATS_BIN}: {e}')
+        f = None
+    
+    # JSON
+    if f is None:
+      name, title = self._from_json()
+    
+    if len(name) == 0:
+      raise CharacterError('No name given')
+    self.name = name[:MAX_NAMELEN]
+    self.title = title[:MAX_TITLELEN]
+  
+  # Returns ( name, title ) from stats.json.  Version 0 has a title, later versions take it from the current level.
+  def _from_json(self) -> tuple[str,str]:
+    try:
+      with ( self.dir / CHAR_STATS ).open( 'rb' ) as fd:
+        fs = _char_json.load( fd, _SUMMARY_HOOKS )
+      data = fs.get('data')
+      if data is None:
+        return str( fs.get('name') ), str( fs.get('title','') )
+      title = data.get('currentLevel')
+      if title is None: # Only allowed if there's one level
+        title = data['levels'][0]['name']
+      return str( fs.get('name') ), str( title )
+    except OSError as e:
+      raise CharacterError(f'Could not open save file: {errno.errorcode[e.errno]}')
+    except ( ValueError, TypeError, KeyError, IndexError, AttributeError ):
+      raise CharacterError('Invalid savefile')
+  
+  def get_name(self) -> str:
+    return self.name
+  def get_title(self) -> str:
+    return self.title
+
 
 # hal: The HAL object from hal.py
 # sd_mounted: A callable which will return a boolean indicating whether the SD card is ready for read/write
@@ -170,6 +333,8 @@ class Character:
     
     # Save tracking
     self._saver = None # The actual saver will get added later
+    self._compactor = None # Likewise, for the journal
+    self._sched = _char_sched.SaveScheduler() # Sets how long the saver waits, and keeps save stats
     self._dirty = False
     
     # UI tracking
@@ -182,24 +347,81 @@ class Character:
     
     self._load()
   
+  # Load stats.json (or its binary copy), then replay the journal over it
   def _load(self):
+    self._load_base()
+    self._journal = _char_journal.replay( str( self.dir / CHAR_JOURNAL ), str( self.dir / CHAR_STATS ), self._apply )
+    self._committed( self._digest() )
+  
+  # Apply a journal record
+  # Raises IndexError or ValueError if it doesn't fit this character, or CharacterError if the level it's for won't load
+  def _apply(self, code:int, sub:int, lvl:int, val:int ):
+    
+    # Character-wide
+    if code == _J_XP:
+      self.data[_XP] = val
+    elif code == _J_CURRENCY:
+      self.data[_CURRENCY][sub] = val
+    elif code == _J_DEATH:
+      self.data[_DEATH][sub] = val
+    elif code == _J_LEVEL:
+      self._use_level( val )
+    
+    # Level-specific
+    elif code == _J_HP:
+      self._level(lvl)[_LV_HP][sub] = val
+    elif code == _J_HD:
+      self._level(lvl)[_LV_HD][sub] = val
+    elif code == _J_SPELL:
+      self._level(lvl)[_LV_SPELLS][_SPELLS_CURR][sub] = val
+    elif code == _J_ITEM:
+      self._level(lvl)[_LV_ITEMS][_ITEMS_CURR][sub] = val
+    
+    else:
+      raise ValueError('Unknown field')
+  
+  # Record a change in the journal.  Level-specific fields are for the current level.
+  def _log(self, code:int, sub:int, val:int ):
+    self._journal.log( code, sub, self.current_level, val )
+  
+  # Record every value in an array/bytearray
+  def _log_all(self, code:int, a ):
+    for i in range(len(a)):
+      self._log( code, i, a[i] )
+  
+  # Record everything about the current level that can change in play
+  def _log_level(self):
+    d = self.data
+    self._log_all( _J_HP, d[_HP] )
+    self._log_all( _J_HD, d[_HD] )
+    self._log_all( _J_SPELL, d[_SPELLS][_SPELLS_CURR] )
+    self._log_items()
+  
+  # Record the charges on every item in the current level
+  def _log_items(self):
+    self._log_all( _J_ITEM, self.data[_ITEMS][_ITEMS_CURR] )
+  
+  def _load_base(self):
     
     # File operations
     try:
       
       # The stats file
       f = self.dir / CHAR_STATS
+      recover_save( self.dir )
       
       # Update the RTC based on the file time (if newer)
-      uts = self.hal.rtc.uts
-      ts = max( f.stat()[7:10] )
-      if ts > uts():
-        uts( ts )
-        print(f'Set RTC based on {self.dir.name}: {ts}')
+      js = f.stat()
+      _rtc_from_file( self.hal.rtc, js, self.dir )
+      
+      # Use the binary copy instead, if it's up to date
+      if self._load_bin( js ):
+        return
       
       # Load the file
-      with f.open( 'r' ) as fd:
-        fs = json.load( fd )
+      # Levels get kept as JSON as they're read (see _json_hooks()), so the whole file never exists as dicts at once
+      with f.open( 'rb' ) as fd:
+        fs = _char_json.load( fd, self._json_hooks(), _LAZY_PATHS )
       
     except OSError as e:
       if e.errno == errno.ENOENT:
@@ -207,13 +429,13 @@ class Character:
       else:
         raise CharacterError(f'Could not open save file: {errno.errorcode[e.errno]}')
     
-    del uts, ts, f, fd
+    del js, f, fd
     gc_collect()
     #print(fs)
     
     # Name
     try:
-      name = str( fs.get('name') )[:_MAX_NAMELEN]
+      name = str( fs.get('name') )[:MAX_NAMELEN]
     except ( ValueError, TypeError ) as e:
       raise CharacterError('Invalid name')
     if len(name) == 0:
@@ -236,7 +458,7 @@ class Character:
     # Version
     try:
       ver = int( fs.get('version',0) ) # TODO: Remove default
-    except ( ValueError, TypeError ) as e:
+    except ( ValueError, TypeError, OverflowError ) as e:
       raise CharacterError('Invalid version')
     if ver is None:
       raise CharacterError('No version given')
@@ -251,7 +473,7 @@ class Character:
     # Version 0 doesn't have a separate data section
     # TODO: Remove this once all savefiles have been converted
     if ver == 0:
-      loader( fs )
+      loader( fs, name )
       return
     
     # Get and process the data
@@ -260,227 +482,43 @@ class Character:
       raise CharacterError('Invalid data section')
     loader( data, name )
   
+  # Converters for _char_json.load(), for arrays of things that might be numerous
+  # Levels only need their names until they're used, so their spells and items get dropped as they're read, and each level is kept as its JSON
+  def _json_hooks(self) -> dict:
+    return {
+      'data/levels' : self._lazy_level,
+      'data/levels/spells' : lambda i, sp : None,
+      'data/levels/items' : lambda i, it : None,
+      'charges' : self._load_item, # v0
+    }
+  
   # Set up self.data from v0 savefile
-  def _load_0(self, fs ):
-    
-    # Name
-    try:
-      name = str( fs.get('name') )[:_MAX_NAMELEN]
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid name')
-    if len(name) == 0:
-      raise CharacterError('No name given')
+  # Much like a v1 savefile with a single level, but all at the top
+  def _load_0(self, fs, name ):
     
     # Title
     try:
-      title = str( fs.get('title') )[:_MAX_TITLELEN]
+      title = str( fs.get('title') )[:MAX_TITLELEN]
     except ( ValueError, TypeError ) as e:
       raise CharacterError('Invalid title')
     
-    # XP
-    try:
-      xp = int( fs.get('xp',0) )
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid XP')
-    if not 0 <= xp <= _MAX_XP:
-      raise CharacterError('Invalid XP')
-    
-    # Get and validate currency
-    try:
-      gp = (
-        int( fs.get('copper',0) ),
-        int( fs.get('silver',0) ),
-        int( fs.get('electrum',0) ),
-        int( fs.get('gold',0) ),
-        int( fs.get('platinum',0) ),
-      )
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid currency')
-    if not all([ 0 <= x <= _MAX_CURRENCY for x in gp ]):
-      raise CharacterError('Invalid currency value')
-    currency = array( 'H', gp ) # Unsigned short (2 bytes)
-    del gp
-    
-    # Get and validate hit dice
-    hdf = fs.get('hitdice')
-    if hdf is None:
-      raise CharacterError('Missing hitdice')
-    if type(hdf) is not dict:
-      raise CharacterError('Invalid hitdice')
-    try:
-      mx = int( hdf.get('max') )
-      cur = int( hdf.get('current',mx) )
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid hitdice')
-    if not 0 <= cur <= mx <= _MAX_HITDICE:
-      raise CharacterError('Invalid hitdice')
-    hd = bytearray(( cur, mx ))
-    del hdf
-    
-    # Get and validate HP
-    hpf = fs.get( 'hp' )
-    if hpf is None:
-      raise CharacterError('Missing hp')
-    if type(hpf) is not dict:
-      raise CharacterError('Invalid hp')
-    try:
-      mx = int( hpf.get('max') )
-      cur = int( hpf.get('current',mx) )
-      temp = int( hpf.get('temporary',0) )
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid hp')
-    if not 0 <= cur <= mx <= _MAX_HP:
-      raise CharacterError('Invalid hp')
-    if not 0 <= temp <= _MAX_HP:
-      raise CharacterError('Invalid temporary hp')
-    hp = array('H', ( # Unsigned short (2 bytes)
-      cur,
-      mx,
-      temp,
-      temp,
-    ))
-    del hpf
-    
-    # Get and validate spells
-    spf = fs.get( 'spells', [] )
-    if type(spf) is not list:
-      raise CharacterError('Invalid spell slots list')
-    num_spells = min( _MAX_SPELL_LEVELS, len(spf) )
-    sp_curr = bytearray(num_spells)
-    sp_max = bytearray(num_spells)
-    for i in range(num_spells):
-      if type(spf[i]) is not dict:
-        raise CharacterError( f'Bad spell slot #{i+1}' )
-      try:
-        mx = int( spf[i].get('max') )
-        cur = int( spf[i].get( 'current', mx ) ) # Default to full if not specified
-      except ( ValueError, TypeError ) as e:
-        raise CharacterError( f'Bad spell slot #{i+1}' )
-      if not 0 <= cur <= mx <= _MAX_SPELLSLOTS:
-        raise CharacterError( f'Bad spell slot #{i+1}' )
-      sp_curr[i] = cur
-      sp_max[i] = mx
-    del spf
-    
-    # Get and validate charges
-    itf = fs.get( 'charges', [] )
-    if type(itf) is not list:
-      raise CharacterError( 'Invalid charges list' )
-    ch = [None] * min( _MAX_N_ITEMS, len(itf) )
-    for i, c in enumerate( itf[:_MAX_N_ITEMS] ):
-      if type(c) is not dict:
-        raise CharacterError( f'Bad charge #{i+1}' )
-      try:
-        nm = str( c.get('name') )[:_MAX_ITEMNAME_LEN]
-        mx = int( c.get('max',0) )
-        cur = int( c.get('current',mx) )
-      except ( ValueError, TypeError ) as e: # Invalid datatype
-        raise CharacterError( f'Bad charge format #{i+1}' )
-      if not 0 <= mx <= _MAX_ITEM_LEVEL: # Max level is ok?
-        raise CharacterError( f'Bad charge max level #{i+1}' )
-      if not 0 <= cur <= _MAX_ITEM_LEVEL: # Current level is ok?
-        raise CharacterError( f'Bad charge current level #{i+1}' )
-      if mx and cur > mx: # Current is not more than max (if max is set)?
-        raise CharacterError( f'Bad charge #{i+1}' )
-      rstf = c.get( 'reset', [] )
-      if type(rstf) is not list:
-        raise CharacterError( f'Charge #{i+1} has invalid reset' )
-      r = {
-        'sr' : _ITEM_RESET_SR,
-        'lr' : _ITEM_RESET_LR,
-        'dawn' : _ITEM_RESET_DAWN,
-      }
-      ch[i] = [
-        cur,
-        mx,
-        sum([ r.get( x, 0 ) for x in rstf ]), # Reset bitfield
-        nm
-      ]
-    del itf, r, rstf
-    
-    # Get and validate death
-    df = fs.get( 'death', {} )
-    if type(df) is not dict:
-      raise CharacterError( 'Invalid death section' )
-    di = { 'stable':_DEATH_STATUS_OK, 'saves':_DEATH_STATUS_SV, 'dead':_DEATH_STATUS_DD }
-    try:
-      d = bytearray([
-        di.get( df.get('status','stable'), _DEATH_STATUS_OK ),
-        int( df.get('successes',0) ),
-        int( df.get('failures',0) ),
-      ])
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError( 'Invalid death section' )
-    if not 0<= d[ _DEATH_OK ] <= 3:
-      raise CharacterError( 'Invalid number of successful death saves' )
-    if not 0<= d[ _DEATH_NG ] <= 3:
-      raise CharacterError( 'Invalid number of failed death saves' )
-    del df, di
-    
     # Assemble
-    self.levels = [(title, hp, hd, ( sp_curr, sp_max ), ch)]
-    self.current_level = 0
-    self.name = name
-    self.data = [
-      name,
-      title,
-      xp,
-      currency,
-      hp,
-      hd,
-      ( sp_curr, sp_max ),
-      ch,
-      d,
-    ]
+    xp, currency, d = self._load_common( fs, _sch.CURRENCY_V0 )
+    self._assemble( name, xp, currency, d, 0, [ self._load_level( fs, title, fs.get( 'charges', [] ) ) ] )
+  
+  # Get and validate XP, currency and death, which only differ between v0 and v1 in where the currency is
+  # Returns ( xp, currency, death )
+  def _load_common(self, data, cur_sch ) -> tuple[ int, array, bytearray ]:
+    return (
+      _section( data, _sch.XP )[0],
+      array( 'H', _section( data, cur_sch ) ), # Unsigned short (2 bytes)
+      bytearray( _section( data, _sch.DEATH ) ),
+    )
   
   # Set up self.data from v1 savefile
   def _load_v1(self, data, name ):
     
-    # XP
-    try:
-      xp = int( data.get('xp',0) )
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid XP')
-    if not 0 <= xp <= _MAX_XP:
-      raise CharacterError('Invalid XP')
-    
-    # Get and validate currency
-    gpf = data.get( 'currency', {} )
-    if not type(gpf) is dict:
-      raise CharacterError('Invalid currency section')
-    try:
-      gp = (
-        int( gpf.get('copper',0) ),
-        int( gpf.get('silver',0) ),
-        int( gpf.get('electrum',0) ),
-        int( gpf.get('gold',0) ),
-        int( gpf.get('platinum',0) ),
-      )
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid currency')
-    if not all([ 0 <= x <= _MAX_CURRENCY for x in gp ]):
-      raise CharacterError('Invalid currency value')
-    currency = array( 'H', gp ) # Unsigned short (2 bytes)
-    del gp, gpf
-    
-    # Get and validate death
-    df = data.get( 'death', {} )
-    if type(df) is not dict:
-      raise CharacterError( 'Invalid death section' )
-    di = { 'stable':_DEATH_STATUS_OK, 'saves':_DEATH_STATUS_SV, 'dead':_DEATH_STATUS_DD }
-    try:
-      d = bytearray([
-        di.get( df.get('status','stable'), _DEATH_STATUS_OK ),
-        int( df.get('successes',0) ),
-        int( df.get('failures',0) ),
-      ])
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError( 'Invalid death section' )
-    if not 0<= d[ _DEATH_OK ] <= 3:
-      raise CharacterError( 'Invalid number of successful death saves' )
-    if not 0<= d[ _DEATH_NG ] <= 3:
-      raise CharacterError( 'Invalid number of failed death saves' )
-    del df, di
+    xp, currency, d = self._load_common( data, _sch.CURRENCY )
     
     # Level
     clname = data.get('currentLevel') # Expecting a string matching a level name
@@ -490,8 +528,8 @@ class Character:
     if len(lvf) == 0:
       raise CharacterError('No levels defined')
     #
-    # Process all the levels
-    levels = [ self._load_level_v1(x) for x in lvf ]
+    # All the levels have already been kept as JSON, as they were read
+    levels = lvf
     #
     # Figure out which index is the current level
     lvi = None
@@ -505,6 +543,32 @@ class Character:
     if lvi is None:
       raise CharacterError('currentLevel does not match any level name')
     #
+    # Only the current level gets fully loaded now.  The rest wait for switch_level().
+    levels[lvi] = self._loaded( levels[lvi] )
+    #
+    # Assemble / capture
+    self._assemble( name, xp, currency, d, lvi, levels )
+  
+  # Load from the binary savefile (see _char_bin.py), if it's at least as new as stats.json
+  # js: stat() of stats.json
+  # Returns bool indicating success.  On failure, stats.json should be loaded instead.
+  def _load_bin(self, js ) -> bool:
+    f = _fresh_bin( self.dir, js )
+    if f is None:
+      return False
+    try:
+      self._assemble( *_char_bin.load( f, js[6] ) )
+    except OSError:
+      return False
+    except ValueError as e:
+      print(f'Ignoring {CHAR_STATS_BIN}: {e}')
+      return False
+    print('Savefile: binary')
+    return True
+  
+  # Set up self.data etc. from loaded (and validated) fields
+  def _assemble(self, name, xp, currency, d, lvi, levels ):
+    
     # Output
     lv = levels[lvi]
     
@@ -520,123 +584,60 @@ class Character:
       lv[_LV_HP],     # array - passed as reference
       lv[_LV_HD],     # bytearray - passed as reference
       lv[_LV_SPELLS], # tuple - passed as reference
-      lv[_LV_ITEMS],  # list - passed as reference
+      lv[_LV_ITEMS],  # tuple - passed as reference
       d,
     ]
   
+  # Keep level i from a v1 savefile as the JSON it was read from, until it's needed
+  # Only the name gets checked for now.  The rest is checked by _loaded().
+  # Returns ( name, raw )
+  def _lazy_level(self, i:int, lvl, raw:bytes ) -> tuple[ str, bytes ]:
+    return ( _level_name( lvl ), raw )
+  
+  # Returns level lv fully loaded, from its JSON if it's been kept as that (see _lazy_level())
+  # Raises CharacterError if it turns out to be invalid
+  def _loaded(self, lv:tuple ) -> tuple:
+    if type( lv[_LV_RAW] ) is not bytes:
+      return lv
+    try:
+      lvl = _char_json.load( BytesIO( lv[_LV_RAW] ), { 'items' : self._load_item } )
+    except ValueError: # Shouldn't happen: it was valid JSON when it was read
+      raise CharacterError('Invalid level data')
+    return self._load_level_v1( lvl )
+  
+  # Returns level i, loading it fully first if it hasn't been needed yet
+  # Raises CharacterError if it turns out to be invalid
+  def _level(self, i:int ) -> tuple:
+    lv = self._loaded( self.levels[i] )
+    self.levels[i] = lv
+    return lv
+  
   # Load and validate a level section from a v1 savefile
   # Returns the level-tuple ( name, hp, hd, spells, items )
-  def _load_level_v1(self, lvl ) -> tuple[ str, array, bytearray, tuple[bytearray,bytearray], list ]:
-    
-    # Validate level object itself
-    if not type(lvl) is dict:
-      raise CharacterError('Invalid level data')
+  def _load_level_v1(self, lvl ) -> tuple[ str, array, bytearray, tuple[bytearray,bytearray], tuple ]:
+    return self._load_level( lvl, _level_name( lvl ), lvl.get( 'items', [] ) )
+  
+  # Validate and convert the rest of a level
+  # lvl: dict with the level's hp, hitdice and spells
+  # items: The level's items, already converted by _load_item() as they were read
+  # Returns the level-tuple ( name, hp, hd, spells, items )
+  def _load_level(self, lvl, name:str, items ) -> tuple[ str, array, bytearray, tuple[bytearray,bytearray], tuple ]:
     
-    # Get name
-    name = lvl.get('name')
-    if name is None:
-      raise CharacterError('No level name given')
-    try:
-      name = str(name)[:_MAX_TITLELEN]
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid level name')
-    
-    # Get and validate HP
-    hpf = lvl.get( 'hp' )
-    if hpf is None:
-      raise CharacterError('Missing hp')
-    if type(hpf) is not dict:
-      raise CharacterError('Invalid hp')
-    try:
-      mx = int( hpf.get('max') )
-      cur = int( hpf.get('current',mx) )
-      temp = int( hpf.get('temporary',0) )
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid hp')
-    if not 0 <= cur <= mx <= _MAX_HP:
-      raise CharacterError('Invalid hp')
-    if not 0 <= temp <= _MAX_HP:
-      raise CharacterError('Invalid temporary hp')
-    hp = array('H', ( # Unsigned short (2 bytes)
-      cur,
-      mx,
-      temp,
-      temp,
-    ))
-    del hpf
-    
-    # Get and validate hit dice
-    hdf = lvl.get('hitdice')
-    if hdf is None:
-      raise CharacterError('Missing hitdice')
-    if type(hdf) is not dict:
-      raise CharacterError('Invalid hitdice')
-    try:
-      mx = int( hdf.get('max') )
-      cur = int( hdf.get('current',mx) )
-    except ( ValueError, TypeError ) as e:
-      raise CharacterError('Invalid hitdice')
-    if not 0 <= cur <= mx <= _MAX_HITDICE:
-      raise CharacterError('Invalid hitdice')
-    hd = bytearray(( cur, mx ))
-    del hdf
+    hp = array( 'H', _section( lvl, _sch.HP ) ) # Unsigned short (2 bytes)
+    hd = bytearray( _section( lvl, _sch.HITDICE ) )
     
-    # Get and validate spells
+    # Spells
     spf = lvl.get( 'spells', [] )
     if type(spf) is not list:
       raise CharacterError('Invalid spell slots list')
-    num_spells = min( _MAX_SPELL_LEVELS, len(spf) )
-    sp_curr = bytearray(num_spells)
-    sp_max = bytearray(num_spells)
-    for i in range(num_spells):
-      if type(spf[i]) is not dict:
-        raise CharacterError( f'Bad spell slot #{i+1}' )
-      try:
-        mx = int( spf[i].get('max') )
-        cur = int( spf[i].get( 'current', mx ) ) # Default to full if not specified
-      except ( ValueError, TypeError ) as e:
-        raise CharacterError( f'Bad spell slot #{i+1}' )
-      if not 0 <= cur <= mx <= _MAX_SPELLSLOTS:
-        raise CharacterError( f'Bad spell slot #{i+1}' )
-      sp_curr[i] = cur
-      sp_max[i] = mx
-    del spf
-    
-    # Get and validate items
-    itf = lvl.get( 'items', [] )
-    if type(itf) is not list:
+    spf = spf[:MAX_SPELL_LEVELS]
+    sp_curr = bytearray( len(spf) )
+    sp_max = bytearray( len(spf) )
+    for i in range( len(spf) ):
+      sp_curr[i], sp_max[i] = _section( spf[i], _sch.SPELL, f' #{i+1}' )
+    
+    if type(items) is not list:
       raise CharacterError( 'Invalid items list' )
-    it = [None] * min( _MAX_N_ITEMS, len(itf) )
-    for i, c in enumerate( itf[:_MAX_N_ITEMS] ):
-      if type(c) is not dict:
-        raise CharacterError( f'Bad item #{i+1}' )
-      try:
-        nm = str( c.get('name') )[:_MAX_ITEMNAME_LEN]
-        mx = int( c.get('max',0) )
-        cur = int( c.get('current',mx) )
-      except ( ValueError, TypeError ) as e: # Invalid datatype
-        raise CharacterError( f'Bad item format #{i+1}' )
-      if not 0 <= mx <= _MAX_ITEM_LEVEL: # Max level is ok?
-        raise CharacterError( f'Bad item max level #{i+1}' )
-      if not 0 <= cur <= _MAX_ITEM_LEVEL: # Current level is ok?
-        raise CharacterError( f'Bad item current level #{i+1}' )
-      if mx and cur > mx: # Current is not more than max (if max is set)?
-        raise CharacterError( f'Bad item #{i+1}' )
-      rstf = c.get( 'reset', [] )
-      if type(rstf) is not list:
-        raise CharacterError( f'Item #{i+1} has invalid reset' )
-      r = {
-        'sr' : _ITEM_RESET_SR,
-        'lr' : _ITEM_RESET_LR,
-        'dawn' : _ITEM_RESET_DAWN,
-      }
-      it[i] = [ # [ current, max, reset, name ]
-        cur,
-        mx,
-        sum([ r.get( x, 0 ) for x in rstf ]), # Reset bitfield
-        nm
-      ]
-    del itf, r, rstf
     
     # Assemble and return ( name, hp, hd, spells, items )
     return (
@@ -644,71 +645,119 @@ class Character:
       hp,
       hd,
       ( sp_curr, sp_max ),
-      it,
+      _pack_items( items ),
     )
   
+  # Load and validate item i (of a level, or v0 charges)
+  # Returns [ current, max, reset, name ], or None for items past MAX_N_ITEMS, which are ignored
+  def _load_item(self, i:int, c ) -> list:
+    
+    if i >= MAX_N_ITEMS:
+      return None
+    
+    sfx = f' #{i+1}'
+    it = _section( c, _sch.ITEM, sfx )
+    if it[_ITEMS_MAX] and it[_ITEMS_CURR] > it[_ITEMS_MAX]: # Current is not more than max (if max is set)?
+      raise CharacterError( 'Bad item' + sfx )
+    
+    # Reset bitfield
+    rstf = c.get( 'reset', [] )
+    if type(rstf) is not list:
+      raise CharacterError( f'Item{sfx} has invalid reset' )
+    for b, x in enumerate( _sch.RESETS ):
+      if x in rstf:
+        it[_ITEMS_RESET] |= 1 << b
+    
+    it[_ITEMS_NAME] = str( c.get('name') )[:MAX_ITEMNAME_LEN].replace( '\n', ' ' ) # Newlines separate the names in the items tuple
+    return it
+  
   # Extract the level-tuple from the current play data ( name, hp, hd, spells, items )
-  #def _get_level_data(self) -> tuple[ str, array, bytearray, tuple[bytearray,bytearray], list ]:
+  #def _get_level_data(self) -> tuple[ str, array, bytearray, tuple[bytearray,bytearray], tuple ]:
   #  d = self.data
   #  return ( d[_LVNAME], d[_HP], d[_HD], d[_SPELLS], d[_ITEMS] )
   
   # Blindly overwrites f with the save data
-  # Return bool indicating success/failure
-  def _save_file(self, f ) -> bool:
-    s = self.data
-    lvs = self.levels
-    
-    sf = {
-      'name'    : self.name,
-      'version' : 1,
-      'system' : 'dnd-5e',
-      'data'   : {
-        'xp'        : s[_XP],
-        'currency'  : {
-          'copper'  : s[_CURRENCY][_CURRENCY_COPPER],
-          'silver'  : s[_CURRENCY][_CURRENCY_SILVER],
-          'electrum': s[_CURRENCY][_CURRENCY_ELECTRUM],
-          'gold'    : s[_CURRENCY][_CURRENCY_GOLD],
-          'platinum': s[_CURRENCY][_CURRENCY_PLATINUM],
-        },
-        'death' : {
-          'status'    : _DEATH_STATUS_TUPLE[ s[_DEATH][_DEATH_STATUS] ],
-          'successes' :s[_DEATH][_DEATH_OK],
-          'failures'  :s[_DEATH][_DEATH_NG],
-        },
-        'currentLevel' : s[_LVNAME],
-        'levels' : [ # Don't need to update current level from char.data because everything is passed as refs anyway
-          {
-            'name'    : lv[_LV_NAME],
-            'hp'      : dict(zip( ( 'current', 'max', 'temporary' ), lv[_LV_HP][:3] )),
-            'hitdice' : dict(zip( ('current','max'), lv[_LV_HD] )),
-            'spells'  : [
-              dict(zip( ('current','max'), sp )) for sp in 
-              zip( lv[_LV_SPELLS][_SPELLS_CURR], lv[_LV_SPELLS][_SPELLS_MAX] )
-            ],
-            'items' : [ {
-              'name'    : it[_ITEMS_NAME],
-              'current' : it[_ITEMS_CURR],
-              'max'     : it[_ITEMS_MAX],
-              'reset'   : _rst_to_list( it[_ITEMS_RESET] ),
-              } for it in lv[_LV_ITEMS] ],
-          }
-          for lv in lvs
-        ]
-      }
-    }
-    
-    #print(sf)
-    
+  # Returns the number of bytes written, or 0 on failure
+  def _save_file(self, f ) -> int:
     try:
-      with open( f, 'w') as fd:
-        # Micropython (1.26) doesn't support the indent argument for pretty printing
-        json.dump( sf, fd ) #, separators=(',\n', ': ') )
-        
+      with open( f, 'wb' ) as fd:
+        w = _char_json.Writer( fd )
+        self._write_json( w )
+        w.flush()
     except OSError:
-      return False
+      return 0
+    return w.total
+  
+  # Writes the savefile as JSON, a piece at a time
+  # Same layout (and key order) as json.dump() of the dicts this used to build, but without building them
+  def _write_json(self, w ):
+    r = w.raw
+    num = w.num
+    s = self.data
     
-    return True
+    r( b'{"name": ' ); w.text( self.name )
+    r( b', "version": 1, "system": "dnd-5e", "data": {"xp": ' ); num( s[_XP] )
+    
+    cu = s[_CURRENCY]
+    r( b', "currency": {"copper": ' ); num( cu[_CURRENCY_COPPER] )
+    r( b', "silver": ' ); num( cu[_CURRENCY_SILVER] )
+    r( b', "electrum": ' ); num( cu[_CURRENCY_ELECTRUM] )
+    r( b', "gold": ' ); num( cu[_CURRENCY_GOLD] )
+    r( b', "platinum": ' ); num( cu[_CURRENCY_PLATINUM] )
+    
+    d = s[_DEATH]
+    r( b'}, "death": {"status": ' ); r( _DEATH_STATUS_JSON[ d[_DEATH_STATUS] ] )
+    r( b', "successes": ' ); num( d[_DEATH_OK] )
+    r( b', "failures": ' ); num( d[_DEATH_NG] )
+    
+    r( b'}, "currentLevel": ' ); w.text( s[_LVNAME] )
+    r( b', "levels": [' )
+    # Don't need to update current level from char.data because everything is passed as refs anyway
+    for li, lv in enumerate( self.levels ):
+      if li:
+        r( b', ' )
+      
+      # Never loaded, so still exactly as it was read
+      if type( lv[_LV_RAW] ) is bytes:
+        r( lv[_LV_RAW] )
+        continue
+      
+      r( b'{"name": ' ); w.text( lv[_LV_NAME] )
+      
+      hp = lv[_LV_HP]
+      r( b', "hp": {"current": ' ); num( hp[_HP_CURR] )
+      r( b', "max": ' ); num( hp[_HP_MAX] )
+      r( b', "temporary": ' ); num( hp[_HP_TEMP] )
+      hd = lv[_LV_HD]
+      r( b'}, "hitdice": {"current": ' ); num( hd[_HD_CURR] )
+      r( b', "max": ' ); num( hd[_HD_MAX] )
+      
+      r( b'}, "spells": [' )
+      sc = lv[_LV_SPELLS][_SPELLS_CURR]
+      sm = lv[_LV_SPELLS][_SPELLS_MAX]
+      for i in range( len(sc) ):
+        r( b', {"current": ' if i else b'{"current": ' ); num( sc[i] )
+        r( b', "max": ' ); num( sm[i] ); r( b'}' )
+      
+      r( b'], "items": [' )
+      it = lv[_LV_ITEMS]
+      for i, nm in enumerate( _item_names( it ) ):
+        r( b', {"name": ' if i else b'{"name": ' ); w.text( nm )
+        r( b', "current": ' ); num( it[_ITEMS_CURR][i] )
+        r( b', "max": ' ); num( it[_ITEMS_MAX][i] )
+        r( b', "reset": [' )
+        bf = it[_ITEMS_RESET][i]
+        sep = False
+        for bit, x in enumerate( _RESETS_JSON ):
+          if bf & ( 1 << bit ):
+            if sep:
+              r( b', ' )
+            r( x )
+            sep = True
+        r( b']}' )
+      r( b']}' )
+    
+    r( b']}}' )
   
   def switch_level(self, level:int, show=True ):
     
@@ -717,8 +766,13 @@ class Character:
       return
     
     # Get level tuples for comparison
+    # The new one may not have been loaded yet, and may turn out to be invalid
+    try:
+      new = self._level( level )
+    except CharacterError as e:
+      print(f'Could not switch to {self.levels[level][_LV_NAME]}: {e}')
+      return
     old = self.levels[self.current_level]
-    new = self.levels[level]
     
     print(f'SWITCHING {old[_LV_NAME]} => {new[_LV_NAME]}')
     print('curr', old )
@@ -738,45 +792,55 @@ class Character:
     
     # Transfer items
     #
-    # We need to mangle the items to prevent double-counting.
-    # Make a reduced copy of the items to prevent mangling the real ones
-    olditems = [ [ x[_ITEMS_NAME], x[_ITEMS_CURR], x[_ITEMS_MAX] ] for x in old[_LV_ITEMS] ]
-    for ni in new[_LV_ITEMS]:
+    # We need to mangle the old names to prevent double-counting.
+    # The list from _item_names() is a copy, so mangling it doesn't touch the real ones
+    oldnames = _item_names( old[_LV_ITEMS] )
+    oldcurr = old[_LV_ITEMS][_ITEMS_CURR]
+    newcurr = new[_LV_ITEMS][_ITEMS_CURR]
+    newmax = new[_LV_ITEMS][_ITEMS_MAX]
+    for i, nm in enumerate( _item_names( new[_LV_ITEMS] ) ):
       
       # If the (new) item doesn't have a name, don't try to transfer anything
-      if ni[_ITEMS_NAME] == '':
+      if nm == '':
         continue
       
       # Step through old item list, looking for first name match
-      for oi in olditems:
-        if oi[0] == ni[_ITEMS_NAME]: # If we have a match
-          ni[_ITEMS_CURR] = min( oi[1], ni[_ITEMS_MAX] )
-          oi[0] = '' # Prevent matching again (in case of > 1 new item with same name)
-          break      # Prevent continuing (in case of > 1 old item with the same name)
+      for j in range(len(oldnames)):
+        if oldnames[j] == nm: # If we have a match
+          newcurr[i] = min( oldcurr[j], newmax[i] )
+          oldnames[j] = '' # Prevent matching again (in case of > 1 new item with same name)
+          break            # Prevent continuing (in case of > 1 old item with the same name)
     
     print('merged', new )
     print()
     
-    # new data into self.data
-    data = self.data
-    data[_LVNAME] = new[_LV_NAME]
-    data[_HP] = new[_LV_HP]
-    data[_HD] = new[_LV_HD]
-    data[_SPELLS] = new[_LV_SPELLS]
-    data[_ITEMS] = new[_LV_ITEMS]
+    # new data into self.data, and change self.current_level
+    self._use_level( level )
+    self._log( _J_LEVEL, 0, level )
     
     # Long rest also triggers save, but doesn't hurt to do it here too
     self.save()
     
-    # change self.current_level
-    self.current_level = level
+    # Cached text is for the old level
+    sprites.clear()
     
     # long rest
-    self.long_rest(show=False)
+    self.long_rest(show=False) # Journals everything about the new level
     
     # Recreate the UI
     self._playscreen(show=show)
   
+  # Point self.data at the given level, and make it current
+  def _use_level(self, level:int ):
+    new = self._level( level )
+    data = self.data
+    data[_LVNAME] = new[_LV_NAME]
+    data[_HP] = new[_LV_HP]
+    data[_HD] = new[_LV_HD]
+    data[_SPELLS] = new[_LV_SPELLS]
+    data[_ITEMS] = new[_LV_ITEMS]
+    self.current_level = level
+  
   # Constructs the play screen and menus
   def activate(self):
     
@@ -785,7 +849,15 @@ class Character:
       raise RuntimeError('Tried to activate an already-active character')
     
     # Set up the saver (continuously runs as an async task)
-    self._saver = DeferredTask( timeout=_SAVE_TIMEOUT, callback=self.save_now )
+    # Saves come sooner if the battery's already low
+    hal = self.hal
+    self._sched.set_lowbatt( hal.batt_low.is_set() and hal.batt_discharge.is_set() )
+    self._saver = DeferredTask( timeout=self._sched.window, callback=self.save_now )
+    self._compactor = DeferredTask( timeout=_COMPACT_TIMEOUT, callback=self.compact )
+    
+    # Anything that couldn't be saved last time gets another go
+    if self._dirty:
+      self.save()
     
     # We are active
     self._active = True
@@ -794,22 +866,30 @@ class Character:
     self._playscreen()
   
   # Undoes things that were done by activate() and triggers a save, if needed
-  def destroy(self):
+  # Returns whether everything got saved.  If not, compact() can be tried again later.
+  def destroy(self) -> bool:
     
-    # Make sure everything is saved
-    if self._dirty:
-      self.save_now()
+    # Make sure everything is saved, into stats.json
+    ok = self.compact()
+    print(f'Save stats: {self._sched.stats()}')
     
     # Shut this down cleanly and permit GC
     if self._saver is not None:
       self._saver.destroy()
       self._saver = None
+    if self._compactor is not None:
+      self._compactor.destroy()
+      self._compactor = None
     
     # Tidy up UI elements
     self._cleanup_ui()
     
+    # Cached text belongs to this character
+    sprites.clear()
+    
     # Deactivate
     self._active = False
+    return ok
   
   # Constructs menus for stable playstate
   def _playscreen(self, show=True ):
@@ -892,44 +972,133 @@ class Character:
     return self._dirty
   
   # Save now, wherever we can, regardless of whether we need to
-  def save_now(self) -> bool:
+  # Changes get appended to the journal.  If compact is set (or the journal is getting long),
+  # everything gets written to stats.json instead, and the journal is deleted.
+  # Each save is timed, to set how long the saver waits before the next one (see _char_sched.py).
+  def save_now(self, compact:bool=False ) -> bool:
     
     # If the proper directory is missing, switch to the internal directory
     if not self.dir.is_dir():
       self.dir = Path(INTERNAL_SAVEDIR) / self.dir.name
       self.dir.mkdir(parents=True, exist_ok=True)
       print(f'Moved save location to internal because SD went bad')
+      compact = True # No stats.json here to journal against
     
     # If the SD card comes back, gadget.py will update our .dir property directly
     
-    # The file path to save to, as a string
-    f = str( self.dir / CHAR_STATS )
-    
-    # Success/failure tracker
-    ok  = True
+    # Skip the writes and syncs if everything's the same as the last save (eg. a value changed and then changed back)
+    # Unless we're compacting and there's a journal: then the files need to change even though the data hasn't
+    dg = self._digest()
+    if dg is not None and dg == self._saved_digest and self.dir == self._saved_dir and not ( compact and self._journal.size ):
+      self._journal.pending = bytearray() # Whatever these changed, it's been changed back
+      self._saved()
+      self._sched.skipped()
+      print('Nothing changed.  Save skipped.')
+      return True
+    
+    t = ticks_ms()
+    ok, n, compacted = self._write( compact )
+    w = self._sched.record( ticks_diff( ticks_ms(), t ), n, compacted, ok )
+    if self._saver is not None:
+      self._saver.timeout = w
+    if ok:
+      self._committed( dg )
+    return ok
+  
+  # Everything that gets saved, as one number.  See _char_bin.digest().
+  # None if it can't be worked out, in which case saves always happen.
+  def _digest(self):
+    try:
+      return _char_bin.digest( self.name, self.data, self.levels, self.current_level )
+    except ( ValueError, OverflowError ):
+      return None
+  
+  # What's on disk (in self.dir) now matches the digest dg
+  def _committed(self, dg:int ):
+    self._saved_digest = dg
+    self._saved_dir = self.dir
+  
+  # Does the work for save_now()
+  # Returns ( success, bytes written, whether it went to stats.json )
+  def _write(self, compact:bool ) -> tuple[bool,int,bool]:
     
-    # Save out the file, temporarily preserving the previous one
-    ok = ok and self._save_file( f + '.new' )
+    # The file paths to save to, as strings
+    f = str( self.dir / CHAR_STATS )
+    fn = str( self.dir / CHAR_STATS_NEW )
+    fj = str( self.dir / CHAR_JOURNAL )
+    t = ticks_ms()
+    
+    # Usually, just append to the journal
+    j = self._journal
+    n = len(j.pending)
+    if not compact and j.flush( fj, f ) and try_sync() and j.size < _JOURNAL_MAX:
+      self._saved()
+      print(f'Saved to journal. {j.size} bytes, {ticks_diff( ticks_ms(), t )} ms')
+      return True, n, False
+    
+    # Write the file once, alongside the previous one, and ensure it's saved
+    n = self._save_file( fn )
+    ok = n > 0 and try_sync()
+    
+    # Then swap it in
+    # If the power goes before this, the old file is intact.  If it goes during, the new one is complete.
+    # Either way, recover_save() sorts it out at the next load.
+    # The new file includes everything in the journal, so the journal goes first: replaying it over the old file would be fine, but over the new one it could roll back anything that wasn't journalled yet.
+    if ok:
+      j.discard( fj )
+      j.pending = bytearray()
+      try:
+        os.rename( fn, f )
+      except OSError:
+        ok = False
     
-    # Ensure the new file is saved
-    ok = ok and try_sync()
+    # Binary copy, written after the JSON so that it's at least as new
+    # Not fatal if it fails: a stale or damaged copy just gets ignored at load
+    if ok:
+      n += _char_bin.save( str( self.dir / CHAR_STATS_BIN ), f, self.name, self.data, self.levels, self.current_level )
     
-    # Replace the old file
-    ok = ok and self._save_file( f )
     ok = ok and try_sync()
     
     if not ok:
-      return False
+      return False, n, True
     
-    self._saver.untouch()
-    self._dirty = False
+    self._saved()
+    if self._compactor is not None:
+      self._compactor.untouch()
     
-    print('Saved.')
+    print(f'Saved. {n} bytes, {ticks_diff( ticks_ms(), t )} ms')
+    return True, n, True
+  
+  # Nothing left unsaved
+  def _saved(self):
+    if self._saver is not None:
+      self._saver.untouch()
+    self._dirty = False
+  
+  # Save everything into stats.json, if it isn't all there already
+  def compact(self) -> bool:
+    if self._dirty or self._journal.size:
+      return self.save_now( compact=True )
     return True
   
+  # Save straight away, if there's anything unsaved.  For when waiting might lose it (eg. the SD card has gone).
+  def flush(self):
+    if self._dirty:
+      self.save_now()
+  
+  # The battery has gone low (True), or is charging again (False)
+  # While it's low, saves happen as soon as they can.  Anything unsaved gets saved now.
+  def set_lowbatt(self, low:bool ):
+    w = self._sched.set_lowbatt( low )
+    if self._saver is not None:
+      self._saver.timeout = w
+    if low:
+      self.flush()
+  
   # Sets the 'dirty' flag and triggers a save to happen in the near future
   def save(self):
     self._saver.touch()
+    self._compactor.touch()
     self._dirty = True
   
   # Simple convenience function getters
@@ -951,16 +1120,10 @@ class Character:
     # Option to do spell slots here?
     
     # Reset all short-rest charges to max
-    for c in st[_ITEMS]:
-      
-      # Zero-max means no maximum.  Don't reset.
-      if c[_ITEMS_MAX] == 0:
-        continue
-      
-      # If it resets on a short rest, reset it
-      if c[_ITEMS_RESET] & _ITEM_RESET_SR:
-        c[_ITEMS_CURR] = c[_ITEMS_MAX]
+    self._recharge( _ITEM_RESET_SR )
     
+    self._log( _J_HD, _HD_CURR, st[_HD][_HD_CURR] )
+    self._log_items()
     self.save()
     
     self.draw_mtx_stable( show=show )
@@ -974,7 +1137,6 @@ class Character:
     # Localise
     st = self.data
     h = st[_HP]
-    cgs = st[_ITEMS]
     
     # Will we need to update the eink after this?
     e:bool = ( h[_HP_TEMP] != 0 ) # If we had temp hp, they're being reset and we need to update
@@ -994,10 +1156,9 @@ class Character:
       st[_SPELLS][_SPELLS_CURR][i] = st[_SPELLS][_SPELLS_MAX][i]
     
     # Reset all long-rest charges to max
-    for c in cgs:
-      if c[_ITEMS_MAX] and c[_ITEMS_RESET] & _ITEM_RESET_LR:
-        c[_ITEMS_CURR] = c[_ITEMS_MAX]
+    self._recharge( _ITEM_RESET_LR )
     
+    self._log_level()
     self.save()
     
     if e:
@@ -1010,14 +1171,23 @@ class Character:
   
   def dawn_reset(self, show=True):
     
-    for c in self.data[_ITEMS]:
-      if c[_ITEMS_MAX] and c[_ITEMS_RESET] & _ITEM_RESET_DAWN:
-        c[_ITEMS_CURR] = c[_ITEMS_MAX]
-    
+    self._recharge( _ITEM_RESET_DAWN )
+    self._log_items()
     self.save()
     
     self.draw_mtx_stable( show=show )
   
+  # Reset to max the charges on every item in the current level that resets on flag (_ITEM_RESET_SR etc.)
+  # Zero-max means no maximum, so those don't get reset
+  def _recharge(self, flag:int ):
+    it = self.data[_ITEMS]
+    cur = it[_ITEMS_CURR]
+    mx = it[_ITEMS_MAX]
+    rst = it[_ITEMS_RESET]
+    for i in range(len(cur)):
+      if mx[i] and rst[i] & flag:
+        cur[i] = mx[i]
+  
   # Gain HP
   # DOES validate
   def heal( self, amt, show=True ):
@@ -1034,11 +1204,12 @@ class Character:
       return
     
     # Can't heal if we're dead
-    if death[_DEATH_STATUS] == _DEATH_STATUS_DD or death[_DEATH_NG] >= _MAX_DEATH_SAVES:
+    if death[_DEATH_STATUS] == _DEATH_STATUS_DD or death[_DEATH_NG] >= MAX_DEATH_SAVES:
       return
     
     # Add the HP, silently capping at HP_MAX
     hp[_HP_CURR] = min( hp[_HP_CURR]+amt, hp[_HP_MAX] )
+    self._log( _J_HP, _HP_CURR, hp[_HP_CURR] )
     
     # If we were in death saves, stabilise
     if death[_DEATH_STATUS] == _DEATH_STATUS_SV:
@@ -1100,6 +1271,7 @@ class Character:
       hp[_HP_ORIGTEMP] = 0
     
     # We've now assigned all necessary HP changes
+    self._log_all( _J_HP, hp )
     self.save()
     
     # Is the overdamage >= max HP?
@@ -1135,13 +1307,14 @@ class Character:
       return
     
     # Assign the new value (clamped to max)
-    hp[_HP_TEMP] = min( val, _MAX_TEMPHP )
+    hp[_HP_TEMP] = min( val, MAX_TEMPHP )
     
     # Are we setting a different level from current?
     if hp[_HP_TEMP] != hp[_HP_ORIGTEMP]:
       hp[_HP_ORIGTEMP] = hp[_HP_TEMP] # Update max temp
       self.draw_eink( show=show ) # Update eink
     
+    self._log_all( _J_HP, hp )
     self.save()
     
     if show:
@@ -1166,6 +1339,7 @@ class Character:
     d[_DEATH_OK] = 0
     d[_DEATH_NG] = 0
     print('Set status to', _DEATH_STATUS_TUPLE[status] )
+    self._log_all( _J_DEATH, d )
     self.save()
     
     # Go
@@ -1192,13 +1366,13 @@ class Character:
       raise RuntimeError('Attempted to enter death save result when not in death saves!')
     
     # Validate
-    if not 0 <= val <= _MAX_DEATH_SAVES:
+    if not 0 <= val <= MAX_DEATH_SAVES:
       return
     
     if success: # Try to change the number of successes
       
       # Can't change successes if we're already dead
-      if d[_DEATH_NG] >= _MAX_DEATH_SAVES:
+      if d[_DEATH_NG] >= MAX_DEATH_SAVES:
         return
       
       d[_DEATH_OK] = val
@@ -1206,11 +1380,11 @@ class Character:
     else: # Try to change the number of failures
       
       # Can't change failures if we've already succeeded
-      if d[_DEATH_OK] >= _MAX_DEATH_SAVES:
+      if d[_DEATH_OK] >= MAX_DEATH_SAVES:
         return
       
       # Are we setting xor unsetting a failure state?
-      update_menu = bool( (d[_DEATH_NG]==_MAX_DEATH_SAVES) ^ (val==_MAX_DEATH_SAVES) )
+      update_menu = bool( (d[_DEATH_NG]==MAX_DEATH_SAVES) ^ (val==MAX_DEATH_SAVES) )
       
       # Update the value
       d[_DEATH_NG] = val
@@ -1220,6 +1394,7 @@ class Character:
         # Regenerate the menus without refreshing the eink
         self._playscreen(show=False)
     
+    self._log_all( _J_DEATH, d )
     self.save()
     self.draw_mtx_saves(show=show)
   
@@ -1239,6 +1414,7 @@ class Character:
     
     # Do it
     self.data[_HP][_HP_CURR] = hp
+    self._log( _J_HP, _HP_CURR, hp )
     self.save()
     self.stabilise() # stabilise() will also call save() if it needs to
   
@@ -1251,11 +1427,12 @@ class Character:
     assert val >= 0
     
     # Set the max
-    d[_HP][_HP_MAX] = min( val, _MAX_HP )
+    d[_HP][_HP_MAX] = min( val, MAX_HP )
     
     # Clamp current to new max
     d[_HP][_HP_CURR] = min( d[_HP][_HP_CURR], d[_HP][_HP_MAX] )
     
+    self._log_all( _J_HP, d[_HP] )
     self.save()
     
     self.draw_eink( show=show )
@@ -1274,6 +1451,7 @@ class Character:
       return
     
     self.data[_HD][_HD_CURR] = val
+    self._log( _J_HD, _HD_CURR, val )
     
     self.save()
   
@@ -1290,6 +1468,7 @@ class Character:
       return
     
     s[_SPELLS_CURR][lvl] = val
+    self._log( _J_SPELL, lvl, val )
     self.save()
     self.draw_mtx_stable(show=show)
   
@@ -1301,19 +1480,22 @@ class Character:
     assert type(val) is int
     #assert val >= 0
     
-    # Get the charge object
-    c = self.data[_ITEMS][chg]
+    # Get the charge's max
+    c = self.data[_ITEMS]
+    mx = c[_ITEMS_MAX][chg]
     
     # Value must always be zero or positive
     if not 0 <= val:
       return
     
     # Is there a max level for _this_ charge, and does the new val violate it?
-    if c[_ITEMS_MAX] and not val <= c[_ITEMS_MAX]:
+    if mx and not val <= mx:
       return
     
     # Silently clamp to (max level for _any_ charge)
-    c[_ITEMS_CURR] = min( val, _MAX_ITEM_LEVEL )
+    c = c[_ITEMS_CURR]
+    c[chg] = min( val, MAX_ITEM_LEVEL )
+    self._log( _J_ITEM, chg, c[chg] )
     
     self.save()
     self.draw_mtx_stable(show=show)
@@ -1322,14 +1504,16 @@ class Character:
   def set_xp(self, xp:int ):
     assert type(xp) is int
     assert xp >= 0
-    self.data[_XP] = min( xp, _MAX_XP ) # Silently clamp maximum
+    self.data[_XP] = min( xp, MAX_XP ) # Silently clamp maximum
+    self._log( _J_XP, 0, self.data[_XP] )
     self.save()
   
   # DOES validate
   def set_currency(self, c:int, val:int ):
     assert type(val) is int
     assert val >= 0
-    self.data[_CURRENCY][c] = min( val, _MAX_CURRENCY ) # Silently clamp maximum
+    self.data[_CURRENCY][c] = min( val, MAX_CURRENCY ) # Silently clamp maximum
+    self._log( _J_CURRENCY, c, self.data[_CURRENCY][c] )
     self.save()
   
   # Sets the needle to the current HP
@@ -1358,8 +1542,8 @@ class Character:
     mtx.clear()
     
     # Go through all charges to update the matrix fb
-    for i,c in enumerate(data[_ITEMS]):
-      mtx.bitmap[i] = num2mtx( c[_ITEMS_CURR] )
+    for i,c in enumerate(data[_ITEMS][_ITEMS_CURR]):
+      mtx.bitmap[i] = num2mtx( c )
     
     # Go through all spell slots to update the matrix fb
     for i,s in enumerate(data[_SPELLS][_SPELLS_CURR]):
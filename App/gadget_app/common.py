@@ -18,9 +18,13 @@ INTERNAL_SAVEDIR = const('/saves')
 # SD directory structure
 SD_ROOT = const('/sd')
 SD_DIR = const('TTRPG')
+SYSTEM_INDEX = const('system.json') # In SD_DIR.  Index of the character directories, and the time.
 #
 CHAR_SUBDIR = const('Characters')
 CHAR_STATS = const('stats.json')
+CHAR_STATS_NEW = const('stats.json.new') # Where stats.json is written, before being renamed over the original
+CHAR_STATS_BIN = const('stats.bin') # Binary copy of stats.json, for fast loading
+CHAR_JOURNAL = const('stats.jnl') # Changes since stats.json was written
 CHAR_HEAD = const('head.pi')
 CHAR_BG = const('background.pi')
 
@@ -36,17 +40,18 @@ class DeferredTask:
     self.timeout = timeout
     self.callback = callback
     self._last_touch = None
+    self._active = True
     self._destroy_trigger = asyncio.ThreadSafeFlag() # This will trigger the async loop to exit safely
     self._timeout_task = asyncio.create_task( self._timeout_watcher(poll) ) # Main loop
-    self._dwt = asyncio.create_task( self._timeout_watcher(poll) ) # Reacts to the kill-trigger
-    self._active = True
+    self._dwt = asyncio.create_task( self._destroy_waiter() ) # Reacts to the kill-trigger
   
   # Run as a polling loop because Task.cancel() doesn't work (as of MP 1.24.1)
+  # So it also checks for itself whether it's been destroyed, and ends within one poll
   async def _timeout_watcher(self, poll:int ):
     sms = asyncio.sleep_ms
     tms = time.ticks_ms
     ttd = time.ticks_diff
-    while True:
+    while self._active:
       await sms( poll )
       
       # Don't do anything if we don't have an active timeout
@@ -27,21 +27,18 @@ from os import urandom
 from .pathlib import Path
 
 # Our stuff
-from .common import CHAR_STATS, SD_ROOT, SD_DIR, CHAR_SUBDIR, INTERNAL_SAVEDIR, HAL_PRIORITY_MENU, HAL_PRIORITY_SHUTDOWN
+from .common import SD_ROOT, SD_DIR, SYSTEM_INDEX, CHAR_SUBDIR, INTERNAL_SAVEDIR, HAL_PRIORITY_MENU, HAL_PRIORITY_SHUTDOWN
 from . import menu
 from .hal import HAL
 from .character import Character, CharacterError
+from . import _charindex
 from ._oledidle import OledIdle
 #from . import _ui
 from . import gfx
+import img
 
 _DEBUG_DISABLE_EINK = const(False)
 
-# Character file info
-MANDATORY_CHAR_FILES = [ # Files that must exist in a character directory for it to be recognised
-  CHAR_STATS,
-]
-
 # In ms.  How often to redraw the OLED idle screen
 _OLED_IDLE_REFRESH = const(500)
 
@@ -51,6 +48,10 @@ _EINK_BLANK_MS = const(15700)
 # Working memory to preallocate for graphics
 _GFX_SCRATCH_SIZE = const(0x2000)
 
+# Party: characters kept loaded after they've been played, for switching straight back to
+_PARTY_MAX = const(4)           # Most to keep, not counting the one in play
+_PARTY_FREE_MIN = const(0x8000) # Forget the least recently played ones if there's less free memory than this, in bytes
+
 # Make this object here because it's used in a few places
 INTERNAL_SAVEDIR = Path(INTERNAL_SAVEDIR)
 
@@ -80,7 +81,10 @@ class Gadget:
     self.file_root = Path( SD_ROOT ) / SD_DIR
     self._charselect_menu = None
     self._chars = [] # Remove need to keep this list in closures, so it can actuaaly be garbage collected
+    self._bad_chars = set() # Directories (as strings) that turned out not to load, so aren't offered again
+    self._index = None # _charindex.CharIndex for the SD card, once we've looked at it
     self.character = None
+    self._party = [] # Characters played since the SD card went in, not counting the current one, most recent first.  Saved, unless saving failed.
     self.sd_ok = asyncio.Event()
     self.sd_gone = asyncio.Event()
     self._sd_mount_attempted = asyncio.Event() # Fires after attempting to mount a present SD, regardless of success
@@ -116,60 +120,37 @@ class Gadget:
     
     self._shutdown.set()
   
-  # Looks at the directory and generates a list of available Character objects
-  def _find_chars(self) -> list[Character]:
+  # Looks at the directory and generates a list of available characters, as CharacterSummary objects
+  # A full Character takes approx 1 to 1.5kB memory, so only gets loaded once chosen (see _set_char_cb())
+  def _find_chars(self) -> list:
     
-    # Directory of character directories
+    # Directory of character directories, and the index of them
     cd = self.file_root / CHAR_SUBDIR
+    if cd.is_dir():
+      self._index = _charindex.CharIndex( self.file_root / SYSTEM_INDEX )
     
-    # If the character dir doesn't exist, use the internal savedir instead
-    if not cd.is_dir():
+    # If the character dir doesn't exist, use the internal savedir instead (not indexed: there'll only be one or two)
+    else:
       cd = INTERNAL_SAVEDIR
+      self._index = None
     
     print( f'Looking for character directories in {str(cd)} ...' )
-    # No iterdir() in pathlib.py from [https://github.com/micropython/micropython-lib/blob/master/python-stdlib/pathlib/pathlib.py]
-    dirs = sorted( cd.glob('*'), key=str )
+    try:
+      chars = _charindex.find( self.hal, cd, self._index, self._bad_chars )
+    except OSError as e: # Directory isn't there (eg. no internal saves yet)
+      print( f'Could not look in {str(cd)}: {e}' )
+      return []
     
-    del cd
+    # Keep anything that's changed for next time
+    self._save_index()
     
-    chars = []
-    #for x in self.file_root.iterdir():
-    for x in dirs:
-      
-      # Have we found a directory?
-      if not x.is_dir():
-        continue
-      
-      # Is everything present that should be?
-      ok = True
-      for f in MANDATORY_CHAR_FILES:
-        if not ( x / f ).is_file():
-          print( f'{f} is not present in /{x.name}/' )
-          ok = False
-      if not ok:
-        continue
-      
-      # Try to load the directory as a Character object
-      # Each one takes approx 1 to 1.5kB memory
-      try:
-        c = Character(
-          hal = self.hal,
-          sd_mounted = self.sd_ok.is_set,
-          chardir = x,
-          sysmenu_factory = self._make_system_submenu,
-          scratchmem = self.scratchmem,
-          enable_eink = (not _DEBUG_DISABLE_EINK)
-        )
-      except CharacterError as e:
-        print( f'Failed to load from /{x.name}/: {str(e)}' )
-        continue
-      
-      # If we're here, we're good
-      print(f'Found: {c.get_name()} ({c.get_title()}) in /{x.name}/')
-      chars.append( c )
-      
     return chars
   
+  # Keep the time (and any changes to the index) for next boot, if the SD card is there
+  def _save_index(self):
+    if self._index is not None and self._sd_is_mounted():
+      self._index.save( self.hal.rtc.uts() )
+  
   # Sets up the character select screen
   def select_character(self):
     
@@ -214,34 +195,116 @@ class Gadget:
     # If the SD card is replugged
     # Call select_character() again (which will destroy this instance and create a new one)
     # Needed because the newly-plugged card may well have different char data
-    self.sd_plug = self.select_character
+    self.sd_plug = self._charselect_replug
     
     # Register the destructor
     self.cleanup = self._cleanup_charselect
   
-  # Pick one of self._chars, set self.character to it, and call play_screen()
+  # Load one of self._chars, set self.character to it, and call play_screen()
   # Destroys self._chars
   def _set_char_cb(self, i:int ):
     
     # Ignore call if the character's directory has gone away
-    if not self._chars[i].dir.is_dir():
+    d = self._chars[i].dir
+    if not d.is_dir():
       return
     
+    t = time.ticks_ms()
+    
+    # Blank out chars object, so the summaries can be collected before loading
+    self._chars = []
+    gc_collect()
+    
+    # Already loaded, if it's been played since the card went in
+    c = self._party_take( d )
+    
+    # Load the character
+    if c is None:
+      try:
+        c = Character(
+          hal = self.hal,
+          sd_mounted = self.sd_ok.is_set,
+          chardir = d,
+          sysmenu_factory = self._make_system_submenu,
+          scratchmem = self.scratchmem,
+          enable_eink = (not _DEBUG_DISABLE_EINK)
+        )
+      except CharacterError as e:
+        
+        # Only the summary was checked before now, so this can happen.  Offer the rest again, without this one.
+        print( f'Failed to load from /{d.name}/: {str(e)}' )
+        self._bad_chars.add( str(d) )
+        self.select_character()
+        return
+    
     # Set the character
-    self.character = self._chars[i]
+    self.character = c
     print('Selected',self.character.get_name() )
     print( self.character.data )
     
-    # Blank out chars object
-    for j, c in enumerate(self._chars):
-      if j == i:
-        continue
-      c.destroy()
-    self._chars = []
-    
     # Launch the play screen constructor
     self.play_screen()
+    print(f'Selected in {time.ticks_diff( time.ticks_ms(), t )} ms')
+  
+  # Switch straight to c, from self._party, without going through the select screen
+  def _party_switch(self, c ):
+    t = time.ticks_ms()
+    
+    # Out of the party first, so that putting the current character in can't push it out
+    if self._party_take( c.dir ) is None: # Forgotten since the menu was made (eg. the SD card has gone)
+      return
+    
+    # Saves the current character, and puts it in the party
+    self.cleanup()
     
+    self.character = c
+    self.play_screen()
+    print(f'Switched to {c.get_name()} in {time.ticks_diff( time.ticks_ms(), t )} ms')
+  
+  # Take the character in directory d out of self._party, to play it
+  # Returns it, or None if it isn't there
+  def _party_take(self, d:Path ):
+    for c in self._party:
+      if c.dir == d:
+        self._party.remove( c )
+        return c
+    return None
+  
+  # Keep c (which has been destroy()ed) for switching back to
+  # Forgets the least recently played, if there are too many or the free heap is getting short
+  # Only the free heap as a whole is checked, not what the party itself is using
+  def _party_keep(self, c ):
+    party = self._party
+    party.insert( 0, c )
+    gc_collect()
+    i = len(party) - 1
+    while i >= 0 and ( len(party) > _PARTY_MAX or gc_mfree() < _PARTY_FREE_MIN ):
+      if self._party_forget( party[i] ):
+        party.pop( i )
+        gc_collect()
+      i -= 1
+  
+  # Forget every character in the party, eg. because the SD card has changed
+  # Except any with changes that still can't be saved
+  def _party_clear(self):
+    self._party = [ c for c in self._party if not self._party_forget( c ) ]
+    gc_collect()
+  
+  # Whether party member c can be forgotten
+  # Its last save may have failed (eg. SD write error), so it's tried again first.  If it fails again, c is kept, so the changes aren't lost.
+  def _party_forget(self, c ) -> bool:
+    if not c.compact():
+      print(f'Party: keeping {c.get_name()}, which has unsaved changes')
+      return False
+    print(f'Party: forgetting {c.get_name()}')
+    return True
+    
+  # The SD card has been replugged while at the select screen
+  # Its characters may have been fixed (or broken) in the meantime, so forget which ones failed
+  def _charselect_replug(self):
+    self._bad_chars.clear()
+    self.select_character()
+  
   def _cleanup_charselect(self):
     self.needle_wander(False)
     self._charselect_menu.destroy()
@@ -285,6 +348,10 @@ class Gadget:
       )
     )
     
+    # Switch straight to a character that's been played already
+    if self._party:
+      smi.append( self._make_party_submenu( smm ) )
+    
     # Adjust brightness
     smi.append(
       menu.SimpleAdjuster( smm, hal,
@@ -304,6 +371,29 @@ class Gadget:
     # Return the completed submenu
     return m
   
+  # Generate the Party submenu (for the System submenu): one entry for each character in self._party
+  def _make_party_submenu(self, parent ) -> menu.SubMenu:
+    hal = self.hal
+    
+    m = menu.SubMenu( parent, hal,
+      prio=HAL_PRIORITY_MENU+3,
+      title='Party'
+    )
+    smm = m.menu
+    smi = smm.items
+    
+    for c in self._party:
+      smi.append(
+        menu.FunctionConfirmer( smm, hal,
+          prio=HAL_PRIORITY_MENU+4,
+          title=c.get_name(),
+          confirmation='Switch character',
+          con_func=lambda c=c: self._party_switch(c) # Default value, because it's in a loop
+        )
+      )
+    
+    return m
+  
   # Sets up the play screen
   def play_screen(self):
     
@@ -326,10 +416,13 @@ class Gadget:
       return
     
     # Make sure everything is saved and UI cleaned up
-    self.character.destroy()
+    if not self.character.destroy():
+      print(f'Could not save {self.character.get_name()}.  Will try again before forgetting it.')
     
-    # Wipe the character object
+    # Keep it loaded, for switching back to, and wipe the character object
+    self._party_keep( self.character )
     self.character = None
+    self.cleanup = LFN
     
     gc_collect()
   
@@ -389,6 +482,8 @@ class Gadget:
       if self._sd_err == 0:
         self.sd_gone.clear()
         self.sd_ok.set()
+        img.forget() # Could be a different card
+        self._party_clear() # Likewise.  Or they may have been edited, or moved from internal flash.
         self.sd_plug()
       
       # Set this to flag the attempt (regardless of pass/fail)
@@ -405,7 +500,14 @@ class Gadget:
       self._sd_mount_attempted.clear()
       self.sd_ok.clear()
       self.sd_gone.set()
+      img.forget() # Cached image info is no longer valid
+      self._index = None # Might not be the same card next time
+      self._party_clear() # Their files have gone
       self.sd_unplug()
+      
+      # Don't wait to save anything unsaved: it goes to internal flash now
+      if self.character is not None:
+        self.character.flush()
   
   # Attempt to mount the SD.  Does all checks and returns result.
   # Attempts to move internal saves out to SD, if applicable
@@ -501,7 +603,7 @@ class Gadget:
           self.character.dir = dest_d
           
           # Force it to save out
-          self.character.save_now()
+          self.character.save_now( compact=True )
           
           # Character.save_now() will change the directory back if it hits problems
           if self.character.dir != dest_d:
@@ -544,6 +646,10 @@ class Gadget:
       # Wait for the battery to go low
       await self.hal.batt_low.wait()
       
+      # Save anything unsaved, and keep saving promptly
+      if self.character is not None:
+        self.character.set_lowbatt(True)
+      
       # Display a warning on the eink
       if self.character is not None: # Currently only have a way to redraw the play screen
         self.character.draw_eink()
@@ -555,6 +661,10 @@ class Gadget:
       # Wait for the battery to start charging
       await self.hal.batt_charge.wait()
       
+      # Back to the usual saving
+      if self.character is not None:
+        self.character.set_lowbatt(False)
+      
       # Remove the warning on the eink
       if self.character is not None: # Currently only have a way to redraw the play screen
         self.character.draw_eink()
@@ -606,6 +716,9 @@ class Gadget:
     oled.text( 'Please wait...', 0,0, 1 )
     oled.show()
     
+    # Keep the time for next boot
+    self._save_index()
+    
     # Unmount SD
     if self._sd_is_mounted():
       vfs.umount( SD_ROOT )
@@ -634,6 +747,9 @@ class Gadget:
     await eink.send()
     et = asyncio.create_task( eink.refresh() )
     
+    # Keep the time for next boot
+    self._save_index()
+    
     # Unmount SD
     if self._sd_is_mounted():
       vfs.umount( SD_ROOT )
@@ -14,6 +14,7 @@ from random import getrandbits, randint
 
 # Our libraries
 import img
+from img import sysfont
 from .common import CHAR_HEAD, CHAR_BG
 
 # ASSETS
@@ -212,29 +213,28 @@ def draw_char_select( fb, chars ):
   # Offset to centre of character head (instead of top left)
   hdos = _CHAR_HEAD_SIZE // 2
   
-  # Truncate text names
-  max_name_len = _CHAR_HEAD_SIZE // 8 # Assume 8px letter width
-  
   for char in chars:
     
     # Is there a headshot?
-    head = ( char.dir / CHAR_HEAD )
-    headok = head.is_file()
+    head = str( char.dir / CHAR_HEAD )
+    headok = char.head and img.exists( head ) # Don't go looking if the directory listing didn't have one
     if headok:
       try:
         x = round( _X + _ARC2_RI*sin(a) -hdos )
         y = round( _Y - _ARC2_RI*cos(a) -hdos )
-        img.blit_onto( fb, x, y, str(head) )
+        img.blit_onto( fb, x, y, head )
       except (RuntimeError, NotImplementedError) as e:
         headok = False
     
     # If no head (that we can use)
     if not headok:
-      txt = char.get_name()[:max_name_len]
-      x = round( _X + _ARC2_RI*sin(a) - (len(txt)*4) )
-      y = round( _Y - _ARC2_RI*cos(a) -4 )
-      fb.rect(x-2, y-2, len(txt)*8 +4, 12, 2, False )
-      fb.rect(x-1, y-1, len(txt)*8 +2, 10, 0, True )
+      txt = sysfont.fit( char.get_name(), _CHAR_HEAD_SIZE ) # Truncate text names
+      w = sysfont.measure( txt )
+      h = sysfont.height
+      x = round( _X + _ARC2_RI*sin(a) - w/2 )
+      y = round( _Y - _ARC2_RI*cos(a) - h/2 )
+      fb.rect(x-2, y-2, w +4, h+4, 2, False )
+      fb.rect(x-1, y-1, w +2, h+2, 0, True )
       fb.text( txt, x,y, 1 )
       
     a += da
@@ -247,8 +247,8 @@ def draw_dead_batt(fb):
   img.load_into( fb.buf, _IMG_DEADBATT )
 
 def render_boot_logo(oled):
-    fb = img.load( _IMG_LOGO_OLED )
-    oled.blit(fb,0,0)
+    with img.load( _IMG_LOGO_OLED, into_pool=True ) as logo:
+      oled.blit(logo.fb,0,0)
     oled.show()
     
 # Render the SD error screen on the oled, with some text.
@@ -257,16 +257,16 @@ def render_sd_error( e:int, oled ):
   oled.fill(0)
   
   # No-SD graphic
-  fb = img.load( _IMG_NOSD )
-  oled.blit(fb,0,0)
+  with img.load( _IMG_NOSD, into_pool=True ) as nosd:
+    oled.blit(nosd.fb,0,0)
   
   # Display message
   lines = _SD_ERRORS[e].split('\n')
-  h = min( len(lines)*8, 32 )
+  h = min( len(lines)*sysfont.height, 32 )
   y = ( 32 - h ) // 2
   for line in lines:
     oled.text( line, 57,y )
-    y += 8
+    y += sysfont.height
   
   oled.show()
 
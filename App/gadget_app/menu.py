@@ -4,6 +4,7 @@
 # T. Lloyd
 # 19 Apr 2026
 
+from img import sysfont
 from .common import DeferredTask
 
 # ROOT MENUS
@@ -278,7 +279,7 @@ class ScrollingOledMenu(OledMenu):
         
         # Add the border if this is the selected entry
         if i == x:
-          oled.rect( 0, (yspacing*x)-3, (len(t)*8)+6,14, 1 )
+          oled.rect( 0, (yspacing*x)-3, sysfont.measure(t)+6,14, 1 )
         
         # Next
         s += 1
@@ -1,3 +1,5 @@
-from .libpi import save_GS2_HMSB as save, load, load_into, blit_onto
-from .fb import FB as FrameBuffer
+from .libpi import save_GS2_HMSB as save, load, load_into, blit_onto, info, exists, forget
+from .pool import pool
+from .sprites import sprites
+from .fb import FB as FrameBuffer, sysfont
 from .utils import MONO_VLSB, GS2_HMSB
@@ -9,8 +9,11 @@
 # TODO:
 # - Implement fonts?
 
+from time import ticks_us, ticks_diff
+from array import array
 from framebuf import FrameBuffer #, GS2_HMSB, GS4_HMSB, GS8, MONO_HLSB, MONO_HMSB, MONO_VLSB, MVLSB, RGB565
 from .utils import f2b
+from .sprites import sprites
   
 class FB(FrameBuffer):
   
@@ -60,21 +63,26 @@ class FB(FrameBuffer):
     super().vline(x,y,len,c)
   
   # Draws text, on a solid background (for contrast, etc.)
-  def label(self, s, x, y, c=1, b=0 ):
+  def label(self, s, x, y, c=1, b=0, font=None ):
     '''
       s : The text to display
       x,y : Upper-left corner of text.  Text will be in same pixel position as text() method.
       c : Colour of text, optional, defaults to 1
       b : Colour of background, optional, defaults to 0
+      font : Optional font.Font to use instead of the builtin 8x8 font (sysfont)
     '''
     
-    w = len(s) * 8
-    h = 8
+    if font is None:
+      font = sysfont
+    w = font.measure(s)
+    h = font.height
     
     self.rect( x-2, y-1, w+4, h+2, b, True )
     self.hline( x-1, y-2, w+2, c=b )
     self.hline( x-1, y+h+1, w+2, c=b )
-    self.text( s, x,y, c )
+    
+    # 2bpp fonts are outlined: blend the outline into the background and fill with the text colour
+    font.write_to( self, s, x, y+font.blh, (c,) if font.bpp == 1 else (b,c,b) )
     
   #
   #def text(self, txt, x, y, c=1, font=''):
@@ -84,4 +92,46 @@ class FB(FrameBuffer):
   #    super().text(txt,x,y,c)
   #    return
     
-    
\ No newline at end of file
+    
+
+# The builtin 8x8 font, with the same layout API as font.Font
+# Lets layout code measure text without assuming a glyph size
+class SysFont:
+  
+  height = 8 # Glyph height, px
+  blh = 8    # Baseline height, px.  write_to() takes the baseline, like Font.
+  bpp = 1
+  
+  # Width of the given text, in px
+  def measure( self, txt, cspacing=1 ) -> int:
+    return len(txt) * 8
+  
+  # Cumulative widths: prefix(txt)[i] is the width of txt[:i]
+  def prefix( self, txt, cspacing=1 ):
+    return array( 'H', range( 0, 8*len(txt)+1, 8 ) )
+  
+  # Longest start of the text that fits in max_px
+  def fit( self, txt, max_px:int, cspacing=1, prefix=None ):
+    n = max( 0, max_px // 8 )
+    return txt if len(txt) <= n else txt[:n]
+  
+  # Draws text with its baseline at y, via the sprite cache
+  # Only the first pallet entry is used
+  def write_to( self, fb, txt, x, y, p=None, cspacing=1, lspacing=1, cache=True ):
+    c = 1 if p is None else p[0]
+    y -= 8
+    
+    # Colour 3 is the sprites' transparent colour, so can't be cached
+    if cache and c != 3:
+      if sprites.blit( fb, x, y, self, txt, c ):
+        return
+      sp = sprites.new( len(txt) * 8, 8 )
+      if sp is not None:
+        t = ticks_us()
+        sp[0].text( txt, 0,0, c )
+        sprites.add( fb, x, y, self, txt, c, sp, ticks_diff( ticks_us(), t ) )
+        return
+    
+    fb.text( txt, x,y, c )
+
+sysfont = SysFont()
@@ -11,21 +11,87 @@ from micropython import const
 # Our libs
 from . import fb as framebuf
 from .utils import b2f
+from .pool import pool, PooledImage
+
+# Head flags (byte 07)
+_FLAG_OPAQUE = const(0x01) # Image contains no transparent pixels
+
+# Metadata cache, so draw paths can skip the stat and head reads
+# Keyed by path.  Values are ( width, height, bpp, data start, flags, raw head ),
+# or False if the file doesn't exist.
+# Entries are never checked against the file again, so callers must forget()
+# whenever the files could have changed underneath us (eg. SD un/plug, or
+# writing an image other than with save_GS2_HMSB(), which forgets it itself)
+_meta = {}
+
+# Entry indices
+_M_WIDTH = const(0)
+_M_HEIGHT = const(1)
+_M_BPP = const(2)
+_M_DS = const(3)
+_M_FLAGS = const(4)
+_M_HEAD = const(5)
+
+# Returns cached metadata for an image file (see _meta), reading it in if necessary
+def info( filename ):
+  m = _meta.get( filename )
+  if m is not None:
+    return m
+  
+  # Read in the head
+  try:
+    with open( filename, 'rb' ) as fd:
+      head = fd.read(8)
+  except OSError:
+    m = False
+  else:
+    
+    # Check it's something we can use
+    if len(head) < 7:
+      raise RuntimeError('Image file was shorter than expected!')
+    if head[0] > 1:
+      raise RuntimeError('Unrecognised file format')
+    
+    # Flags only exist if the head is long enough to have them
+    ds = head[1]
+    flags = head[7] if ds >= 8 and len(head) >= 8 else 0
+    
+    width, height, bpp = unpack( '>HHB', head[2:7] )
+    m = ( width, height, bpp, ds, flags, head )
+  
+  _meta[filename] = m
+  return m
+
+# Does the image file exist?  Cached, so the card is only looked at on the first call.
+def exists( filename ) -> bool:
+  return info( filename ) is not False
+
+# Forget cached metadata for one file, or all of them
+def forget( filename=None ):
+  if filename is None:
+    _meta.clear()
+  else:
+    _meta.pop( filename, None )
 
 # Saves a GS2_HMSB framebuffer object to a .pi file
 def save_GS2_HMSB( fb, filename ):
   
-  # Construct the head
-  # Version = 1
-  # Data will start at byte 8
-  # width, height, bpp
-  head = pack('>BBHHBB', 1, 8, fb.width, fb.height, fb.bpp, 0)
-  
   # Sanity check on image width (whole number of bytes)
   ppb = 8 // fb.bpp # Pixels per byte
   if fb.width % ppb != 0:
     raise RuntimeError('Framebuffer has odd width (not whole bytes)')
   
+  # Flag the image as opaque if there are no transparent pixels, so it can take the fast blit path later
+  flags = 0
+  if fb.bpp != 2 or not _has_colour_2bpp( fb.buf, 3 ):
+    flags |= _FLAG_OPAQUE
+  
+  # Construct the head
+  # Version = 1
+  # Data will start at byte 8
+  # width, height, bpp, flags
+  head = pack('>BBHHBB', 1, 8, fb.width, fb.height, fb.bpp, flags)
+  
   # Rearrange the pixel order to suit 2ink format
   #if GS2_HLSB:
   #  swap_pixel_order(fb.buf)
@@ -35,6 +101,7 @@ def save_GS2_HMSB( fb, filename ):
   fd.write(head)
   fd.write(fb.buf)
   fd.close()
+  forget( filename )
   
   # Put the buffer back how it was
   #if GS2_HLSB:
@@ -42,7 +109,9 @@ def save_GS2_HMSB( fb, filename ):
 
 # Load from file into new FrameBuffer object
 # Creates a new buffer for this purpose
-def load( filename ):
+# With into_pool=True, the buffer comes from the shared image pool instead,
+# and a PooledImage handle is returned.  Call its release() when done with it.
+def load( filename, into_pool=False ):
   
   # Load in the file
   fd = open( filename, 'rb' )
@@ -64,6 +133,7 @@ def load( filename ):
   # 02 2b Width (pixels)
   # 04 2b Height (pixels)
   # 06 1b bits per pixel
+  # 07 1b flags
   
   # Make a nice object containing the head data
   # Version 1 means there are 6 bytes left in the head
@@ -95,30 +165,43 @@ def load( filename ):
     raise RuntimeError('Only 1 or 2 bits per pixel is supported')
   
   # Make the FB
-  buf = bytearray( dwidth * height // ppb )
-  fb = framebuf.FB( buf, dwidth, height, b2f[head[4]] )
+  # Pooled buffers may be bigger than needed, so only read into the part we use
+  n = dwidth * height // ppb
+  if into_pool:
+    buf = pool.acquire( n )
+  else:
+    buf = bytearray( n )
   
   # Get the image data
-  img_len = fd.readinto( buf )
-  
-  # Close the file
-  fd.close()
+  # A pooled buffer goes back if the read fails, or it's lost to the pool for good
+  try:
+    img_len = fd.readinto( memoryview(buf)[:n] )
+  except Exception:
+    if into_pool:
+      pool.release( buf )
+    raise
+  finally:
+    fd.close()
   
   # Tidy up
   del version, ds, fd, top
   
   # Check for file read errors
-  if img_len is None:
-    raise RuntimeError('Error reading file')
-    return
-  if img_len != len(buf):
+  if img_len is None or img_len != n:
+    if into_pool:
+      pool.release( buf )
+    if img_len is None:
+      raise RuntimeError('Error reading file')
     raise RuntimeError('File read error: unexpected length')
-    return
+  
+  fb = framebuf.FB( buf, dwidth, height, b2f[head[4]] )
   
   # Do we have to blank out some padding?
   if pad:
     fb.rect( iwidth, 0, pad, height, 3, True ) # Fill the pad area with transparency
   
+  if into_pool:
+    return PooledImage( pool, buf, fb )
   return fb
 
 # Loads from file into provided buffer (bytearray)
@@ -126,73 +209,57 @@ def load( filename ):
 # Does not allocate any working buffer
 def load_into( buf, filename ):
   
-  # Load in the file
-  fd = open( filename, 'rb' )
-  top = fd.read(2)
-  
-  # Get the version from the first byte
-  version = top[0]
-  
-  # Check we know what we're doing
-  if version > 1:
-    raise RuntimeError('Unrecognised file format')
-  
-  # Data start pointer
-  ds = top[1]
+  # Head format
+  # 00 1b Version
+  # 01 1b Data start pointer
+  # 02 2b Width (pixels)
+  # 04 2b Height (pixels)
+  # 06 1b bits per pixel
+  # 07 1b flags
   
-  # Get the rest of the head
-  rest_of_head = fd.read( ds - 2 )
+  # Head data comes from the metadata cache
+  m = info( filename )
+  if not m:
+    raise OSError( 2 ) # ENOENT
   
   # Get the image data
+  fd = open( filename, 'rb' )
+  fd.seek( m[_M_DS] )
   img_len = fd.readinto( buf )
   
   # Close the file
   fd.close()
   
-  # Head format
-  # 00 1b Version
-  # 01 1b Data start pointer
-  # 02 2b Width (pixels)
-  # 04 2b Height (pixels)
-  # 06 1b bits per pixel
+  iwidth = m[_M_WIDTH]
+  height = m[_M_HEIGHT]
+  bpp = m[_M_BPP]
   
-  # Make a nice object containing the head data
-  head = [0]*5
-  head[0:2] = list(top)
-  head[2:5] = unpack( '>HHB', rest_of_head )
+  # Geometry validation
+  # width and height values are guaranteed to be positive integers, because we've unpacked them as such
+  if iwidth == 0:
+    raise RuntimeError('Attempted to load image with zero width!')
+  if height == 0:
+    raise RuntimeError('Attempted to load image with zero height!')
+  if bpp not in b2f:
+    raise RuntimeError('Invalid number of bits per pixel!')
   
-  iwidth = head[2]
-  height = head[3]
+  # Currently only support 1 or 2 bpp
+  if bpp > 2:
+    raise RuntimeError('Only 1 or 2 bits per pixel is supported')
   
   # Pixels per byte
-  ppb = 8 // head[4]
+  ppb = 8 // bpp
   
   # If the declared image width doesn't fit a whole number of bytes, assume it's been padded (with zeroes)
   pad = -iwidth % ppb
   dwidth = iwidth + pad
   
-  # Tidy up
-  del rest_of_head, version, ds, fd, top
-  
   # Check for file read errors
   if img_len is None:
     raise RuntimeError('Error reading file')
   if img_len != ( dwidth * height // ppb ):
     raise RuntimeError('File read error: unexpected length')
   
-  # Geometry validation
-  # width and height values are guaranteed to be positive integers, because we've unpacked them as such
-  if iwidth == 0:
-    raise RuntimeError('Attempted to load image with zero width!')
-  if height == 0:
-    raise RuntimeError('Attempted to load image with zero height!')
-  if head[4] not in b2f:
-    raise RuntimeError('Invalid number of bits per pixel!')
-  
-  # Currently only support 1 or 2 bpp
-  if head[4] > 2:
-    raise RuntimeError('Only 1 or 2 bits per pixel is supported')
-    
   # Were we given a big enough buffer?
   if len(buf) < img_len:
     raise RuntimeError('Provided buffer was too small!')
@@ -201,7 +268,8 @@ def load_into( buf, filename ):
   #swap_pixel_order(buf)
   
   # For 2bpp, replace transparency with white (otherwise it shows up as red)
-  if head[4] == 2:
+  # Opaque images have no transparency to replace, so skip the pass over every byte
+  if bpp == 2 and not m[_M_FLAGS] & _FLAG_OPAQUE:
     _replace_colour_2bpp( buf, 3, 0 )
   
   # Construct the framebuffer object
@@ -209,7 +277,7 @@ def load_into( buf, filename ):
     buf,
     dwidth, # width
     height, # height
-    b2f[head[4]] # format
+    b2f[bpp] # format
   )
   
   # Do we have to blank out some padding?
@@ -262,19 +330,105 @@ def _replace_colour_2bpp( buf, old:int=3, new:int=0 ):
     
     i += 1
 
+# Returns whether any pixel in a raw 2bpp buffer is colour c
+@micropython.viper
+def _has_colour_2bpp( buf, c:int ) -> bool:
+  bf = ptr8(buf)
+  i = int(0)
+  z = int(len(buf))
+  while i < z:
+    if ( bf[i] & 0x03 ) == c or ( (bf[i]>>2) & 0x03 ) == c or ( (bf[i]>>4) & 0x03 ) == c or ( bf[i]>>6 ) == c:
+      return True
+    i += 1
+  return False
+
 def blit_onto( fb, x:int, y:int, filename, t=3 ):
   if fb.bpp != 2:
     raise NotImplementedError('Only 2bpp framebuffers are supported for blit_onto()')
-  _blit_2bpp_onto_2bpp( fb, x, y, filename )
-  #_blit_onto_any( fb, x, y, filename, t )
+  
+  # Head comes from the metadata cache, so we can go straight to the pixel data
+  m = info( filename )
+  if not m:
+    raise OSError( 2 ) # ENOENT
+  head = m[_M_HEAD]
+  
+  with open( filename, 'rb' ) as fd:
+    
+    # Opaque image onto a byte boundary: no per-pixel work needed
+    if m[_M_FLAGS] & _FLAG_OPAQUE and x % 4 == 0 and m[_M_BPP] == 2:
+      if _blit_opaque_aligned( fb, x, y, fd, head ):
+        return
+    
+    _blit_2bpp_onto_2bpp( fb, x, y, fd, head )
+    #_blit_onto_any( fb, x, y, filename, t )
 
-# Blits image from file onto provided framebuffer
+# Blits an opaque 2bpp image from an open file onto a 2bpp framebuffer
+# x must be a multiple of 4 (whole destination bytes), so each row can be
+# read straight into the framebuffer with no shifting or masking.
+# Returns False (having drawn nothing) if the image can't take this path,
+# ie. when a partially-padded final byte would end up onscreen.
+def _blit_opaque_aligned( fb, x:int, y:int, fd, head ) -> bool:
+  
+  # Head values (see load() for format)
+  ds = head[1]
+  iwidth, height = unpack( '>HH', head[2:6] )
+  
+  # Geometry validation
+  if iwidth == 0:
+    raise RuntimeError('Attempted to load image with zero width!')
+  if height == 0:
+    raise RuntimeError('Attempted to load image with zero height!')
+  
+  # Widths in bytes
+  src_bytewidth = -( -iwidth // 4 )
+  dest_bytewidth = fb.width // 4
+  
+  # Clip the source rectangle to the destination
+  src_startbyte = max( 0, -x ) // 4
+  src_endbyte = min( src_bytewidth, dest_bytewidth - (x//4) )
+  src_startrow = max( 0, -y )
+  src_endrow = min( height, fb.height - y )
+  n = src_endbyte - src_startbyte # Bytes per row
+  
+  # Entirely offscreen
+  if n <= 0 or src_endrow <= src_startrow:
+    return True
+  
+  # Padding pixels must not overwrite the destination
+  if iwidth % 4 and src_endbyte == src_bytewidth:
+    return False
+  
+  mv = memoryview( fb.buf )
+  fp = ds + ( src_startrow * src_bytewidth ) + src_startbyte
+  obi = ( ( y + src_startrow ) * dest_bytewidth ) + ( max( 0, x ) // 4 )
+  rows = src_endrow - src_startrow
+  
+  # Full-width image: rows are contiguous in both, so do it in one read
+  if n == src_bytewidth == dest_bytewidth:
+    fd.seek( fp )
+    if fd.readinto( mv[ obi : obi + (n*rows) ] ) != n * rows:
+      raise RuntimeError('Image file was shorter than expected!')
+    return True
+  
+  # Otherwise, a row at a time
+  while rows > 0:
+    fd.seek( fp )
+    if fd.readinto( mv[ obi : obi+n ] ) != n:
+      raise RuntimeError('Image file was shorter than expected!')
+    fp += src_bytewidth
+    obi += dest_bytewidth
+    rows -= 1
+  
+  return True
+
+# Blits image from an open file onto provided framebuffer
+# hd is the file's head, already read
 # Positions top-left corner of file image at x, y
 # Transparency in file image is respected
 # Allocates working buffer equal to file image width +1
 # Fullscreen in 0.087s
 @micropython.viper
-def _blit_2bpp_onto_2bpp( fb, x:int, y:int, filename ):
+def _blit_2bpp_onto_2bpp( fb, x:int, y:int, fd, hd ):
   
   # Destination info
   buf = ptr8(fb.buf)
@@ -284,11 +438,8 @@ def _blit_2bpp_onto_2bpp( fb, x:int, y:int, filename ):
   dppb:int = 8 // int(fb.bpp) # Destination pixels per byte
   dest_bytewidth:int = dest_width // dppb
   
-  # Open the source file
-  fd = open( filename, 'rb' )
-  
-  # First 7 bytes should be the header
-  head = ptr8(fd.read(7))
+  # Head, as read by the caller
+  head = ptr8(hd)
   
   # Version check - we only support v1
   if head[0] > 1:
@@ -300,6 +451,7 @@ def _blit_2bpp_onto_2bpp( fb, x:int, y:int, filename ):
   # 02 2b Width (pixels)
   # 04 2b Height (pixels)
   # 06 1b bits per pixel
+  # 07 1b flags
   
   # Have to construct multi-byte integers manually because Viper doesn't understand endianness
   ds:int = head[1]
@@ -461,9 +613,6 @@ def _blit_2bpp_onto_2bpp( fb, x:int, y:int, filename ):
     
     # Skip the output byte index along by however many bytes we skip at the start of the line
     obi += dest_bytesafter + dest_startbyte
-  
-  # Done, finish up
-  fd.close()
 
 # NOT CURRENTLY USED
 #
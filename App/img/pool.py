@@ -0,0 +1,121 @@
+# Buffer pool for image loading
+#
+# T. Lloyd
+# 19 Oct 2026
+#
+# Loading lots of small, similarly-sized images (logos, icons, the skull)
+# allocates a fresh bytearray every time, which fragments the heap.
+# The pool keeps released buffers in a handful of size classes so that
+# the next load of a similar image can reuse one instead.
+#
+# Requests bigger than the largest size class are allocated normally
+# and not kept when released.
+
+from micropython import const
+
+# Size classes (bytes).  Each buffer handed out is the smallest class that fits.
+_CLASSES = ( 64, 128, 256, 512, 1024 )
+
+# Most free buffers kept per class.  Anything released beyond this is left for the GC.
+_KEEP = const(2)
+
+class Pool:
+  
+  def __init__( self, classes=_CLASSES, keep:int=_KEEP ):
+    self.classes = classes
+    self.keep = keep
+    self._free = [ [] for _ in classes ]    # Released buffers, waiting to be reused
+    self._in_use = [0] * len(classes)       # Buffers currently handed out
+    self._hwm = [0] * len(classes)          # Most buffers ever handed out at once
+    self._allocs = [0] * len(classes)       # Buffers actually allocated (pool misses)
+    self._reuses = [0] * len(classes)       # Requests served from the free list
+    self._oversize = 0                      # Requests too big for any class
+  
+  # Index of the smallest class that can hold n bytes, or -1 if none
+  def _class( self, n:int ) -> int:
+    for i, c in enumerate( self.classes ):
+      if n <= c:
+        return i
+    return -1
+  
+  # Get a buffer of at least n bytes
+  def acquire( self, n:int ) -> bytearray:
+    i = self._class(n)
+    
+    # Too big to pool
+    if i < 0:
+      self._oversize += 1
+      return bytearray(n)
+    
+    # Reuse a free buffer if there is one
+    free = self._free[i]
+    if free:
+      buf = free.pop()
+      self._reuses[i] += 1
+    else:
+      buf = bytearray( self.classes[i] )
+      self._allocs[i] += 1
+    
+    self._in_use[i] += 1
+    if self._in_use[i] > self._hwm[i]:
+      self._hwm[i] = self._in_use[i]
+    
+    return buf
+  
+  # Return a buffer from acquire() to the pool
+  def release( self, buf ):
+    i = self._class( len(buf) )
+    
+    # Only take back buffers that are exactly a class size (anything else wasn't ours)
+    if i < 0 or len(buf) != self.classes[i]:
+      return
+    
+    self._in_use[i] -= 1
+    if len( self._free[i] ) < self.keep:
+      self._free[i].append(buf)
+  
+  # Drop all free buffers, eg. before something big needs the memory
+  def clear( self ):
+    for free in self._free:
+      free.clear()
+  
+  # Usage statistics, per class: ( size, in use, high-water mark, allocated, reused, free )
+  def stats( self ) -> list:
+    return [
+      ( c, self._in_use[i], self._hwm[i], self._allocs[i], self._reuses[i], len( self._free[i] ) )
+      for i, c in enumerate( self.classes )
+    ]
+  
+  # Print usage statistics
+  def report( self ):
+    print('Image pool:  size  used  peak alloc reuse  free')
+    for s in self.stats():
+      print('           {:5d} {:5d} {:5d} {:5d} {:5d} {:5d}'.format( *s ))
+    print(f'            oversize requests: {self._oversize}')
+
+# An image loaded into a pooled buffer
+# The framebuffer must not be used after release()
+# Can be used as a context manager:
+#   with img.load( filename, into_pool=True ) as h:
+#     fb.blit( h.fb, x,y )
+class PooledImage:
+  
+  def __init__( self, pool, buf, fb ):
+    self._pool = pool
+    self._buf = buf
+    self.fb = fb
+  
+  def release( self ):
+    if self._buf is not None:
+      self._pool.release( self._buf )
+      self._buf = None
+      self.fb = None
+  
+  def __enter__( self ):
+    return self
+  
+  def __exit__( self, exc_type, exc_value, traceback ):
+    self.release()
+
+# Shared pool used by img.load()
+pool = Pool()
@@ -0,0 +1,130 @@
+# Pre-rendered text sprites
+#
+# T. Lloyd
+# 19 Oct 2026
+#
+# The play screen redraws the same strings every time (name, title, item
+# names, HP tick numbers).  Rather than rasterise them glyph by glyph each
+# time, the first draw renders each string once into a 2bpp strip, which
+# later draws just blit in one go.
+#
+# Sprites are keyed by ( font, text, pallet ), where font is None for the
+# builtin 8x8 font.  Lookups go through nested dicts so that a hit doesn't
+# allocate a key tuple.  Buffers come from the image pool, and the least
+# recently used sprites are evicted to stay within the byte budget.
+
+from micropython import const
+from time import ticks_us, ticks_diff
+from framebuf import FrameBuffer, GS2_HMSB
+
+from .pool import pool
+
+# Default cache size, bytes
+_BUDGET = const(2048)
+
+# Background colour of every sprite, skipped when blitting
+# Text drawn in colour 3 is never cached (it would vanish)
+_KEY = const(3)
+
+# Entry indices
+_E_FB    = const(0) # The sprite
+_E_BUF   = const(1) # Its buffer
+_E_COST  = const(2) # How long it took to render, us
+_E_T     = const(3) # When it was last used
+_E_FONT  = const(4) # Key, so the entry can be found again for eviction
+_E_PAL   = const(5)
+_E_TXT   = const(6)
+
+class SpriteCache:
+  
+  def __init__( self, budget:int=_BUDGET ):
+    self.budget = budget
+    self.used = 0   # Bytes held
+    self._idx = {}  # font -> pallet -> text -> entry
+    self._e = []    # All entries
+    self.t = 0
+    self.hits = 0
+    self.misses = 0
+    self.saved = 0  # Estimated rendering time saved by hits, us
+  
+  # Find a sprite.  Returns its entry, or None.
+  def get( self, font, txt, p ):
+    d = self._idx.get( font )
+    if d is not None:
+      d = d.get( p )
+      if d is not None:
+        e = d.get( txt )
+        if e is not None:
+          self.t += 1
+          e[_E_T] = self.t
+          return e
+    return None
+  
+  # Draw a cached sprite with its top-left at x,y
+  # Returns False if it's not in the cache, in which case: new(), draw it, add()
+  def blit( self, fb, x:int, y:int, font, txt, p ) -> bool:
+    e = self.get( font, txt, p )
+    if e is None:
+      return False
+    t = ticks_us()
+    fb.blit( e[_E_FB], x, y, _KEY )
+    self.saved += e[_E_COST] - ticks_diff( ticks_us(), t )
+    self.hits += 1
+    return True
+  
+  # Make a blank sprite, w x h px, as ( framebuffer, buffer ), or None if it's too big to cache
+  # Evicts as needed to make room
+  def new( self, w:int, h:int ):
+    self.misses += 1
+    w += -w % 4 # Whole bytes
+    n = w * h // 4
+    if n > self.budget:
+      return None
+    while self.used + n > self.budget and self._e:
+      self._evict()
+    buf = pool.acquire( n )
+    fb = FrameBuffer( buf, w, h, GS2_HMSB )
+    fb.fill( _KEY )
+    return fb, buf
+  
+  # Record a sprite from new(), once it's been drawn, and draw it onto fb at x,y
+  # cost: How long it took to render, us
+  def add( self, fb, x:int, y:int, font, txt, p, s, cost:int ):
+    self.t += 1
+    e = [ s[0], s[1], cost, self.t, font, p, txt ]
+    self._idx.setdefault( font, {} ).setdefault( p, {} )[ txt ] = e
+    self._e.append( e )
+    self.used += len( s[1] )
+    fb.blit( s[0], x, y, _KEY )
+  
+  # Throw out the least recently used sprite
+  def _evict( self ):
+    old = self._e[0]
+    for e in self._e:
+      if e[_E_T] < old[_E_T]:
+        old = e
+    self._e.remove( old )
+    del self._idx[ old[_E_FONT] ][ old[_E_PAL] ][ old[_E_TXT] ]
+    self.used -= len( old[_E_BUF] )
+    pool.release( old[_E_BUF] )
+  
+  # Forget everything, eg. on level switch
+  def clear( self ):
+    for e in self._e:
+      pool.release( e[_E_BUF] )
+    self._e.clear()
+    self._idx.clear()
+    self.used = 0
+  
+  # Cache report, eg. 'Sprites: 12 hits, 2 misses (85%), saved ~4.1 ms, 1536/2048 bytes'
+  # Resets the counters
+  def report( self ) -> str:
+    n = self.hits + self.misses
+    r = f'Sprites: {self.hits} hits, {self.misses} misses ({ 100*self.hits//n if n else 0 }%), saved ~{self.saved/1000:.1f} ms, {self.used}/{self.budget} bytes'
+    self.hits = 0
+    self.misses = 0
+    self.saved = 0
+    return r
+
+# Shared cache, used by FB.label() and Font.write_to()
+sprites = SpriteCache()
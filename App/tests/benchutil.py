@@ -0,0 +1,93 @@
+# Shared setup for the character benchmarks
+# A stand-in HAL and saver, the README example character, and scratch
+# directories on internal flash to put characters in.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import os
+import json
+from gadget_app.pathlib import Path
+from gadget_app.character import Character
+from gadget_app.common import CHAR_STATS
+
+# README example (with levels as a list, as the loader expects)
+EXAMPLE = {
+  "name": "Hemlock",
+  "system": "dnd-5e",
+  "version": 1,
+  "data": {
+    "xp": 9256,
+    "currency": { "platinum": 0, "gold": 11, "electrum": 0, "silver": 0, "copper": 0 },
+    "currentLevel": "L5 Wizard",
+    "levels": [
+      {
+        "name": "L5 Wizard",
+        "hp": { "current": 0, "max": 512, "temporary": 1740 },
+        "hitdice": { "current": 5, "max": 10 },
+        "spells": [
+          {"current": 4, "max": 4},
+          {"current": 1, "max": 3},
+          {"current": 0, "max": 2}
+        ],
+        "items": [
+          {"current": 1, "max": 1, "name": "Arcane Recovery", "reset": ["lr"]},
+          {"current": 3, "max": 3, "name": "Fey Step", "reset": ["lr"]},
+          {"current": 0, "max": 1, "name": "Cape of the Mountbank", "reset": ["lr","dawn"]},
+          {"current": 1, "max": 1, "name": "Dagger of Venom", "reset": ["lr","dawn"]},
+          {"current": 1, "max": 3, "name": "Rusty Bag of Tricks", "reset": ["lr","dawn"]}
+        ]
+      }
+    ]
+  }
+}
+
+# Just enough HAL for Character._load() and CharacterSummary
+class _RTC:
+  def uts( self, ts=None ):
+    return 0x7fffffff # Never older than the file, so never gets set
+class HAL:
+  rtc = _RTC()
+hal = HAL()
+
+# Stands in for the DeferredTasks, for save()/save_now()
+class Saver:
+  def touch( self ):
+    pass
+  def untouch( self ):
+    pass
+
+# A Character for directory d, without the rest of Character.__init__()
+# Not loaded yet, and with no savers: each benchmark adds what it needs
+def bare( d ) -> Character:
+  c = Character.__new__( Character )
+  c.dir = d
+  c.hal = hal
+  return c
+
+# Make the scratch directory top, and the subdirectories subs inside it, one inside the next
+# Returns the innermost, as a Path
+def scratch( top:str, *subs ) -> Path:
+  d = Path( top )
+  for s in subs:
+    d = d / s
+  d.mkdir( parents=True, exist_ok=True )
+  return d
+
+# Write fs as the stats.json in directory d
+# Returns its path, as a string
+def write_stats( d, fs ) -> str:
+  f = str( d / CHAR_STATS )
+  with open( f, 'w' ) as fd:
+    json.dump( fs, fd )
+  return f
+
+# Delete directory p, and everything in it
+def tidy( p:str ):
+  for e in list( os.ilistdir( p ) ):
+    q = p + '/' + e[0]
+    if e[1] == 0x4000: # Directory
+      tidy( q )
+    else:
+      os.remove( q )
+  os.rmdir( p )
@@ -0,0 +1,76 @@
+# Font rendering benchmark
+# Times Font.write_to() per character for each shipped .2f font, glyph by glyph
+# and via the sprite cache (with its hit rate), and checks that drawing a
+# string allocates nothing once the glyphs are warm.  Then opens each font
+# paged, with the play screen's glyph cache budget, and reports the glyph
+# cache's hit rate.
+#
+# Run from the App directory (so that font and /assets are available)
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import gc
+import os
+import micropython
+import framebuf
+from time import ticks_us, ticks_diff
+from font import Font
+from img import sprites
+
+_TXT = 'The quick brown fox jumps over the lazy dog 0123456789'
+_REPS = 20
+_BUDGET = 256 # As _FONT_BUDGET in _char_gfx.py
+_TITLE = 'Level 5 Wizard' # About what the play screen draws in a paged font
+
+# 2bpp destination, same format as the eink
+buf = bytearray( 360 * 64 // 4 )
+fb = framebuf.FrameBuffer( buf, 360, 64, framebuf.GS2_HMSB )
+
+def bench( path, cache ):
+  f = Font( path )
+  p = (1,) if f.bpp == 1 else (1,2,0)
+  sprites.clear()
+  
+  # Warm up: builds the glyph framebuffers (and the sprite)
+  f.write_to( fb, _TXT, 0, 32, p, cache=cache )
+  
+  # Timing
+  gc.collect()
+  t = ticks_us()
+  for _ in range(_REPS):
+    f.write_to( fb, _TXT, 0, 32, p, cache=cache )
+  t = ticks_diff( ticks_us(), t )
+  
+  # Allocation check: heap_lock() makes any allocation raise MemoryError
+  allocs = 'none'
+  micropython.heap_lock()
+  try:
+    f.write_to( fb, _TXT, 0, 32, p, cache=cache )
+  except MemoryError:
+    allocs = 'YES'
+  micropython.heap_unlock()
+  
+  n = len(_TXT) * _REPS
+  print(f'{path:32s} {"sprite" if cache else "glyphs"} {f.bpp}bpp {f.height:3d}px  {t/n:7.1f} us/char  allocates: {allocs}')
+  if cache:
+    print( '  ' + sprites.report() )
+
+# Paged, drawing the same title a few times, as the play screen does on each redraw
+def paged( path ):
+  f = Font( path, _BUDGET )
+  p = (1,) if f.bpp == 1 else (1,2,0)
+  for _ in range(_REPS):
+    f.write_to( fb, _TITLE, 0, 32, p, cache=False ) # Glyph by glyph, so every draw goes through the glyph cache
+  print( f.cache_report( path ) )
+
+fonts = [ '/assets/' + name for name in sorted( os.listdir('/assets') ) if name.endswith('.2f') ]
+for path in fonts:
+  bench( path, False )
+  bench( path, True )
+
+print()
+for path in fonts:
+  paged( path )
+
+sprites.clear()
@@ -0,0 +1,22 @@
+# Import benchmark
+# Measures the heap taken by importing character.py (and everything it
+# imports), and how long the import takes.  Run with a fresh interpreter
+# (soft reset first), since a module that's already imported costs nothing.
+#
+# Run from the App directory.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import gc
+from time import ticks_us, ticks_diff
+
+gc.collect()
+a = gc.mem_alloc()
+t = ticks_us()
+import gadget_app.character
+t = ticks_diff( ticks_us(), t )
+gc.collect()
+a = gc.mem_alloc() - a
+
+print(f'character.py: {a} bytes kept, {t/1000:.1f} ms to import')
@@ -0,0 +1,123 @@
+# Character index benchmark
+# Counts the filesystem operations needed to find the characters for the
+# select screen, with 6 and with 30 characters: the old way (glob, is_dir(),
+# is_file(), then reading each one), with no system.json yet, and with an
+# up-to-date system.json.  Also times each.
+#
+# Operations are counted by mounting a pass-through filesystem over the
+# scratch directory, so they're the same calls that would go to FAT on the SD.
+#
+# Run from the App directory.  Works in a scratch directory on internal flash.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import vfs
+from time import ticks_us, ticks_diff
+from gadget_app.pathlib import Path
+from gadget_app.character import CharacterSummary, recover_save
+from gadget_app._charindex import CharIndex, find, MANDATORY_CHAR_FILES
+from gadget_app.common import CHAR_SUBDIR, SYSTEM_INDEX
+from benchutil import hal, scratch, write_stats, tidy
+
+_DIR = '/indexbench'
+_MNT = '/counted'
+_COUNTS = ( 6, 30 )
+
+# Small character
+_EXAMPLE = {
+  "name": "Hemlock",
+  "version": 1,
+  "data": {
+    "currentLevel": "L5 Wizard",
+    "levels": [ { "name": "L5 Wizard", "hp": { "max": 32 }, "hitdice": { "max": 5 } } ]
+  }
+}
+
+# Passes everything through to fs, counting as it goes
+class _Counted:
+  def __init__( self, fs ):
+    self.fs = fs
+    self.n = {}
+  def _count( self, op ):
+    self.n[op] = self.n.get( op, 0 ) + 1
+  def mount( self, readonly, mkfs ):
+    pass
+  def umount( self ):
+    pass
+  def ilistdir( self, p ):
+    self._count('ilistdir')
+    return self.fs.ilistdir( _DIR + p )
+  def stat( self, p ):
+    self._count('stat')
+    return self.fs.stat( _DIR + p )
+  def open( self, p, mode ):
+    self._count('open')
+    return self.fs.open( _DIR + p, mode )
+  def remove( self, p ):
+    self._count('remove')
+    return self.fs.remove( _DIR + p )
+  def rename( self, a, b ):
+    self._count('rename')
+    return self.fs.rename( _DIR + a, _DIR + b )
+  def mkdir( self, p ):
+    return self.fs.mkdir( _DIR + p )
+  def rmdir( self, p ):
+    return self.fs.rmdir( _DIR + p )
+  def chdir( self, p ):
+    pass
+  def getcwd( self ):
+    return '/'
+  def statvfs( self, p ):
+    return self.fs.statvfs( _DIR + p )
+
+# Gadget._find_chars(), as it was before system.json
+def old( cd:Path ):
+  chars = []
+  for x in sorted( cd.glob('*'), key=str ):
+    if not x.is_dir():
+      continue
+    recover_save( x )
+    if not all([ ( x / f ).is_file() for f in MANDATORY_CHAR_FILES ]):
+      continue
+    chars.append( CharacterSummary( hal, x ) )
+  return chars
+
+# Gadget._find_chars(), now
+def new( cd:Path ):
+  ix = CharIndex( Path(_MNT) / SYSTEM_INDEX )
+  chars = find( hal, cd, ix, () )
+  ix.save()
+  return chars
+
+# Returns ( us, { op : count } )
+def bench( fs, fn, n ):
+  cd = Path(_MNT) / CHAR_SUBDIR
+  fs.n = {}
+  t = ticks_us()
+  assert len( fn( cd ) ) == n
+  return ticks_diff( ticks_us(), t ), fs.n
+
+# Find the filesystem the scratch directory's on
+for fs, mp in vfs.mount():
+  if mp == '/':
+    break
+cfs = _Counted( fs )
+
+for n in _COUNTS:
+  
+  # Make the characters
+  for i in range(n):
+    _EXAMPLE['name'] = f'Char {i}'
+    write_stats( scratch( _DIR, CHAR_SUBDIR, f'Char{i:02d}' ), _EXAMPLE )
+  
+  vfs.mount( cfs, _MNT )
+  try:
+    for nm, fn in ( ( 'Old', old ), ( 'No index', new ), ( 'Indexed', new ) ):
+      t, ops = bench( cfs, fn, n )
+      print(f'{n:2d} chars, {nm:8s}: {t/1000:7.1f} ms, {sum( ops.values() ):4d} ops {ops}')
+  finally:
+    vfs.umount( _MNT )
+  
+  # Tidy up
+  tidy( _DIR )
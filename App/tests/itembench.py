@@ -0,0 +1,114 @@
+# Item storage benchmark
+# Measures the heap kept for the items of a character with 5 levels of 16
+# items each, stored as they are now (arrays per level, see _ITEMS_CURR etc.
+# in character.py) and as they used to be (a [ current, max, reset, name ]
+# list per item).  Then times long_rest() and short_rest(), and the item
+# reset loop on its own in each layout.
+#
+# Run from the App directory.  Works in a scratch directory on internal flash.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import gc
+from time import ticks_us, ticks_diff
+from micropython import const
+from gadget_app.character import _item_names, _pack_items
+from benchutil import Saver, bare, scratch, write_stats, tidy
+
+_DIR = '/itembench'
+_LEVELS = const(5)
+_ITEMS = const(16)
+_REPS = const(100)
+
+# Load the character without the rest of Character.__init__(), and without drawing anything
+# Every level gets loaded, not just the current one, so that all their items are there to measure
+def load( d ):
+  c = bare( d )
+  c._saver = Saver()
+  c._compactor = Saver()
+  c._load()
+  for i in range( len(c.levels) ):
+    c._level( i )
+  c.draw_mtx_stable = lambda show=True : None
+  c.draw_eink = lambda show=True : None
+  c.show_curr_hp = lambda : None
+  return c
+
+# The items of every level, in the old layout
+def old_items( levels ) -> list:
+  return [
+    [ [ c, m, r, n ] for c, m, r, n in zip( it[0], it[1], it[2], _item_names( it ) ) ]
+    for it in [ lv[4] for lv in levels ]
+  ]
+
+# The items of every level, as they're stored now, from the old layout
+def new_items( olds ) -> list:
+  return [ _pack_items( its ) for its in olds ]
+
+# Returns bytes kept by what fn( x ) returns
+def kept( fn, x ) -> int:
+  gc.collect()
+  a = gc.mem_alloc()
+  x = fn( x )
+  gc.collect()
+  a = gc.mem_alloc() - a
+  del x
+  return a
+
+# Returns us per call
+def timed( fn ) -> int:
+  gc.collect()
+  t = ticks_us()
+  for _ in range(_REPS):
+    fn()
+  return ticks_diff( ticks_us(), t ) // _REPS
+
+# Rests, without letting the unsaved journal records pile up
+def long_rest():
+  c.long_rest( show=False )
+  c._journal.pending = bytearray()
+def short_rest():
+  c.short_rest( show=False )
+  c._journal.pending = bytearray()
+
+# The long rest item reset, old layout
+def old_recharge( its:list ):
+  for c in its:
+    if c[1] and c[2] & 0x02:
+      c[0] = c[1]
+
+# Make the character
+d = scratch( _DIR, 'Items' )
+write_stats( d, {
+  'name' : 'Items',
+  'system' : 'dnd-5e',
+  'version' : 1,
+  'data' : {
+    'currentLevel' : 'L1',
+    'levels' : [ {
+      'name' : f'L{i+1}',
+      'hp' : { 'max': 10 },
+      'hitdice' : { 'max': 1 },
+      'items' : [ { 'current': 0, 'max': 3, 'name': f'Item number {j}', 'reset': [ ( 'sr', 'lr', 'dawn' )[j%3] ] } for j in range(_ITEMS) ],
+    } for i in range(_LEVELS) ],
+  },
+} )
+
+c = load( d )
+print(f'{_LEVELS} levels of {_ITEMS} items')
+olds = old_items( c.levels )
+print(f'Kept, old layout: {kept( old_items, c.levels ):6d} bytes')
+print(f'Kept, now:        {kept( new_items, olds ):6d} bytes')
+
+its = olds[0]
+for nm, fn in (
+    ( 'Item reset, old layout', lambda : old_recharge( its ) ),
+    ( 'Item reset, now', lambda : c._recharge( 0x02 ) ),
+    ( 'long_rest()', long_rest ),
+    ( 'short_rest()', short_rest ),
+  ):
+  print(f'{nm:22s}: {timed( fn ):6d} us')
+
+# Tidy up
+tidy( _DIR )
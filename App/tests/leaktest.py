@@ -0,0 +1,166 @@
+# Select/play cycle leak test
+# Drives the app round the loop of choosing a character, playing, and then
+# System > Change Character, _CYCLES times, the way the controls would:
+# Gadget.select_character(), then Gadget._set_char_cb() for the first
+# character, then the 'Change Character' confirmer.  After each cycle, back at
+# the select screen, records gc.mem_alloc() (after a collect), and fails if
+# that keeps going up.
+#
+# Also lists what's still reachable from the Gadget after each cleanup, by
+# type: Characters, menus, DeferredTasks, HAL registrations.  Anything whose
+# count grows from cycle to cycle is being held onto.  Objects are found
+# through attributes, containers and bound methods; what a closure captures
+# can't be looked into on MicroPython, so something held only by a closure
+# shows up in the heap figures but not in the lists.
+#
+# Needs the SD card in, with at least one character on it.  Run from the App
+# directory, in place of main.py.  Soft reset afterwards.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import gc
+import asyncio
+from array import array
+from micropython import const
+from gadget_app import Gadget
+
+_CYCLES = const(20)
+_WARMUP = const(3)    # Cycles to leave out of the slope: caches, interned strings etc. fill up at first
+_SLOPE_MAX = const(8) # Bytes per cycle allowed for noise
+_SETTLE = const(500)  # ms to let async tasks run after each step
+
+# Types worth counting, by name
+_WATCH = ( 'Character', 'CharacterSummary', 'DeferredTask', '_ClientRegistration', 'RootMenu', 'NeedleMenu',
+  'OledMenu', 'ScrollingOledMenu', 'SubMenu', 'SimpleAdjuster', 'DoubleAdjuster', 'FunctionConfirmer', 'MatrixMenu' )
+
+# Not worth looking inside
+_LEAVES = ( str, bytes, bytearray, memoryview, int, float, bool, type(None) )
+
+# Everything reachable from root
+# Returns { type name : [ ( path, object ) ] } for the _WATCH types
+def census( root ) -> dict:
+  found = {}
+  seen = set()
+  stack = [ ( root, 'g' ) ]
+  while stack:
+    o, p = stack.pop()
+    if type(o) in _LEAVES or id(o) in seen:
+      continue
+    seen.add( id(o) )
+    
+    nm = type(o).__name__
+    if nm in _WATCH:
+      found.setdefault( nm, [] ).append( ( p, o ) )
+    if nm == 'module':
+      continue
+    
+    # Containers
+    if type(o) in ( list, tuple ):
+      for i, x in enumerate( o ):
+        stack.append( ( x, f'{p}[{i}]' ) )
+      continue
+    if type(o) is set:
+      for x in o:
+        stack.append( ( x, f'{p}{{}}' ) )
+      continue
+    if type(o) is dict:
+      for k, x in o.items():
+        stack.append( ( x, f'{p}[{repr(k)}]' ) )
+      continue
+    
+    # Bound methods keep their object
+    try:
+      stack.append( ( o.__self__, f'{p}.__self__' ) )
+    except AttributeError:
+      pass
+    
+    # Instances
+    try:
+      d = o.__dict__
+    except AttributeError:
+      continue
+    for k, x in d.items():
+      stack.append( ( x, f'{p}.{k}' ) )
+  
+  return found
+
+# Find the 'Change Character' confirmer in the play screen's menus
+def confirmer( g ):
+  for p, fc in census( g ).get( 'FunctionConfirmer', [] ):
+    if fc.title == 'Change Character':
+      return fc
+  raise RuntimeError('No Change Character confirmer')
+
+# Let things happen, including any eink refresh
+async def settle( g ):
+  await asyncio.sleep_ms( _SETTLE )
+  while not g.hal.eink.unbusy.is_set():
+    await asyncio.sleep_ms( 50 )
+
+# Least-squares slope of ys, per step
+def slope( ys ) -> float:
+  n = len(ys)
+  sx = n * ( n-1 ) / 2
+  sxx = ( n-1 ) * n * ( 2*n-1 ) / 6
+  sy = sum( ys )
+  sxy = sum([ i*y for i, y in enumerate(ys) ])
+  return ( n*sxy - sx*sy ) / ( n*sxx - sx*sx )
+
+async def main():
+  g = Gadget()
+  
+  # Mount the SD card, as Gadget.start_app() does
+  asyncio.create_task( g._sd_controller() )
+  await g.hal.sd.card_state_known.wait()
+  if g.hal.sd.card_ready.is_set():
+    await g._sd_mount_attempted.wait()
+  g._show_splash = False
+  
+  g.select_character()
+  await settle( g )
+  
+  # Sized up front, so that the test doesn't grow the heap itself
+  mem = array( 'i', [0] * _CYCLES )
+  base = None # Counts at the end of the warm-up
+  for i in range(_CYCLES):
+    
+    if not g._chars:
+      raise RuntimeError('No characters to select')
+    g._set_char_cb( 0 )
+    await settle( g )
+    
+    # Go through the menus' own code, as if it had been chosen
+    fc = confirmer( g )
+    fc.enter()
+    fc.btn()
+    del fc
+    await settle( g )
+    
+    gc.collect()
+    mem[i] = gc.mem_alloc()
+    
+    # Keep just the paths, so the census doesn't hold anything alive itself
+    found = { k : [ p for p, o in v ] for k, v in census( g ).items() }
+    counts = { k : len(v) for k, v in found.items() }
+    if i == _WARMUP:
+      base = counts
+    print(f'Cycle {i+1:2d}: {mem[i]:6d} bytes allocated, {counts}')
+  
+  # What's still around, and what's growing
+  print('\nReachable from the Gadget at the select screen:')
+  for k, v in sorted( found.items() ):
+    print(f'  {k} x{len(v)}')
+    for p in v:
+      print(f'    {p}')
+  print('HAL registrations:', [ c.name for c in g.hal._clients ])
+  growing = [ k for k, n in counts.items() if n > base.get( k, 0 ) ]
+  if growing:
+    print('Growing:', growing)
+  
+  s = slope( mem[_WARMUP:] )
+  print(f'\nHeap slope: {s:.1f} bytes/cycle')
+  assert s <= _SLOPE_MAX and not growing, 'Leak'
+  print('OK')
+
+asyncio.run( main() )
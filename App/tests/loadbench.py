@@ -0,0 +1,111 @@
+# Savefile loading benchmark
+# Measures the peak heap needed to load a large synthetic character (12
+# levels, each with 9 spell levels and 16 items) from stats.json, and compares
+# it with what json.load() alone needs for the same file (the old loader held
+# all of that, and then built its arrays on top).  Also reports the time
+# taken, and the heap kept afterwards.
+#
+# Peak heap is found by leaving less and less free, and seeing whether the
+# load still works, so it includes any fragmentation.
+#
+# Run from the App directory.  Works in a scratch directory on internal flash.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import gc
+import os
+import json
+from time import ticks_us, ticks_diff
+from micropython import const
+from gadget_app.common import CHAR_STATS
+from benchutil import bare, scratch, write_stats, tidy
+
+_DIR = '/loadbench'
+_LEVELS = const(12)
+_STEP = const(64) # Resolution of the peak heap search, bytes
+
+# Load the character without the rest of Character.__init__()
+def load( d ):
+  c = bare( d )
+  c._load()
+  return c
+
+# The biggest part of the old loader
+def load_json( d ):
+  with open( str( d / CHAR_STATS ), 'r' ) as fd:
+    return json.load( fd )
+
+# Does fn() work with only free bytes of heap available?
+def fits( fn, free:int ) -> bool:
+  gc.collect()
+  ballast = bytearray( max( gc.mem_free() - free, 0 ) )
+  try:
+    fn()
+    return True
+  except MemoryError:
+    return False
+  finally:
+    del ballast
+    gc.collect()
+
+# Least free heap fn() works with, to within _STEP bytes
+def peak( fn ) -> int:
+  gc.collect()
+  lo = 0
+  hi = gc.mem_free() - 1024
+  while hi - lo > _STEP:
+    mid = ( lo + hi ) // 2
+    if fits( fn, mid ):
+      hi = mid
+    else:
+      lo = mid
+  return hi
+
+# Returns us per call
+def timed( fn ) -> int:
+  gc.collect()
+  t = ticks_us()
+  fn()
+  return ticks_diff( ticks_us(), t )
+
+# Make the character
+d = scratch( _DIR, 'Big' )
+levels = []
+for i in range(_LEVELS):
+  levels.append({
+    'name' : f'L{i+1} Wizard',
+    'hp' : { 'current': 10*i, 'max': 10*i+10, 'temporary': 0 },
+    'hitdice' : { 'current': i, 'max': i+1 },
+    'spells' : [ { 'current': 1, 'max': 4 } for _ in range(9) ],
+    'items' : [ { 'current': j%3, 'max': 3, 'name': f'Wand of Something #{j}', 'reset': ['lr','dawn'] } for j in range(16) ],
+  })
+js = write_stats( d, {
+  'name' : 'Big',
+  'system' : 'dnd-5e',
+  'version' : 1,
+  'data' : {
+    'xp' : 1000,
+    'currentLevel' : f'L{_LEVELS} Wizard',
+    'levels' : levels,
+  },
+} )
+del levels
+print(f'stats.json: {os.stat(js)[6]} bytes, {_LEVELS} levels')
+
+# Kept after loading
+gc.collect()
+a = gc.mem_alloc()
+c = load( d )
+gc.collect()
+a = gc.mem_alloc() - a
+del c
+
+for nm, fn in ( ( 'json.load()', lambda : load_json( d ) ), ( 'Character load', lambda : load( d ) ) ):
+  p = peak( fn )
+  t = timed( fn )
+  print(f'{nm:14s}: peak {p:6d} bytes, {t/1000:6.1f} ms')
+print(f'Kept after loading: {a} bytes')
+
+# Tidy up
+tidy( _DIR )
@@ -0,0 +1,55 @@
+# Heap churn test for the image buffer pool
+# Repeatedly loads the small assets, with and without the pool, and reports
+# free memory after each round.  With the pool, mem_free should settle and stay put.
+# Fails if free memory at the end is more than _TOLERANCE below the start,
+# not counting the free buffers the pool keeps, or if the pool still has
+# buffers out.
+#
+# Run from the App directory (so that img and /assets are available)
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import gc
+import img
+from micropython import const
+
+_TOLERANCE = const(256) # Bytes of drift allowed for noise
+
+_ASSETS = (
+  '/assets/oledlogo.pi',
+  '/assets/nosd.pi',
+  '/assets/nosd_24x16.pi',
+  '/assets/skull.pi',
+)
+
+def churn( rounds=200, into_pool=True, every=20 ):
+  gc.collect()
+  start = gc.mem_free()
+  low = start
+  for r in range(rounds):
+    for a in _ASSETS:
+      if into_pool:
+        with img.load( a, into_pool=True ) as h:
+          h.fb.pixel(0,0)
+      else:
+        fb = img.load( a )
+        fb.pixel(0,0)
+        del fb
+    gc.collect()
+    free = gc.mem_free()
+    low = min( low, free )
+    if r % every == 0:
+      print(f'{r:5d} free {free} ({free-start:+d})')
+  end = gc.mem_free()
+  print(f'{"pool" if into_pool else "no pool"}: start {start}, end {end}, lowest {low}')
+  
+  # The pool holds on to some free buffers by design
+  kept = sum([ s[0] * s[5] for s in img.pool.stats() ]) if into_pool else 0
+  assert start - end <= kept + _TOLERANCE, f'Leak: {start - end - kept} bytes'
+
+churn( into_pool=False )
+churn( into_pool=True )
+img.pool.report()
+assert not any([ s[1] for s in img.pool.stats() ]), 'Pooled buffers not released'
+print('OK')
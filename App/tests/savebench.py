@@ -0,0 +1,210 @@
+# Savefile benchmark
+# Times Character._load() from stats.json and from the stats.bin sidecar, and
+# measures how much heap each allocates, using the example character from the
+# README.  Then the same from stats.json for a character with many levels (eg.
+# a druid's wild shapes), where only the current level gets loaded, against
+# loading all of them.  Then compares writing stats.json a piece at a time with building
+# it as dicts for json.dump(), as it used to be, by time and heap (and checks
+# they come out the same).  Then compares save_now() with the previous save
+# method (writing stats.json twice), by time and bytes written, with a save
+# that finds nothing has changed, and with saving a single change to the
+# journal.  Finishes with the save scheduler's numbers, including the wait it
+# would use before saving, given those save times.
+#
+# Run from the App directory.  Works in a scratch directory on internal flash.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import gc
+import os
+import json
+from time import ticks_us, ticks_diff
+from gadget_app.character import try_sync, _item_names
+from gadget_app import _char_bin, _char_sched
+from gadget_app.common import CHAR_STATS_BIN, CHAR_JOURNAL
+from benchutil import EXAMPLE, Saver, bare, scratch, write_stats, tidy
+
+_DIR = '/savebench'
+_REPS = 10
+_LEVELS = 12 # For the many-levels character
+
+# Load the character without the rest of Character.__init__()
+def load( d ):
+  c = bare( d )
+  c._saver = None
+  c._compactor = None
+  c._sched = _char_sched.SaveScheduler()
+  c._load()
+  return c
+
+# Load the character, and every level in it, as if each had been switched to
+def load_all( d ):
+  c = load( d )
+  for i in range( len(c.levels) ):
+    c._level( i )
+  return c
+
+# Returns ( us per load, bytes allocated per load, bytes kept )
+def bench( d, fn=load ):
+  fn( d ) # Warm up
+  
+  gc.collect()
+  t = ticks_us()
+  for _ in range(_REPS):
+    fn( d )
+  t = ticks_diff( ticks_us(), t )
+  
+  # With the GC off, everything allocated stays allocated (unless _load() collects explicitly): roughly the peak
+  gc.collect()
+  gc.disable()
+  a = gc.mem_alloc()
+  c = fn( d )
+  a = gc.mem_alloc() - a
+  gc.enable()
+  
+  # What the character itself holds onto
+  gc.collect()
+  k = gc.mem_alloc()
+  c = None
+  gc.collect()
+  k -= gc.mem_alloc()
+  
+  return t // _REPS, a, k
+
+# Character._save_file(), as it was: the whole savefile as dicts, then json.dump()
+def old_save( c, f ) -> int:
+  s = c.data
+  sf = {
+    'name'    : c.name,
+    'version' : 1,
+    'system'  : 'dnd-5e',
+    'data'    : {
+      'xp'       : s[2],
+      'currency' : dict(zip( ( 'copper', 'silver', 'electrum', 'gold', 'platinum' ), s[3] )),
+      'death'    : dict(zip( ( 'status', 'successes', 'failures' ), ( ( 'stable', 'saves', 'dead' )[ s[8][0] ], s[8][1], s[8][2] ) )),
+      'currentLevel' : s[1],
+      'levels' : [ {
+          'name'    : lv[0],
+          'hp'      : dict(zip( ( 'current', 'max', 'temporary' ), lv[1][:3] )),
+          'hitdice' : dict(zip( ( 'current', 'max' ), lv[2] )),
+          'spells'  : [ dict(zip( ( 'current', 'max' ), sp )) for sp in zip( lv[3][0], lv[3][1] ) ],
+          'items'   : [ {
+              'name'    : it[3],
+              'current' : it[0],
+              'max'     : it[1],
+              'reset'   : [ x for b, x in enumerate( ( 'sr', 'lr', 'dawn' ) ) if it[2] & ( 1 << b ) ],
+            } for it in zip( lv[4][0], lv[4][1], lv[4][2], _item_names( lv[4] ) ) ],
+        } for lv in c.levels ]
+    }
+  }
+  with open( f, 'w' ) as fd:
+    json.dump( sf, fd )
+    return fd.tell()
+
+# Returns ( us per write, bytes allocated per write )
+def bench_write( fn, f ):
+  gc.collect()
+  t = ticks_us()
+  for _ in range(_REPS):
+    fn( f )
+  t = ticks_diff( ticks_us(), t )
+  
+  gc.collect()
+  gc.disable()
+  a = gc.mem_alloc()
+  fn( f )
+  a = gc.mem_alloc() - a
+  gc.enable()
+  gc.collect()
+  
+  return t // _REPS, a
+
+d = scratch( _DIR, 'Hemlock' )
+bs = str( d / CHAR_STATS_BIN )
+
+# JSON only
+js = write_stats( d, EXAMPLE )
+try:
+  os.remove( bs )
+except OSError:
+  pass
+tj, aj, _ = bench( d )
+
+# With the sidecar
+c = load( d )
+assert _char_bin.save( bs, js, c.name, c.data, c.levels, c.current_level )
+tb, ab, _ = bench( d )
+
+print(f'stats.json: {os.stat(js)[6]:5d} bytes, {tj/1000:6.1f} ms/load, {aj:6d} bytes allocated')
+print(f'stats.bin:  {os.stat(bs)[6]:5d} bytes, {tb/1000:6.1f} ms/load, {ab:6d} bytes allocated')
+
+# Many levels, from stats.json
+dm = scratch( _DIR, 'Druid' )
+lvs = []
+for i in range(_LEVELS):
+  lv = dict( EXAMPLE['data']['levels'][0] )
+  lv['name'] = f'Shape {i}'
+  lvs.append( lv )
+write_stats( dm, { 'name':'Druid', 'version':1, 'data':{ 'currentLevel':'Shape 0', 'levels':lvs } } )
+del lvs, lv
+for nm, fn in ( ( 'current', load ), ( 'all', load_all ) ):
+  t, a, k = bench( dm, fn )
+  print(f'{_LEVELS} levels, {nm:7s}: {t/1000:6.1f} ms/load, {a:6d} bytes allocated, {k:6d} bytes kept')
+tidy( str(dm) )
+
+# Writing stats.json: as dicts, then a piece at a time
+# Both should read back the same
+tw0, aw0 = bench_write( lambda f: old_save( c, f ), js + '.old' )
+tw, aw = bench_write( c._save_file, js + '.new' )
+with open( js + '.old' ) as fd:
+  j0 = json.load( fd )
+with open( js + '.new' ) as fd:
+  assert json.load( fd ) == j0, 'Savefiles differ'
+os.remove( js + '.old' )
+print(f'Write (dicts):     {tw0/1000:6.1f} ms, {aw0:6d} bytes allocated')
+print(f'Write (streamed):  {tw/1000:6.1f} ms, {aw:6d} bytes allocated')
+
+# Saving, the previous way: stats.json.new, sync, stats.json, sync
+c._saver = Saver()
+c._compactor = Saver()
+t = ticks_us()
+for _ in range(_REPS):
+  n = c._save_file( js + '.new' )
+  try_sync()
+  n += c._save_file( js )
+  try_sync()
+t = ticks_diff( ticks_us(), t )
+os.remove( js + '.new' )
+print(f'Save (2 writes): {n:5d} bytes, {t/_REPS/1000:6.1f} ms/save')
+
+# Compacting save_now(): one write and a rename (plus the sidecar)
+# Something has to change each time, or the save gets skipped
+t = ticks_us()
+for i in range(_REPS):
+  c.data[2] = i # XP, without journalling it
+  c.save_now( compact=True )
+t = ticks_diff( ticks_us(), t )
+
+# Save with nothing changed: skipped
+t0 = ticks_us()
+for _ in range(_REPS):
+  c.save_now( compact=True )
+t0 = ticks_diff( ticks_us(), t0 )
+n = os.stat(js)[6] + os.stat(bs)[6]
+print(f'Save (compact):  {n:5d} bytes, {t/_REPS/1000:6.1f} ms/save')
+print(f'Save (skipped):      0 bytes, {t0/_REPS/1000:6.1f} ms/save')
+
+# Usual save_now(): one change appended to the journal
+jn = str( d / CHAR_JOURNAL )
+t = ticks_us()
+for i in range(_REPS):
+  c.set_xp( i )
+  c.save_now()
+t = ticks_diff( ticks_us(), t )
+print(f'Save (journal):  {os.stat(jn)[6]//_REPS:5d} bytes, {t/_REPS/1000:6.1f} ms/save')
+print(f'Scheduler: {c._sched.stats()}')
+
+# Tidy up
+c.save_now( compact=True )
+tidy( _DIR )
@@ -0,0 +1,94 @@
+# Character select benchmark
+# Times finding the characters for the select screen, and measures the peak
+# heap while finding them and the heap kept while it's showing, with 6 and
+# with 30 characters.  Compares reading CharacterSummary objects (as
+# Gadget._find_chars() does now) with loading a full Character for each (as
+# it used to), with and without stats.bin.
+#
+# The peak is everything allocated while finding them with the GC off, so it
+# counts garbage too, as if nothing got collected along the way.
+#
+# Run from the App directory.  Works in a scratch directory on internal flash.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import gc
+from time import ticks_us, ticks_diff
+from gadget_app.pathlib import Path
+from gadget_app.character import CharacterSummary, recover_save
+from gadget_app import _char_bin
+from gadget_app.common import CHAR_STATS, CHAR_STATS_BIN
+from benchutil import EXAMPLE, hal, bare, scratch, write_stats, tidy
+
+_DIR = '/selectbench'
+_COUNTS = ( 6, 30 )
+
+# The old way: a full Character, without the rest of Character.__init__() (so it's a slight underestimate)
+def full( d ):
+  c = bare( d )
+  c._load()
+  return c
+
+# The new way
+def summary( d ):
+  return CharacterSummary( hal, d )
+
+# Discover every character in the scratch directory, as _find_chars() does
+def find( f ):
+  chars = []
+  for x in sorted( Path(_DIR).glob('*'), key=str ):
+    recover_save( x )
+    chars.append( f( x ) )
+  return chars
+
+# Returns ( us to find them all, peak bytes allocated while finding them, bytes still allocated while they're kept )
+# The peak is None if it ran out of heap with the GC off
+def bench( f ):
+  gc.collect()
+  a = gc.mem_alloc()
+  t = ticks_us()
+  chars = find( f )
+  t = ticks_diff( ticks_us(), t )
+  gc.collect()
+  a = gc.mem_alloc() - a
+  chars = None
+  gc.collect()
+  
+  # Again, with nothing collected along the way
+  gc.disable()
+  p = gc.mem_alloc()
+  try:
+    chars = find( f )
+    p = gc.mem_alloc() - p
+  except MemoryError:
+    p = None
+  finally:
+    gc.enable()
+  chars = None
+  gc.collect()
+  
+  return t, p, a
+
+# Make the character directories
+def make( n ):
+  for i in range(n):
+    EXAMPLE['name'] = f'Char {i}'
+    write_stats( scratch( _DIR, f'Char{i:02d}' ), EXAMPLE )
+
+# Add stats.bin for every character
+def sidecars():
+  for d in Path(_DIR).glob('*'):
+    c = full( d )
+    assert _char_bin.save( str( d / CHAR_STATS_BIN ), str( d / CHAR_STATS ), c.name, c.data, c.levels, c.current_level )
+
+for n in _COUNTS:
+  make( n )
+  for bs in ( False, True ):
+    if bs:
+      sidecars()
+    for nm, f in ( ( 'Character', full ), ( 'CharacterSummary', summary ) ):
+      t, p, a = bench( f )
+      p = f'{p:6d}' if p is not None else ' >heap'
+      print(f'{n:2d} chars, {"with" if bs else "no  "} stats.bin, {nm:16s}: {t/1000:7.1f} ms, {p} bytes peak, {a:6d} bytes kept')
+  tidy( _DIR )
@@ -0,0 +1,89 @@
+# Character switching benchmark
+# Times changing between two characters: through the select screen (System >
+# Change Character, then choosing one), the first time each gets loaded and
+# once it's in the party, and with System > Party, which goes straight from
+# one to the other without the select screen.  Each is timed to when the
+# menus are ready, and to when the eink has finished refreshing.
+#
+# Waits up to _SETTLE for each eink refresh to start, so anything that doesn't
+# refresh the eink gets that added on.
+#
+# Needs the SD card in, with at least two characters on it.  Run from the App
+# directory, in place of main.py.  Soft reset afterwards.
+#
+# T. Lloyd
+# 19 Oct 2026
+
+import gc
+import asyncio
+from time import ticks_ms, ticks_diff
+from micropython import const
+from gadget_app import Gadget
+
+_REPS = const(5)
+_SETTLE = const(500) # ms to wait for an eink refresh to start
+
+# Wait for the eink refresh to start (if there's one coming), then to finish
+async def eink_done( g ):
+  eink = g.hal.eink
+  t = ticks_ms()
+  while eink.unbusy.is_set() and ticks_diff( ticks_ms(), t ) < _SETTLE:
+    await asyncio.sleep_ms( 10 )
+  while not eink.unbusy.is_set():
+    await asyncio.sleep_ms( 10 )
+
+# Run fn( *args )
+# Returns ( ms until it returned, ms until the eink was done )
+async def timed( g, fn, *args ):
+  gc.collect()
+  t = ticks_ms()
+  fn( *args )
+  r = ticks_diff( ticks_ms(), t )
+  await eink_done( g )
+  return r, ticks_diff( ticks_ms(), t )
+
+# Change character the long way: the select screen, then character i
+# Returns ( ms until the menus were ready, ms until the eink was done ), for both steps together
+async def via_select( g, i:int ):
+  sr, sd = await timed( g, g.select_character )
+  if len( g._chars ) < 2:
+    raise RuntimeError('Need at least two characters')
+  cr, cd = await timed( g, g._set_char_cb, i )
+  return sr + cr, sd + cd
+
+def report( nm:str, ts:list ):
+  r = [ t[0] for t in ts ]
+  d = [ t[1] for t in ts ]
+  print(f'{nm:22s}: menus {sum(r)//len(r):5d} ms (min {min(r):5d}), eink {sum(d)//len(d):5d} ms (min {min(d):5d})')
+
+async def main():
+  g = Gadget()
+  
+  # Mount the SD card, as Gadget.start_app() does
+  asyncio.create_task( g._sd_controller() )
+  await g.hal.sd.card_state_known.wait()
+  if g.hal.sd.card_ready.is_set():
+    await g._sd_mount_attempted.wait()
+  g._show_splash = False
+  
+  # First character, then the second: both loaded from the card
+  await timed( g, g.select_character )
+  first = [ await timed( g, g._set_char_cb, 0 ) ]
+  first.append( await via_select( g, 1 ) )
+  
+  # Then back and forth: to the first with the select screen, and back to the second with the party menu
+  sel = []
+  party = []
+  for i in range(_REPS):
+    sel.append( await via_select( g, 0 ) )
+    party.append( await timed( g, g._party_switch, g._party[0] ) )
+    print(f'Rep {i+1}: {g.character.get_name()} in play, {len(g._party)} in party, {gc.mem_free()} bytes free')
+  
+  print()
+  report( 'Select screen (load)', first )
+  report( 'Select screen (party)', sel )
+  report( 'Party menu', party )
+  
+  g.cleanup()
+
+asyncio.run( main() )
@@ -1,14 +1,30 @@
 # e-ink font converter
 #
+# Builds a .2f font from a TrueType/OpenType font, a BDF bitmap font, or a
+# sprite sheet (glyphs stacked vertically, in charset order), with tight
+# per-glyph widths.  Running it on a .2f does the reverse, writing the sheet
+# out as a PNG (which can be edited and converted back).  The PNG keeps the
+# .2f's widths, baseline and index with it, so converting it back without
+# changes gives the same .2f, byte for byte.
+#
+# Output only depends on the inputs and options, so fonts can be rebuilt as
+# part of an asset build.  Each stage is timed.
+#
+# Usage:
+#   python mkfont.py SRC [-o OUT] [--charset STR] [--size PX] [--bpp {1,2}] [--mono] [--lsb-first] ...
+#
 # 24 Feb 2025
 
-import tkinter as tk
-from tkinter.filedialog import askopenfilename
-from tkinter import messagebox
+from argparse import ArgumentParser
+from hashlib import sha256
+import json
 from pathlib import Path
-from PIL import Image
-from struct import pack#, unpack
-from sys import exit
+from struct import pack, unpack
+from time import perf_counter
+
+from PIL import Image, ImageDraw, ImageFont
+from PIL.PngImagePlugin import PngInfo
+import numpy as np
 
 # Our file format extension
 EXT = '.2f'
@@ -16,211 +32,439 @@ EXT = '.2f'
 # Standard image formats we recognise (incomplete list)
 imageTypes = ( '.jpg', '.jpeg', '.gif', '.png' )
 
-# Construct the 2-colour pallette
-pal1 = Image.new( mode='P', size=(2,1) )
-pal1.putpixel( xy=(0,0), value=(255,0,255) )   # 0 = transparent
-pal1.putpixel( xy=(1,0), value=(0,0,0) )       # 1 = black
-
-# Construct the 4-colour pallette
-pal2 = Image.new( mode='P', size=(4,1) )
-pal2.putpixel( xy=(0,0), value=(255,0,255) )   # 0 = transparent
-pal2.putpixel( xy=(1,0), value=(0,0,0) )       # 1 = black
-pal2.putpixel( xy=(2,0), value=(255,0,0) )     # 2 = red
-pal2.putpixel( xy=(3,0), value=(255,255,255) ) # 3 = white
-
-def encode(path):
-  
-  # Params
-  # TODO: figure out a way to get these from user, don't hardcode
-  #
-  bpp = 1
-  glyph_height = 13
-  glyph_width = 10
-  glyph_height_above_baseline = 12
-  num_glyphs = 37
-  #
-  # Where in the image each glyph is
-  # Table must start at ASCII 32, but can be any length (up to ASCII 255)
-  glyph_index = [
-  # 32, 33, ...
-  #    !  "  #  $  %  &  '
-    0, 0, 0, 0, 0, 0, 0, 0,
-  # (  )  *  +  ,  -  .  /
-    0, 0, 0, 0, 0, 0, 0, 0,
-  #  0  1  2  3  4  5  6  7
-    27,28,29,30,31,32,33,34,
-  # 8  9  :  ;  <  =  >  ?
-    35,36,0, 0, 0, 0, 0, 0,
-  # @  A  B  C  D  E  F  G
-    0, 1, 2, 3, 4, 5, 6, 7,
-  # HIJKLMNO
-    8, 9,10,11,12,13,14,15,
-  # PQRSTUVW
-    16,17,18,19,20,21,22,23,
-  #  X  Y  Z  [  \  ]  ^  _
-    24,25,26, 0, 0, 0, 0, 0,
-  # `  a  b  c  d  e  f  g
-    0, 1, 2, 3, 4, 5, 6, 7,
-  # hijklmno
-    8, 9,10,11,12,13,14,15,
-  # pqrstuvw
-    16,17,18,19,20,21,22,23,
-  #  x  y  z  {  |  }  ~  127
-    24,25,26
-  ]
-  #
-  # Table should follow glyph index order
-  #variable_width_table = None
-  variable_width_table = [
-    0,    
-    12, 12, 11, 12, 11, 9, 11, 12,
-    6, 9, 12, 10, 13, 12, 12, 11,
-    13, 13, 8, 10, 12, 13, 13, 11,
-    10, 10,
-    10, 10, 10, 10, 10, 10, 10, 10, 10, 10
-  ]
-  #
-  # End of params
-  
-  # Load in the image to convert
+# Outline fonts we can rasterise
+vectorTypes = ( '.ttf', '.otf' )
+bitmapTypes = ( '.bdf', )
+
+# Sheet colours, by pallet index
+# The device maps these onto the pallet given to Font.write_to(): 1 = main, 2 = fill, 3 = highlight
+SHEET_PALLET = [
+  (255,  0,255), # 0 = transparent
+  (  0,  0,  0), # 1 = black
+  (255,  0,  0), # 2 = red
+  (255,255,255), # 3 = white
+]
+
+# Glyph 0 is drawn for any character the font doesn't have
+# The shipped fonts have a blank there, then capitals and digits
+DEFAULT_CHARSET = ' ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+# Head format (bytes 0x00 to 0x0F)
+'''
+0x00 1   Format version (must be 1)
+0x01 1   Image width, in pixels
+0x02 1   Glyph height, in pixels
+0x03 1   Number of glyphs
+0x04 1   Bits per pixel
+0x05 1   Glyph width (used for spaces; for everything, if there's no variable width table)
+0x06 1   Baseline height
+0x07 1   Index length
+0x08 2   Pointer to start of image data
+0x0A 2   Pointer to optional table of individual glyph widths.  If zero, assume monospace
+0C   1   Flags
+0D   3   Reserved
+10   x   Glyph Index Table
+'''
+_HEAD = '>8B2HB3x'
+_VERSION = 1
+_INDEX = 0x10
+
+# Head flags (byte 0x0C)
+FLAG_LSB_FIRST = 0x01 # Leftmost pixel in the least significant bits, as the panel's framebuffers have it
+
+# PNG text chunk that decoded sheets keep the rest of the .2f in
+# JSON: { glyphs, height, baseline, space, bpp, widths (None if monospace), index (hex), lsb_first }
+_META = 'mkfont'
+
+######## RASTERISERS ########
+# Each returns ( glyphs, baseline, space ), where glyphs is an (n, height, width)
+# uint8 array of sheet pallet indices, one glyph per charset character,
+# baseline is the number of rows above the baseline, and space is the advance
+# width of a space (or None if the source doesn't say).
+
+# Render with FreeType, via PIL
+def raster_vector( path:Path, charset:str, size:int, threshold:int ):
+  font = ImageFont.truetype( str(path), size )
+  ascent, descent = font.getmetrics()
+  
+  # Every glyph gets a cell this size, with room either side for overhangs
+  pad = size
+  w = pad + max( int(np.ceil( font.getlength(c) )) for c in charset ) + pad
+  h = ascent + descent
+  
+  # Draw the whole charset into one strip, then convert it in one go
+  strip = Image.new( 'L', ( w, h*len(charset) ), 0 )
+  draw = ImageDraw.Draw( strip )
+  draw.fontmode = 'L'
+  for i, c in enumerate(charset):
+    draw.text( ( pad, i*h + ascent ), c, font=font, fill=255, anchor='ls' )
+  
+  glyphs = ( np.asarray( strip ) >= threshold ).reshape( len(charset), h, w ).astype(np.uint8)
+  return glyphs, ascent, round( font.getlength(' ') )
+
+# Unpack a BDF with PIL's parser
+def raster_bitmap( path:Path, charset:str ):
+  from PIL.BdfFontFile import BdfFontFile
+  with open( path, 'rb' ) as fd:
+    bdf = BdfFontFile( fd )
+  
+  # Glyph boxes are relative to the origin on the baseline, with y going up
+  found = [ bdf.glyph[ord(c)] if ord(c) < len(bdf.glyph) else None for c in charset ]
+  boxes = [ g[1] for g in found if g is not None ]
+  if not boxes:
+    raise ValueError(f'{path.name} has none of the characters asked for')
+  ascent = max( 0, -min( b[1] for b in boxes ) )
+  descent = max( 0, max( b[3] for b in boxes ) )
+  left = max( 0, -min( b[0] for b in boxes ) )
+  w = left + max( b[2] for b in boxes )
+  h = ascent + descent
+  
+  glyphs = np.zeros( ( len(charset), h, w ), dtype=np.uint8 )
+  for i, g in enumerate(found):
+    if g is None:
+      continue
+    _, ( x0, y0, x1, y1 ), _, im = g
+    if x1 > x0 and y1 > y0:
+      glyphs[ i, ascent+y0:ascent+y1, left+x0:left+x1 ] = np.asarray( im.convert('L') ) > 0
+  
+  sp = bdf.glyph[32]
+  return glyphs, ascent, None if sp is None else sp[0][0]
+
+# Cut up a sprite sheet of n glyphs.  Colours are matched to the nearest sheet pallet entry.
+def raster_sheet( path:Path, n:int, height:int|None, baseline:int|None ):
   with Image.open(path) as img:
-    img.load()
-  
-  # Input validation
-  assert glyph_height*num_glyphs == img.height
-  if variable_width_table is not None:
-    assert len(variable_width_table) == num_glyphs
-  
-  # Figure out some pallette stuff
-  assert bpp in (1,2)
-  if bpp == 1:
-    pal = pal1
-    transparent_rgb = 'rgb(255,0,255)'
-    #transparent_index = 0
-  else:
-    pal = pal2
-    transparent_rgb = 'rgb(255,0,255)'
-    #transparent_index = 3
-  
-  # If the image isn't a multiple of 8 pixels wide, pad it with transparency
-  to_add = -img.width % 8
-  if to_add > 0:
-    new_width = img.width + to_add
-    new_img = Image.new( mode='RGB', size=( new_width, img.height ), color=transparent_rgb )
-    new_img.paste( img, (0,0) )
-    img = new_img
-    del to_add, new_img
-  
-  # Get dims
-  width = img.width
-  #width_bytes = width//8
-  height = img.height
-    
-  # Convert to indexed
-  img = img.convert(mode='RGB').quantize( colors=2**bpp, palette=pal, dither=Image.Dither.FLOYDSTEINBERG )
-  
-  # Get some stats
-  width = img.width
-  height = img.height
-  #byte_width = width // 8
-  
-  # Get the image as just bytes
-  # Each pixel is a byte
-  img_bytes = img.tobytes()
-  
-  # Setup the output image buffer
-  output_bits = height * width * bpp
-  output_len = output_bits // 8
-  output = bytearray(output_len)
-  #pixels_per_byte = 8//bpp
-  
-  # Counts pixel position (one byte per pixel) within the input array
-  p=0
-  
-  # Generate the output image
-  for i in range(output_len):
-    
-    # Step through pixels within byte
-    for j in range( 0, 8, bpp ):
-      
-      # Encode pixel colour format and bitshift to correct position in byte
-      pixel = img_bytes[p] << ((8-bpp)-j)
-      
-      # Update the byte with the pixel
-      output[i] = output[i] | pixel
-      
-      # Increment the pixel counter
-      p += 1
-  
-  # We are version 1
-  version = 1
-  
-  # Where will the image data be?
-  index_length = len(glyph_index)
-  ptr_img = 0x10 + index_length
-  
-  # Figure out the variable widths table pointer
-  # Table goes after image data
-  if variable_width_table is None:
-    ptr_variable_width = 0
+    rgba = np.asarray( img.convert('RGBA'), dtype=np.int32 )
+  
+  if height is None:
+    height = rgba.shape[0] // n
+  if rgba.shape[0] != height * n:
+    raise ValueError(f'Sheet is {rgba.shape[0]} px tall, expected {n} glyphs of {height} px')
+  
+  # Nearest pallet colour for every pixel at once.  Anything mostly see-through is transparent.
+  pal = np.array( SHEET_PALLET, dtype=np.int32 )
+  dist = ( ( rgba[:,:,None,:3] - pal[None,None,:,:] ) ** 2 ).sum( axis=3 )
+  indexed = dist.argmin( axis=2 ).astype(np.uint8)
+  indexed[ rgba[:,:,3] < 128 ] = 0
+  
+  return indexed.reshape( n, height, -1 ), height-1 if baseline is None else baseline, None
+
+# The .2f layout a decoded sheet was saved with (see _META), or None for any other image
+def sheet_meta( path:Path ) -> dict|None:
+  with Image.open(path) as img:
+    meta = getattr( img, 'text', {} ).get( _META )
+  return None if meta is None else json.loads( meta )
+
+######## PROCESSING ########
+
+# Give 1bpp glyphs a one pixel black outline, filled with red, as the shipped 2bpp fonts have
+def outline( glyphs:np.ndarray ) -> np.ndarray:
+  g = np.pad( glyphs != 0, ( (0,0), (1,1), (1,1) ) )
+  
+  # Dilate by one pixel in all eight directions
+  d = np.pad( g, ( (0,0), (1,1), (1,1) ) )
+  grown = np.zeros_like( g )
+  for dy in (0,1,2):
+    for dx in (0,1,2):
+      grown |= d[ :, dy:dy+g.shape[1], dx:dx+g.shape[2] ]
+  
+  return np.where( g, 2, np.where( grown, 1, 0 ) ).astype(np.uint8)
+
+# Shift each glyph to the left edge of its cell, and measure it
+# mono: Keep the glyphs' positions relative to each other, and give them all the same width
+# Returns ( glyphs, widths )
+def tighten( glyphs:np.ndarray, mono:bool ):
+  n, h, w = glyphs.shape
+  
+  # Which columns each glyph uses
+  used = ( glyphs != 0 ).any( axis=1 )
+  empty = ~used.any( axis=1 )
+  first = np.where( empty, 0, used.argmax( axis=1 ) )
+  last = np.where( empty, -1, w - 1 - used[:, ::-1].argmax( axis=1 ) )
+  
+  if mono:
+    x0 = first[~empty].min() if not empty.all() else 0
+    first[:] = x0
+    widths = np.full( n, max( 0, last.max() - x0 + 1 ) )
   else:
-    ptr_variable_width = ptr_img + output_len
+    widths = last - first + 1
+  
+  # Gather every glyph's columns from its first used one, blanking anything past its width
+  cols = first[:,None] + np.arange(w)[None,:]
+  shifted = np.take_along_axis( glyphs, np.minimum( cols, w-1 )[:,None,:].repeat( h, axis=1 ), axis=2 )
+  shifted[ np.broadcast_to( ( np.arange(w)[None,:] >= widths[:,None] )[:,None,:], shifted.shape ) ] = 0
   
+  return shifted, widths.astype(np.int64)
+
+# Pack one-byte-per-pixel rows into bpp-bit pixels
+def pack_pixels( indexed:np.ndarray, bpp:int, lsb_first:bool ) -> bytes:
+  '''Pack a (height, width) array of pixel values into rows of bytes
+  
+  The width must be a whole number of bytes.
+  lsb_first: Leftmost pixel in the least significant bits (the panel's order).
+             Otherwise the most significant bits, as the original fonts were made.
   '''
-  0x00 1   Format version (must be 1)
-  0x01 1   Image width, in pixels
-  0x02 1   Glyph height, in pixels
-  0x03 1   Number of glyphs
-  0x04 1   Bits per pixel
-  0x05 1   Glyph width (ignored if variable width table is given)
-  0x06 1   Baseline height
-  0x07 1   Index length
-  0x08 2   Pointer to start of image data
-  0x0A 2   Pointer to optional table of individual glyph widths.  If zero, assume monospace
-  0C   4   Reserved
-  10   x   Glyph Index Table
+  ppb = 8 // bpp
+  height, width = indexed.shape
+  px = indexed.astype(np.uint8).reshape( height, width // ppb, ppb )
+  shifts = np.arange( ppb, dtype=np.uint8 ) * bpp
+  if not lsb_first:
+    shifts = shifts[::-1]
+  return np.bitwise_or.reduce( px << shifts, axis=2 ).astype(np.uint8).tobytes()
+
+# Inverse of pack_pixels()
+def unpack_pixels( data:bytes, width:int, height:int, bpp:int, lsb_first:bool ) -> np.ndarray:
+  ppb = 8 // bpp
+  raw = np.frombuffer( data, dtype=np.uint8 ).reshape( height, width // ppb, 1 )
+  shifts = np.arange( ppb, dtype=np.uint8 ) * bpp
+  if not lsb_first:
+    shifts = shifts[::-1]
+  return ( ( raw >> shifts ) & ( (1<<bpp) - 1 ) ).reshape( height, width ).astype(np.uint8)
+
+# Which glyph each character code (from ASCII 32) is drawn with
+# fold_case: Lowercase letters missing from the charset use their capitals
+def build_index( charset:str, fold_case:bool ) -> bytes:
+  pos = {}
+  for i, c in enumerate(charset):
+    pos.setdefault( c, i )
+  
+  index = []
+  for code in range( 32, 256 ):
+    c = chr(code)
+    if c not in pos and fold_case and c.upper() in pos:
+      c = c.upper()
+    index.append( pos.get( c, 0 ) )
+  
+  # Trim codes past the last one we have, which fall back to glyph 0 on the device anyway
+  while index and index[-1] == 0:
+    index.pop()
+  return bytes(index)
+
+######## ENCODE / DECODE ########
+
+# Build a .2f from any supported source
+def encode( src:Path, out:Path|None=None, charset:str|None=None, fold_case:bool=True,
+            size:int=16, height:int|None=None, baseline:int|None=None, bpp:int|None=None,
+            mono:bool=False, space:int|None=None, threshold:int=128, lsb_first:bool=False,
+            preview:Path|None=None, verbose:bool=True ) -> Path:
+  '''Convert a font or sprite sheet to a .2f
+  
+  src:       TTF/OTF, BDF, or sprite sheet image (glyphs stacked vertically, in charset order)
+  out:       Output path.  Defaults to src with the .2f extension.
+  charset:   The characters to include, in glyph order.  The first is drawn for unknown characters.
+             Defaults to a decoded sheet's own index, or DEFAULT_CHARSET.
+  fold_case: Lowercase letters not in the charset are drawn with their capitals
+  size:      Pixel size to render TTF/OTF fonts at
+  height:    Sheet glyph height (default: sheet height / charset length)
+  baseline:  Sheet rows above the baseline (default: height-1)
+  
+  A sheet decoded from a .2f keeps that font's layout (see _META).  Its glyphs
+  stay where they are, with their stored widths, and its height, baseline,
+  space, bpp, index and bit order are the defaults for the options above.
+  bpp:       1 or 2.  Defaults to 1 for fonts (2 adds an outline), or whatever the sheet uses.
+  mono:      Monospace: keep one width for all glyphs, with no width table
+  space:     Advance width of a space (default: from the font, or the average glyph width)
+  threshold: Coverage (0-255) at which a rendered TTF pixel is set
+  lsb_first: Pack in the panel's bit order, so the device doesn't have to swap the glyphs
+  preview:   Optional path to save the glyph sheet as a PNG
+  
+  Returns the output path.
   '''
-  # Construct the head (bytes 0x00 to 0x0F)
-  head = pack( '>8B2H4x',
-    version,
-    width,
-    glyph_height,
-    num_glyphs,
+  
+  times = []
+  t = perf_counter()
+  def lap( stage ):
+    nonlocal t
+    now = perf_counter()
+    times.append(( stage, now - t ))
+    t = now
+  
+  suffix = src.suffix.lower()
+  
+  # A decoded sheet brings its own layout
+  meta = sheet_meta( src ) if suffix in imageTypes else None
+  if meta is not None:
+    height = meta['height'] if height is None else height
+    baseline = meta['baseline'] if baseline is None else baseline
+    space = meta['space'] if space is None else space
+    bpp = meta['bpp'] if bpp is None else bpp
+    mono = mono or meta['widths'] is None
+    lsb_first = lsb_first or meta['lsb_first']
+  elif charset is None:
+    charset = DEFAULT_CHARSET
+  
+  if charset is not None:
+    if not charset:
+      raise ValueError('Empty charset')
+    if not all( 32 <= ord(c) <= 255 for c in charset ):
+      raise ValueError('The index only covers characters 32 to 255')
+  if bpp not in ( None, 1, 2 ):
+    raise ValueError('Only 1 or 2 bits per pixel is supported')
+  
+  # Rasterise
+  if suffix in vectorTypes:
+    glyphs, blh, src_space = raster_vector( src, charset, size, threshold )
+  elif suffix in bitmapTypes:
+    glyphs, blh, src_space = raster_bitmap( src, charset )
+  elif suffix in imageTypes:
+    glyphs, blh, src_space = raster_sheet( src, meta['glyphs'] if charset is None else len(charset), height, baseline )
+  else:
+    raise ValueError(f'Unrecognised source type: {src.suffix}')
+  
+  # Fonts come out as plain masks; sheets already have their colours
+  if suffix in imageTypes:
+    if bpp is None:
+      bpp = 2 if ( glyphs > 1 ).any() else 1
+    elif bpp == 1 and ( glyphs > 1 ).any():
+      raise ValueError('Sheet has more than 2 colours, so needs 2bpp')
+  elif bpp == 2:
+    glyphs = outline( glyphs )
+    blh += 1
+  else:
+    bpp = 1
+  lap('raster')
+  
+  # Widths
+  # A decoded sheet's glyphs are already where the .2f had them, so keep them there, at their old widths
+  if meta is not None and len( glyphs ) == meta['glyphs']:
+    n, h, fbw = glyphs.shape
+    widths = np.array( meta['widths'] if meta['widths'] is not None else [space] * n )
+  else:
+    glyphs, widths = tighten( glyphs, mono )
+    n, h, _ = glyphs.shape
+    ppb = 8 // bpp
+    fbw = max( ppb, int( widths.max() ) + ( -int( widths.max() ) % ppb ) )
+    if glyphs.shape[2] < fbw:
+      glyphs = np.pad( glyphs, ( (0,0), (0,0), (0, fbw - glyphs.shape[2]) ) )
+    glyphs = glyphs[ :, :, :fbw ]
+  if space is None:
+    if mono:
+      space = int( widths[0] )
+    elif src_space is not None:
+      space = src_space
+    else:
+      used = widths[ widths > 0 ]
+      space = int( round( used.mean() ) ) if len(used) else 0
+  lap('measure')
+  
+  # Check everything fits in the head
+  for name, v in ( ('Sheet width',fbw), ('Glyph height',h), ('Glyph count',n), ('Space width',space), ('Baseline',blh) ):
+    if not 0 <= v <= 255:
+      raise ValueError(f'{name} ({v}) must fit in one byte')
+  
+  # Pack
+  index = bytes.fromhex( meta['index'] ) if charset is None else build_index( charset, fold_case )
+  data = pack_pixels( glyphs.reshape( n*h, fbw ), bpp, lsb_first )
+  ptr_img = _INDEX + len(index)
+  vw = None if mono else bytes( widths.tolist() )
+  ptr_vw = 0 if vw is None else ptr_img + len(data)
+  head = pack( _HEAD,
+    _VERSION,
+    fbw,
+    h,
+    n,
     bpp,
-    glyph_width,
-    glyph_height_above_baseline,
-    index_length,
+    space,
+    blh,
+    len(index),
     ptr_img,
-    ptr_variable_width,
+    ptr_vw,
+    FLAG_LSB_FIRST if lsb_first else 0,
   )
-
+  raw = head + index + data + ( vw or b'' )
+  lap('pack')
+  
   # Write out the file
-  with open( path.with_suffix(EXT), 'wb') as fd:
-    fd.write(head)
-    fd.write(bytes(glyph_index))
-    fd.write(output)
-    if variable_width_table is not None:
-      fd.write(bytes(variable_width_table))
-
-def decode(path):
-  messagebox.showerror('Not Implemented','Font decode is not supported yet')
-  raise NotImplementedError('No decode functionality yet')
-
-# If this file has been run directly
-if __name__ == "__main__":
+  if out is None:
+    out = src.with_suffix(EXT)
+  out.write_bytes( raw )
+  if preview is not None:
+    _sheet_png( glyphs.reshape( n*h, fbw ) ).save( preview )
+  lap('write')
+  
+  if verbose:
+    print(f'{out}: {n} glyphs, {fbw}x{h} px, {bpp}bpp, {"mono" if mono else "variable"} width, {"LSB" if lsb_first else "MSB"} first, {len(raw)} bytes, sha256 {sha256(raw).hexdigest()[:16]}')
+    print( '  ' + ', '.join( f'{stage} {s*1000:.1f} ms' for stage, s in times ) + f', total {sum( s for _, s in times )*1000:.1f} ms' )
+  
+  return out
+
+# Write a .2f's glyph sheet out as a PNG, and list its glyph widths
+# The rest of the .2f goes in the PNG's _META text chunk, for encode() to build it again from
+def decode( path:Path, out:Path|None=None, verbose:bool=True ) -> Path:
+  raw = path.read_bytes()
+  version, fbw, h, n, bpp, gw, blh, ilen, ptr_img, ptr_vw, flags = unpack( _HEAD, raw[:_INDEX] )
+  if version != _VERSION:
+    raise NotImplementedError(f'File version ({version}) not supported')
+  
+  data = raw[ ptr_img : ptr_img + fbw*h*n*bpp//8 ]
+  sheet = unpack_pixels( data, fbw, h*n, bpp, bool( flags & FLAG_LSB_FIRST ) )
+  
+  widths = list( raw[ ptr_vw : ptr_vw + n ] ) if ptr_vw else None
+  meta = {
+    'glyphs'    : n,
+    'height'    : h,
+    'baseline'  : blh,
+    'space'     : gw,
+    'bpp'       : bpp,
+    'widths'    : widths,
+    'index'     : raw[ _INDEX : _INDEX + ilen ].hex(),
+    'lsb_first' : bool( flags & FLAG_LSB_FIRST ),
+  }
+  info = PngInfo()
+  info.add_text( _META, json.dumps( meta ) )
   
-  # We don't want a full GUI, so keep the root window from appearing
-  tk.Tk().withdraw()
+  if out is None:
+    out = path.with_suffix('.png')
+  _sheet_png( sheet ).save( out, pnginfo=info )
   
-  # Get the image file to convert
-  path = Path( askopenfilename() )
+  if verbose:
+    print(f'{out}: {n} glyphs, {fbw}x{h} px, {bpp}bpp, baseline {blh}, space {gw}, widths {widths}')
+  
+  return out
+
+# Pallet image of a sheet
+def _sheet_png( sheet:np.ndarray ) -> Image.Image:
+  img = Image.fromarray( sheet, mode='P' )
+  img.putpalette( [ v for rgb in SHEET_PALLET for v in rgb ] )
+  return img
+
+def main( argv=None ):
+  ap = ArgumentParser( description='Build a .2f font from a TTF/OTF, BDF or sprite sheet (or unpack a .2f to a PNG sheet)' )
+  ap.add_argument( 'src', type=Path, help='Font, sprite sheet, or .2f to decode' )
+  ap.add_argument( '--out', '-o', type=Path, help='Output path (default: alongside the source)' )
+  ap.add_argument( '--charset', '-c', help="Characters to include, in glyph order. The first is drawn for unknown characters. (default: a decoded sheet's own, or capitals and digits)" )
+  ap.add_argument( '--charset-file', type=Path, help='Read the charset from a (UTF-8) file instead' )
+  ap.add_argument( '--no-fold-case', dest='fold_case', action='store_false', help="Don't draw missing lowercase letters with their capitals" )
+  ap.add_argument( '--size', '-s', type=int, default=16, help='Pixel size to render TTF/OTF fonts at' )
+  ap.add_argument( '--height', type=int, help='Sprite sheet glyph height (default: sheet height / charset length)' )
+  ap.add_argument( '--baseline', type=int, help="Sprite sheet rows above the baseline (default: a decoded sheet's own, or height-1)" )
+  ap.add_argument( '--bpp', type=int, choices=(1,2), help='Bits per pixel. 2 gives fonts a black outline with a red fill.' )
+  ap.add_argument( '--mono', action='store_true', help='Monospace: one width for every glyph, no width table' )
+  ap.add_argument( '--space', type=int, help='Advance width of a space, px' )
+  ap.add_argument( '--threshold', type=int, default=128, help='TTF/OTF coverage (0-255) at which a pixel is set' )
+  ap.add_argument( '--lsb-first', action='store_true', help="Pack glyphs in the panel's native bit order (sets the LSB-first head flag)" )
+  ap.add_argument( '--preview', '-p', type=Path, help='Also save the glyph sheet as a PNG' )
+  ap.add_argument( '--quiet', '-q', action='store_true' )
+  args = ap.parse_args( argv )
+  
+  if not args.src.is_file():
+    ap.error(f'{args.src} is not a file')
   
-  if not path.name:
-    print('Cancelled')
-    exit()
-    
   # What to do?
-  if path.suffix == EXT:
-    decode(path)
-  else:
-    encode(path)
+  if args.src.suffix == EXT:
+    decode( args.src, args.out, verbose=not args.quiet )
+    return 0
+  
+  charset = args.charset
+  if args.charset_file is not None:
+    charset = args.charset_file.read_text( encoding='utf-8' ).rstrip('\n')
+  
+  try:
+    encode( args.src, args.out, charset, args.fold_case, args.size, args.height, args.baseline,
+            args.bpp, args.mono, args.space, args.threshold, args.lsb_first, args.preview,
+            verbose=not args.quiet )
+  except ValueError as e:
+    ap.error( str(e) )
+  return 0
+
+if __name__ == "__main__":
+  raise SystemExit( main() )
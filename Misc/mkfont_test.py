@@ -0,0 +1,67 @@
+# Round-trip check for mkfont.py
+# Decodes every shipped .2f to a PNG sheet and encodes it back with the
+# default options, which must give the same file, byte for byte.  Also checks
+# that a plain sheet (without the decoded layout) still builds with the usual
+# defaults.
+#
+# Usage:
+#   python mkfont_test.py [FONT.2f ...]   (default: App/assets/*.2f)
+#
+# 19 Oct 2026
+
+from pathlib import Path
+from sys import argv
+from tempfile import TemporaryDirectory
+from struct import unpack
+
+from PIL import Image
+
+import mkfont
+
+ASSETS = Path(__file__).resolve().parent.parent / 'App' / 'assets'
+
+# Decode and re-encode one font
+# Returns None if it came back the same, or what was different
+def roundtrip( path:Path, tmp:Path ) -> str|None:
+  png = tmp / ( path.stem + '.png' )
+  out = tmp / path.name
+  mkfont.decode( path, png, verbose=False )
+  mkfont.encode( png, out, verbose=False )
+  
+  a = path.read_bytes()
+  b = out.read_bytes()
+  if a == b:
+    return None
+  if len(a) != len(b):
+    return f'{len(b)} bytes, expected {len(a)}'
+  i = next( i for i in range(len(a)) if a[i] != b[i] )
+  return f'differs from byte 0x{i:x}'
+
+# A sheet without the layout chunk gets tightened, with the baseline on the bottom row
+def plain_sheet( path:Path, tmp:Path ) -> str|None:
+  png = tmp / ( path.stem + '.png' )
+  mkfont.decode( path, png, verbose=False )
+  with Image.open( png ) as img:
+    img.load()
+  plain = tmp / ( path.stem + '_plain.png' )
+  img.save( plain )
+  
+  out = mkfont.encode( plain, tmp / ( path.stem + '_plain.2f' ), verbose=False )
+  fbw, h, n, bpp, gw, blh = unpack( '>6B', out.read_bytes()[1:7] )
+  if blh != h-1:
+    return f'baseline {blh}, expected {h-1}'
+  return None
+
+def main( paths ) -> int:
+  bad = 0
+  with TemporaryDirectory() as tmp:
+    tmp = Path(tmp)
+    for path in paths:
+      for check in ( roundtrip, plain_sheet ):
+        err = check( path, tmp )
+        print(f'{path.name:24s} {check.__name__:12s} {"ok" if err is None else "FAIL: " + err}')
+        bad += err is not None
+  return 1 if bad else 0
+
+if __name__ == "__main__":
+  raise SystemExit( main( [ Path(p) for p in argv[1:] ] or sorted( ASSETS.glob('*.2f') ) ) )
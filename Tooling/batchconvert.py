@@ -0,0 +1,122 @@
+# Headless batch converter for pico-images
+#
+# Recursively converts a directory tree of regular images into .pi files,
+# spreading the work across a pool of processes.
+# Outputs whose source hasn't changed since the last run are skipped.
+#
+# Usage:
+#   python batchconvert.py SRC [DEST] [--oled] [--dither METHOD] [--preview] [--jobs N] [--force]
+#
+# 19 Oct 2026
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from pathlib import Path
+from time import perf_counter
+import json
+import os
+
+import libpi
+from dither import METHODS
+
+# Remembers the hash of each source, so unchanged files can be skipped next time
+MANIFEST = '.libpi-manifest.json'
+
+# Hash of everything that determines the output file
+def _digest( src:Path, pallet:libpi.Pallet, dither:str|None ) -> str:
+  h = sha256()
+  h.update( repr(( pallet, dither )).encode() )
+  h.update( src.read_bytes() )
+  return h.hexdigest()
+
+# Worker: convert one file.  Returns ( relative path, digest, seconds taken ).
+# Must be a module-level function so the pool can pickle it.
+def _convert( src:str, dest:str, pallet:libpi.Pallet, digest:str, rel:str, dither:str|None, preview:bool ):
+  t = perf_counter()
+  Path(dest).parent.mkdir( parents=True, exist_ok=True )
+  preview_to = str( Path(dest).with_suffix('.preview.png') ) if preview else None
+  libpi.encode( src, pallet, saveto=dest, dither=dither, preview_to=preview_to )
+  return rel, digest, perf_counter() - t
+
+def main( argv=None ):
+  ap = ArgumentParser( description='Convert a directory tree of images to .pi files' )
+  ap.add_argument( 'src', type=Path, help='Directory to search for images' )
+  ap.add_argument( 'dest', type=Path, nargs='?', help='Output directory (default: alongside the sources)' )
+  ap.add_argument( '--oled', action='store_true', help='Use the 1bpp OLED pallet instead of the e-ink pallet' )
+  ap.add_argument( '--dither', '-d', choices=METHODS, help='Dither method (default: none)' )
+  ap.add_argument( '--preview', '-p', action='store_true', help='Also write a PNG showing how each image will look on the panel' )
+  ap.add_argument( '--jobs', '-j', type=int, default=os.cpu_count(), help='Number of worker processes' )
+  ap.add_argument( '--force', '-f', action='store_true', help='Convert everything, even if up to date' )
+  args = ap.parse_args( argv )
+  
+  src_root = args.src
+  dest_root = args.dest if args.dest is not None else src_root
+  pallet = libpi.OLED_PALLET if args.oled else libpi.EINK_PALLET
+  
+  if not src_root.is_dir():
+    ap.error(f'{src_root} is not a directory')
+  
+  t_start = perf_counter()
+  
+  # Load the manifest from the previous run
+  manifest_path = dest_root / MANIFEST
+  try:
+    manifest = json.loads( manifest_path.read_text() )
+  except ( OSError, ValueError ):
+    manifest = {}
+  
+  # Find everything to convert
+  sources = sorted(
+    p for p in src_root.rglob('*')
+    if p.is_file() and p.suffix.lower() in libpi.imageTypes
+  )
+  
+  # Work out which ones actually need doing
+  jobs = []
+  skipped = 0
+  for src in sources:
+    rel = src.relative_to( src_root )
+    dest = dest_root / rel.with_suffix( libpi.EXT )
+    digest = _digest( src, pallet, args.dither )
+    if not args.force and dest.is_file() and ( dest.with_suffix('.preview.png').is_file() or not args.preview ) and manifest.get( rel.as_posix() ) == digest:
+      skipped += 1
+      continue
+    jobs.append(( str(src), str(dest), pallet, digest, rel.as_posix(), args.dither, args.preview ))
+  
+  t_scan = perf_counter() - t_start
+  
+  # Convert in parallel
+  results = []
+  failed = []
+  if jobs:
+    with ProcessPoolExecutor( max_workers=max( 1, args.jobs ) ) as pool:
+      futures = [ pool.submit( _convert, *j ) for j in jobs ]
+      for j, f in zip( jobs, futures ):
+        try:
+          results.append( f.result() )
+        except Exception as e:
+          failed.append(( j[4], e ))
+  
+  # Record what we did
+  for rel, digest, _ in results:
+    manifest[rel] = digest
+  if results:
+    dest_root.mkdir( parents=True, exist_ok=True )
+    manifest_path.write_text( json.dumps( manifest, indent=1, sort_keys=True ) )
+  
+  t_total = perf_counter() - t_start
+  
+  # Timing report
+  for rel, _, t in sorted( results, key=lambda r: r[2], reverse=True ):
+    print(f'{t*1000:8.1f} ms  {rel}')
+  for rel, e in failed:
+    print(f'  FAILED    {rel}: {e}')
+  cpu = sum( r[2] for r in results )
+  print(f'Converted {len(results)}, skipped {skipped} (up to date), failed {len(failed)}')
+  print(f'Scan {t_scan:.2f} s, conversion CPU {cpu:.2f} s, wall {t_total:.2f} s')
+  
+  return 1 if failed else 0
+
+if __name__ == "__main__":
+  raise SystemExit( main() )
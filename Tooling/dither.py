@@ -0,0 +1,186 @@
+# Dithering for pico-image conversion
+#
+# The e-ink panel can only show white, black and red, so photographic art
+# needs dithering to survive conversion.  Two methods are provided:
+# - Ordered (Bayer) dithering: fully vectorised, fast, regular pattern
+# - Error diffusion (Floyd-Steinberg or Atkinson): better looking, but inherently serial
+#
+# Colour matching uses the colours the panel actually shows, rather than the
+# nominal pallet values, and a red-weighted ("redmean") distance.
+#
+# 19 Oct 2026
+
+from PIL import Image
+import numpy as np
+
+# How the panel actually renders each nominal pallet colour.
+# Pure red comes out as approximately #9f2831.
+PANEL_APPEARANCE = {
+  (255,  0,  0) : (0x9f, 0x28, 0x31),
+}
+
+# Pallet colour that means 'transparent' - never dithered to or from
+TRANSPARENT = (255, 0, 255)
+
+# Recognised methods
+METHODS = ( 'bayer', 'fs', 'atkinson' )
+
+# Error diffusion kernels: ( dx, dy, weight )
+_KERNELS = {
+  'fs' : (
+    ( 1, 0, 7/16 ),
+    (-1, 1, 3/16 ), ( 0, 1, 5/16 ), ( 1, 1, 1/16 ),
+  ),
+  'atkinson' : (
+    ( 1, 0, 1/8 ), ( 2, 0, 1/8 ),
+    (-1, 1, 1/8 ), ( 0, 1, 1/8 ), ( 1, 1, 1/8 ),
+    ( 0, 2, 1/8 ),
+  ),
+}
+
+# Dither a PIL image to pallet indices
+def dither( img:Image.Image, pallet, method:str='fs', size:int=4, spread:float=128. ) -> np.ndarray:
+  '''Reduce a PIL image to pallet indices, with dithering
+  
+  img:    The image to convert
+  pallet: List of RGB 3-tuples.  A magenta entry, if present, is used for transparent pixels.
+  method: 'bayer' (ordered), 'fs' (Floyd-Steinberg) or 'atkinson'
+  size:   Bayer matrix size (power of 2).  Only used for ordered dithering.
+  spread: Amplitude of the Bayer threshold, in 0-255 RGB units.  Only used for ordered dithering.
+  
+  Returns a (height, width) uint8 array of indices into the pallet.
+  '''
+  
+  if method not in METHODS:
+    raise ValueError(f'Unknown dither method: {method}')
+  
+  # Pixels that should come out transparent
+  rgba = np.asarray( img.convert('RGBA'), dtype=np.uint8 )
+  rgb = rgba[:,:,:3].astype(np.float32)
+  transparent = ( rgba[:,:,3] < 128 ) | np.all( rgba[:,:,:3] == TRANSPARENT, axis=2 )
+  
+  # Which pallet entries can we dither between, and what do they look like?
+  t_index = None
+  opaque = []
+  for i, c in enumerate(pallet):
+    if tuple(c) == TRANSPARENT:
+      t_index = i
+    else:
+      opaque.append(i)
+  targets = np.array( [ panel_colour( pallet[i] ) for i in opaque ], dtype=np.float32 )
+  
+  if method == 'bayer':
+    chosen = _ordered( rgb, targets, size, spread )
+  else:
+    chosen = _diffuse( rgb, targets, _KERNELS[method], transparent )
+  
+  out = np.array( opaque, dtype=np.uint8 )[ chosen ]
+  
+  # Transparency only exists if the pallet has somewhere to put it
+  if t_index is not None:
+    out[ transparent ] = t_index
+  
+  return out
+
+# How a nominal pallet colour looks on the panel
+def panel_colour( c ) -> tuple[int,int,int]:
+  return PANEL_APPEARANCE.get( tuple(c), tuple(c) )
+
+# Render pallet indices as they'll appear on the panel
+def preview( indexed:np.ndarray, pallet ) -> Image.Image:
+  img = Image.fromarray( np.ascontiguousarray( indexed, dtype=np.uint8 ), mode='P' )
+  img.putpalette( [ v for c in pallet for v in panel_colour(c) ] )
+  return img
+
+# Bayer threshold matrix of the given size, normalised to -0.5 .. +0.5
+def bayer( size:int ) -> np.ndarray:
+  if size < 2 or size & (size-1):
+    raise ValueError('Bayer matrix size must be a power of 2')
+  m = np.array( [[0]], dtype=np.float32 )
+  while len(m) < size:
+    m = np.block([
+      [ 4*m,   4*m+2 ],
+      [ 4*m+3, 4*m+1 ],
+    ])
+  return ( m + 0.5 ) / ( size * size ) - 0.5
+
+# Red-weighted squared distance from every pixel to every target
+# rgb: (..., 3), targets: (n, 3).  Returns (..., n)
+def _distance( rgb:np.ndarray, targets:np.ndarray ) -> np.ndarray:
+  d = rgb[...,None,:] - targets
+  rmean = ( rgb[...,None,0] + targets[:,0] ) / 2
+  return (
+    ( 2 + rmean/256 ) * d[...,0]**2
+    + 4 * d[...,1]**2
+    + ( 2 + (255-rmean)/256 ) * d[...,2]**2
+  )
+
+# Ordered dithering, vectorised across the whole image
+def _ordered( rgb:np.ndarray, targets:np.ndarray, size:int, spread:float ) -> np.ndarray:
+  h, w, _ = rgb.shape
+  m = bayer(size)
+  threshold = np.tile( m, ( -(-h//size), -(-w//size) ) )[:h,:w]
+  return np.argmin( _distance( rgb + (threshold*spread)[...,None], targets ), axis=2 )
+
+# Serpentine error diffusion.  Transparent pixels neither take nor pass on error.
+# Runs in plain Python floats, which is several times faster than per-pixel NumPy calls.
+def _diffuse( rgb:np.ndarray, targets:np.ndarray, kernel, transparent:np.ndarray ) -> np.ndarray:
+  h, w, _ = rgb.shape
+  
+  # Working copy, padded so the kernel never falls off the edge
+  pad = 2
+  work = np.zeros( ( h+pad, w+2*pad, 3 ), dtype=np.float32 )
+  work[:h, pad:pad+w] = rgb
+  work = work.tolist()
+  out = np.zeros( (h, w), dtype=np.intp )
+  tg = [ tuple(t) for t in targets.tolist() ]
+  
+  for y in range(h):
+    
+    # Alternate direction each row to avoid directional artefacts
+    if y % 2:
+      xs = range( w-1, -1, -1 )
+      flip = -1
+    else:
+      xs = range(w)
+      flip = 1
+    
+    row = work[y]
+    row_t = transparent[y].tolist()
+    row_out = [0] * w
+    
+    for x in xs:
+      if row_t[x]:
+        continue
+      
+      # Clamp accumulated error to the displayable range
+      r, g, b = row[ pad+x ]
+      r = min( max( r, 0. ), 255. )
+      g = min( max( g, 0. ), 255. )
+      b = min( max( b, 0. ), 255. )
+      
+      # Nearest target by redmean distance
+      best = 0
+      best_d = None
+      for i, ( tr, tgr, tb ) in enumerate(tg):
+        rmean = ( r + tr ) / 2
+        d = ( 2 + rmean/256 ) * (r-tr)**2 + 4 * (g-tgr)**2 + ( 2 + (255-rmean)/256 ) * (b-tb)**2
+        if best_d is None or d < best_d:
+          best = i
+          best_d = d
+      row_out[x] = best
+      
+      # Pass the error on
+      tr, tgr, tb = tg[best]
+      er = r - tr
+      eg = g - tgr
+      eb = b - tb
+      for dx, dy, wt in kernel:
+        p = work[ y+dy ][ pad+x+dx*flip ]
+        p[0] += er * wt
+        p[1] += eg * wt
+        p[2] += eb * wt
+    
+    out[y] = row_out
+  
+  return out
@@ -1,16 +1,27 @@
-import tkinter as tk
-from tkinter.filedialog import askopenfilename 
 from pathlib import Path
+from sys import argv, exit
 import libpi
+from dither import METHODS
 
 # Our file format extension
 EXT = '.pi'
 
-# We don't want a full GUI, so keep the root window from appearing
-tk.Tk().withdraw()
+# Optional dither method, after the file
+dither = argv[2] if len(argv) > 2 else None
+if len(argv) > 3 or ( dither is not None and dither not in METHODS ):
+  print(f'Usage: {argv[0]} [image [dither]]')
+  print(f'  dither: one of {", ".join(METHODS)}.  Default is no dithering.')
+  exit(1)
 
-# Get the image file to convert
-path = Path( askopenfilename() )
+# Take the file to convert from the command line, or ask for one
+if len(argv) > 1:
+  path = Path( argv[1] )
+else:
+  import tkinter as tk
+  from tkinter.filedialog import askopenfilename
+  # We don't want a full GUI, so keep the root window from appearing
+  tk.Tk().withdraw()
+  path = Path( askopenfilename() )
 
 pal = [
   (255,255,255), # 0 = White
@@ -23,7 +34,7 @@ pal = [
 if path.suffix == EXT:
   out = libpi.decode( str(path), pal )
 else:
-  out = libpi.encode( str(path), pal )
+  out = libpi.encode( str(path), pal, show=True, dither=dither )
 
 if out is not None:
   print('Saved to:',out)
@@ -1,16 +1,19 @@
-import tkinter as tk
-from tkinter.filedialog import askopenfilename 
 from pathlib import Path
+from sys import argv
 import libpi
 
 # Our file format extension
 EXT = '.ni'
 
-# We don't want a full GUI, so keep the root window from appearing
-tk.Tk().withdraw()
-
-# Get the image file to convert
-path = Path( askopenfilename() )
+# Take the file to convert from the command line, or ask for one
+if len(argv) > 1:
+  path = Path( argv[1] )
+else:
+  import tkinter as tk
+  from tkinter.filedialog import askopenfilename
+  # We don't want a full GUI, so keep the root window from appearing
+  tk.Tk().withdraw()
+  path = Path( askopenfilename() )
 
 pal = (
   (  0,  0,  0), # 0 = Black
@@ -19,9 +22,9 @@ pal = (
 
 # What to do?
 if path.suffix == EXT:
-  out = libpi.decode( path, pal )
+  out = libpi.decode( str(path), pal )
 else:
-  out = libpi.encode( path, pal )
+  out = libpi.encode( str(path), pal, show=True )
 
 if out is not None:
   print('Saved to:',out)
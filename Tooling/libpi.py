@@ -14,6 +14,7 @@ type Pallet = list[tuple[int,int,int]]
 
 from PIL import Image
 from struct import pack, unpack
+import numpy as np
 
 # Our file format extension
 EXT = '.pi'
@@ -21,189 +22,209 @@ EXT = '.pi'
 # Standard image formats we recognise (incomplete list)
 imageTypes = ( '.jpg', '.jpeg', '.gif', '.png' )
 
+# Standard pallets for the gadget's displays
+EINK_PALLET:Pallet = [
+  (255,255,255), # 0 = White
+  (  0,  0,  0), # 1 = Black
+  (255,  0,  0), # 2 = Red
+  (255,  0,255), # 3 = Magenta
+]
+OLED_PALLET:Pallet = [
+  (  0,  0,  0), # 0 = Black
+  (255,255,255), # 1 = White
+]
+
+# Head format
+# 00 1b Version
+# 01 1b Data start pointer
+# 02 2b Width (pixels)
+# 04 2b Height (pixels)
+# 06 1b bits per pixel
+# 07 1b flags
+# 08 DATA
+_HEAD = '>BBHHBB'
+_VERSION = 1
+_DS = 8
+
+# Head flags
+FLAG_OPAQUE = 0x01 # No transparent (index 3) pixels: the device can copy rows straight in
+
 
 # Convert pi to PNG
-def decode( path:str, pallet:Pallet ):
+def decode( path:str, pallet:Pallet, saveto:str|None=None ) -> str:
   '''Convert a Pico-Image to a PNG
   
   path:   The file path of the Pico-Image to convert
   pallet: A list of 3-tuples, mapping between the list indices and RGB values
+  saveto: Optional output path.  Defaults to the input path with '.png' appended.
   '''
   
-  pal = _mkpal(pallet)
-  
   # Load in the file
-  fd = open( path, 'rb' )
-  top = fd.read(2)
+  with open( path, 'rb' ) as fd:
+    raw = fd.read()
   
   # Get the version from the first byte
-  version = top[0]
+  version = raw[0]
   
   # Check we know what we're doing
-  if version > 1:
+  if version > _VERSION:
     raise NotImplementedError(f'File version ({version}) not supported')
   
   # Data start pointer
-  ds = top[1]
-  
-  # Get the rest of the head
-  rest_of_head = fd.read( ds - 2 )
-  
-  # Get the image data
-  ibuf = fd.read()
-  
-  # Close the file
-  fd.close()
-  
-  # Head format
-  # 00 1b Version
-  # 01 1b Data start pointer
-  # 02 2b Width (pixels)
-  # 04 2b Height (pixels)
-  # 06 1b bits per pixel
-  # 07 1b reserved
-  
-  # Make a nice object containing the head data
-  head = [ version, ds ]
-  head.extend( unpack( '>HHBB', rest_of_head ) )
+  ds = raw[1]
   
   # Extract values from the head
-  im_width = head[2]
-  height = head[3]
-  bpp = head[4]
-  ppb = 8 // bpp
-  data_width = im_width + (-im_width % ppb)
-  
-  # How long should the data section be?
-  byte_len = data_width * height // ppb
-  
-  # Check for file read errors
-  if len(ibuf) != byte_len:
-    raise RuntimeError(f'Expected file length {byte_len}, but got {len(ibuf)}!')
+  im_width, height, bpp, _ = unpack( '>HHBB', raw[2:ds] )
   
   # Only support 1 or 2 bpp
-  if bpp > 2:
-    raise NotImplementedError('No support for BPP more than 2')
+  if bpp not in (1,2):
+    raise NotImplementedError('Only 1 or 2 bits per pixel is supported')
   
   # Unpack into one byte per pixel
-  obuf = bytearray( data_width * height )
-  mask = ( 1 << bpp ) -1
-  for i in range(len(ibuf)):
-    for j in range(ppb):
-      obuf[ (i*ppb) + j ] = ( ibuf[i] >> (j*bpp) ) & mask
-  '''
-    obuf[ (i*8) +1 ] = ( ibuf[i] >> 1 ) & 1
-    obuf[ (i*8) +2 ] = ( ibuf[i] >> 2 ) & 1
-    obuf[ (i*8) +3 ] = ( ibuf[i] >> 3 ) & 1
-    obuf[ (i*8) +4 ] = ( ibuf[i] >> 4 ) & 1
-    obuf[ (i*8) +5 ] = ( ibuf[i] >> 5 ) & 1
-    obuf[ (i*8) +6 ] = ( ibuf[i] >> 6 ) & 1
-    obuf[ (i*8) +7 ] = ( ibuf[i] >> 7 ) & 1
-  '''
+  indexed = unpack_pixels( raw[ds:], im_width, height, bpp )
   
   # Set up the PIL image
-  img = Image.frombytes(
-    mode='L',
-    size=(data_width,height),
-    data=obuf,
-    decoder_name='raw'
-  ).quantize(
-    colors=(1<<bpp),
-    palette=pal,
-    dither=Image.Dither.NONE
-    # type: ignore
-  ).crop(
-    (0,0,im_width,height)
-  )
+  img = Image.fromarray( indexed, mode='P' )
+  img.putpalette( [ v for rgb in pallet for v in rgb ] )
   
   # Save as PNG
-  saveto = path + '.png'
+  if saveto is None:
+    saveto = path + '.png'
   img.save( saveto )
   
   return saveto
 
 # Encode a regular recognised image format as .pi
-def encode( path:str, pallet:Pallet ):
+def encode( path:str, pallet:Pallet, saveto:str|None=None, show:bool=False, dither:str|None=None, preview_to:str|None=None ) -> str:
   '''Convert a regular image to a Pico-Image
   
-  path:   The file path of the image to convert
-  pallet: A list of 3-tuples representing RGB values, where the list's indices will form the colour indices in the Pico-Image
+  path:       The file path of the image to convert
+  pallet:     A list of 3-tuples representing RGB values, where the list's indices will form the colour indices in the Pico-Image
+  saveto:     Optional output path.  Defaults to the input path with the '.pi' extension appended.
+  show:       Pop up a window showing what the palletised image will look like
+  dither:     Optional dither method (see dither.METHODS).  Default is no dithering.
+  preview_to: Optional path to save a PNG showing how the image will look on the panel
   
-  Palletises the given input image as closely as possible to the given RGB values.  Does not dither.
+  Palletises the given input image as closely as possible to the given RGB values.
   '''
   
-  if len(pallet) == 2:
-    bpp = 1
-  elif len(pallet) == 4:
-    bpp = 2
-  else:
-    raise NotImplementedError('Invalid number of pallet colours (must be 2 or 4)')
-  
-  pal = _mkpal(pallet)
-  
   # Load in the image to convert
   with Image.open(path) as original_img:
     original_img.load()
   
-  # Get some stats
-  original_width = original_img.width
-  height = original_img.height
-  ppb = 8 // bpp # Pixels per byte
-  
-  # First convert to RGB (or quantize complains)
-  original_img = original_img.convert(mode='RGB').quantize( colors=len(pallet), palette=pal, dither=Image.Dither.NONE )
+  # Reduce it to pallet indices
+  if dither is None:
+    indexed = quantize( original_img, pallet )
+  else:
+    from dither import dither as _dither
+    indexed = _dither( original_img, pallet, dither )
   
   # Show what it will look like
-  original_img.show()
-  
-  # Ensure the width is padded out to a whole number of bytes
-  encoded_width = original_width + (-original_width % ppb)
-  #img = Image.new( mode='RGB', size=(encoded_width, height), color=paltuple[0] )
-  img = Image.new( mode='P', size=(encoded_width, height), color=0 )
-  img.paste( original_img, (0, 0) )
-  
-  # Get the reduced image as just bytes
-  # Each pixel is a byte
-  indexed = img.tobytes()
-  
-  # 00 1 Version
-  # 01 1 Data start pointer
-  # 02 2 Width (pixels)
-  # 04 2 Height (pixels)
-  # 06 1 bits per pixel
-  # 07 1 reserved
-  # 08 DATA
-  v = 1   # Format version
-  ds = 8  # Data starts at byte 8
-  head = pack('>BBHHBB', v, ds, original_width, height, bpp, 0)
-  obuf = bytearray( encoded_width * height // ppb )
-  
-  # Counts pixel position (one byte per pixel) within the input array
-  p=0
-  
-  # Step through bytes of output buffer
-  for i in range(len(obuf)):
-    
-    # Step through pixels within byte
-    for j in range(ppb):
-      
-      # Bitshift pixel value to correct position in byte
-      pixel = indexed[p] << (j*bpp)
-      
-      # Update the byte with the pixel
-      obuf[i] = obuf[i] | pixel
-      
-      # Increment the pixel counter
-      p += 1
+  if show or preview_to is not None:
+    from dither import preview as _panel_preview
+    p = _panel_preview( indexed, pallet )
+    if show:
+      p.show()
+    if preview_to is not None:
+      p.save( preview_to )
   
   # Write out the file
-  saveto = path + EXT
+  if saveto is None:
+    saveto = path + EXT
   with open( saveto, 'wb') as fd:
-    fd.write(head)
-    fd.write(obuf)
+    fd.write( encode_indexed( indexed, len(pallet) ) )
   
   return saveto
 
+# Reduce a PIL image to an array of pallet indices, one byte per pixel
+def quantize( img:Image.Image, pallet:Pallet ) -> np.ndarray:
+  '''Palletise a PIL image without dithering
+  
+  Returns a (height, width) uint8 array of indices into the pallet.
+  '''
+  _bpp( pallet )
+  
+  # First convert to RGB (or quantize complains)
+  img = img.convert(mode='RGB').quantize( colors=len(pallet), palette=_mkpal(pallet), dither=Image.Dither.NONE )
+  
+  return np.asarray( img, dtype=np.uint8 )
+
+# Encode an array of pallet indices as the complete contents of a .pi file
+def encode_indexed( indexed:np.ndarray, n_colours:int ) -> bytes:
+  '''Pack a (height, width) array of pallet indices into a Pico-Image
+  
+  indexed:   uint8 array of pallet indices, one per pixel
+  n_colours: Number of colours in the pallet (2 or 4)
+  
+  Returns the head and image data, ready to write to disk.
+  '''
+  
+  bpp = _bpp( n_colours )
+  height, width = indexed.shape
+  
+  # Scan for transparency
+  flags = 0
+  if bpp != 2 or not ( indexed == 3 ).any():
+    flags |= FLAG_OPAQUE
+  
+  head = pack( _HEAD, _VERSION, _DS, width, height, bpp, flags )
+  
+  return head + pack_pixels( indexed, bpp )
+
+# Pack one-byte-per-pixel indices into bpp-bit pixels
+def pack_pixels( indexed:np.ndarray, bpp:int ) -> bytes:
+  '''Pack a (height, width) array of pixel values into rows of bytes
+  
+  The first pixel of each byte goes in the least significant bits.
+  Rows are padded out (with zeroes) to a whole number of bytes.
+  '''
+  
+  ppb = 8 // bpp # Pixels per byte
+  height, width = indexed.shape
+  
+  # Ensure the width is padded out to a whole number of bytes
+  pad = -width % ppb
+  if pad:
+    indexed = np.pad( indexed, ( (0,0), (0,pad) ) )
+  
+  # Group the pixels by the byte they'll end up in, shift each to its position, and combine
+  px = indexed.astype(np.uint8).reshape( height, -1, ppb )
+  shifts = np.arange( ppb, dtype=np.uint8 ) * bpp
+  
+  return np.bitwise_or.reduce( px << shifts, axis=2 ).astype(np.uint8).tobytes()
+
+# Unpack bpp-bit pixels into one byte per pixel
+def unpack_pixels( data:bytes, width:int, height:int, bpp:int ) -> np.ndarray:
+  '''Inverse of pack_pixels()
+  
+  Returns a (height, width) uint8 array, with any row padding removed.
+  '''
+  
+  ppb = 8 // bpp # Pixels per byte
+  data_width = width + (-width % ppb)
+  
+  # How long should the data section be?
+  byte_len = data_width * height // ppb
+  
+  # Check for file read errors
+  if len(data) != byte_len:
+    raise RuntimeError(f'Expected data length {byte_len}, but got {len(data)}!')
+  
+  b = np.frombuffer( data, dtype=np.uint8 ).reshape( height, -1, 1 )
+  shifts = np.arange( ppb, dtype=np.uint8 ) * bpp
+  mask = ( 1 << bpp ) -1
+  
+  return ( ( b >> shifts ) & mask ).reshape( height, data_width )[ :, :width ]
+
+# Bits per pixel for a given pallet (or number of colours)
+def _bpp( pallet:Pallet|int ) -> int:
+  n = pallet if type(pallet) is int else len(pallet)
+  if n == 2:
+    return 1
+  if n == 4:
+    return 2
+  raise NotImplementedError('Invalid number of pallet colours (must be 2 or 4)')
+
 # Convert the pallette tuple into an PIL Image
 def _mkpal( p:Pallet ):
   pal = Image.new( mode='P', size=( len(p), 1 ) )
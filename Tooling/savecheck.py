@@ -0,0 +1,357 @@
+# Savefile checker and compiler
+#
+# Checks each character's stats.json the way the device will load it, and
+# reports everything that's wrong with it, and where.  The device only says
+# why the first problem stopped it, and only on the serial console: on the
+# select screen, the character just doesn't appear.
+#
+# The checks on each section of numbers, and all the limits, come from the
+# device's own _char_schema.py, so those can't drift apart.  How the sections
+# fit together (levels, items, the current level) follows
+# Character._load_base() and what it calls, in character.py.
+# test_savecheck.py covers that part.
+#
+# With --bin, also writes each good character's stats.bin, using the device's
+# own packer (_char_bin.py).  Then the device can load it straight away,
+# without parsing and checking the JSON on the card.
+#
+# Usage:
+#   python savecheck.py DIR [DIR ...] [--bin] [--warnings] [--jobs N]
+# Each DIR can be the SD card, its TTRPG directory, TTRPG/Characters, or one character's directory.
+# Exits with 1 if any savefile is invalid.
+#
+# 19 Oct 2026
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import spec_from_file_location, module_from_spec
+from array import array
+from pathlib import Path
+from time import perf_counter
+import json
+import os
+import sys
+import types
+
+# The device's modules
+APP = Path(__file__).resolve().parent.parent / 'App' / 'gadget_app'
+
+# micropython.const() only marks a constant for the compiler.  It's the one thing the modules below need that CPython doesn't have.
+if 'micropython' not in sys.modules:
+  _mp = types.ModuleType('micropython')
+  _mp.const = lambda x: x
+  sys.modules['micropython'] = _mp
+
+# Load App/gadget_app/name.py
+# Without leaving a __pycache__ in App/, which gets copied onto the device
+def _device_module( name:str ):
+  dwb = sys.dont_write_bytecode
+  sys.dont_write_bytecode = True
+  try:
+    spec = spec_from_file_location( name, APP / f'{name}.py' )
+    m = module_from_spec( spec )
+    spec.loader.exec_module( m )
+  finally:
+    sys.dont_write_bytecode = dwb
+  return m
+
+sch = _device_module('_char_schema')
+cbin = _device_module('_char_bin')
+common = _device_module('common')
+
+# Findings for one savefile
+class Report:
+  def __init__( self, f:Path ):
+    self.f = f
+    self.errors = []   # ( where, message ): any of these and the device won't load it
+    self.warnings = [] # ( where, message ): loads, but maybe not as intended
+    self.bin = None    # What happened to stats.bin, with --bin
+  
+  def error( self, where:str, msg:str ):
+    self.errors.append( ( where, msg ) )
+  
+  def warn( self, where:str, msg:str ):
+    self.warnings.append( ( where, msg ) )
+
+# Path to k within where, for reports
+def _at( where:str, k:str ) -> str:
+  return f'{where}.{k}' if where else k
+
+# The device's section(), recording the error rather than raising it
+# Returns the list, or None if it's invalid
+def checked( rep:Report, where:str, d, s, sfx:str='' ):
+  try:
+    return sch.section( d, s, sfx )
+  except sch.CharacterError as e:
+    rep.error( where, str(e) )
+    return None
+
+# Anything str() would make something other than what was meant of
+def _str( rep:Report, where:str, v, limit:int ) -> str:
+  if v is None:
+    rep.warn( where, 'Missing, so will show as "None"' )
+  elif type(v) is not str:
+    rep.warn( where, f'Not a string, so will show as "{v}"' )
+  s = str(v)
+  if len(s) > limit:
+    rep.warn( where, f'Longer than {limit} characters, so will be cut to "{s[:limit]}"' )
+  return s[:limit]
+
+# As Character._load_item()
+# Returns [ current, max, reset, name ], or None if it's invalid
+def item( rep:Report, where:str, i:int, c ):
+  sfx = f' #{i+1}'
+  it = checked( rep, where, c, sch.ITEM, sfx )
+  if it is None:
+    return None
+  if it[1] and it[0] > it[1]:
+    rep.error( where, 'Bad item' + sfx + f' (current {it[0]} is more than max {it[1]})' )
+    return None
+  
+  rstf = c.get( 'reset', [] )
+  if type(rstf) is not list:
+    rep.error( where, f'Item{sfx} has invalid reset' )
+    return None
+  for b, x in enumerate( sch.RESETS ):
+    if x in rstf:
+      it[2] |= 1 << b
+  for x in rstf:
+    if x not in sch.RESETS:
+      rep.warn( where + '.reset', f'Unknown reset {json.dumps(x)}, ignored.  Allowed: {", ".join( sch.RESETS )}' )
+  
+  it[3] = _str( rep, where + '.name', c.get('name'), sch.MAX_ITEMNAME_LEN ).replace( '\n', ' ' )
+  return it
+
+# As Character._load_level(): hp, hitdice, spells and items
+# ikey: Where the items are: 'items', or 'charges' in version 0
+# Returns the level tuple, as Character keeps it, or None if it's invalid
+def level( rep:Report, where:str, lvl:dict, name:str, ikey:str ):
+  ok = True
+  
+  hp = checked( rep, _at( where, 'hp' ), lvl, sch.HP )
+  hd = checked( rep, _at( where, 'hitdice' ), lvl, sch.HITDICE )
+  
+  w = _at( where, 'spells' )
+  spf = lvl.get( 'spells', [] )
+  sp_curr = bytearray()
+  sp_max = bytearray()
+  if type(spf) is not list:
+    rep.error( w, 'Invalid spell slots list' )
+    ok = False
+  else:
+    if len(spf) > sch.MAX_SPELL_LEVELS:
+      rep.warn( w, f'Only the first {sch.MAX_SPELL_LEVELS} spell levels are used' )
+    for i, sp in enumerate( spf[:sch.MAX_SPELL_LEVELS] ):
+      v = checked( rep, f'{w}[{i}]', sp, sch.SPELL, f' #{i+1}' )
+      if v is None:
+        ok = False
+      else:
+        sp_curr.append( v[0] )
+        sp_max.append( v[1] )
+  
+  w = _at( where, ikey )
+  items = lvl.get( ikey, [] )
+  its = []
+  if type(items) is not list:
+    rep.error( w, 'Invalid items list' )
+    ok = False
+  else:
+    if len(items) > sch.MAX_N_ITEMS:
+      rep.warn( w, f'Only the first {sch.MAX_N_ITEMS} items are used' )
+    for i, c in enumerate( items[:sch.MAX_N_ITEMS] ):
+      it = item( rep, f'{w}[{i}]', i, c )
+      if it is None:
+        ok = False
+      else:
+        its.append( it )
+  
+  if not ok or hp is None or hd is None:
+    return None
+  return (
+    name,
+    array( 'H', hp ),
+    bytearray( hd ),
+    ( sp_curr, sp_max ),
+    (
+      array( 'I', [ it[0] for it in its ] ),
+      array( 'I', [ it[1] for it in its ] ),
+      bytearray([ it[2] for it in its ]),
+      '\n'.join([ it[3] for it in its ]),
+    ),
+  )
+
+# As character._level_name() then Character._load_level_v1()
+# Returns ( name, level tuple ).  Either is None if it's invalid.
+def level_v1( rep:Report, where:str, lvl ) -> tuple:
+  if type(lvl) is not dict:
+    rep.error( where, 'Invalid level data' )
+    return None, None
+  name = lvl.get('name')
+  if name is None:
+    rep.error( where, 'No level name given' )
+    return None, None
+  name = _str( rep, where + '.name', name, sch.MAX_TITLELEN )
+  return name, level( rep, f'{where} "{name}"', lvl, name, 'items' )
+
+# Check everything in fs, the parsed savefile, as Character._load_base() would
+# Returns the arguments for _char_bin.dumps() (after the size), or None if it's invalid
+def savefile( rep:Report, fs ):
+  
+  if type(fs) is not dict:
+    rep.error( '', 'Not a JSON object' )
+    return None
+  
+  name = _str( rep, 'name', fs.get('name'), sch.MAX_NAMELEN )
+  if len(name) == 0:
+    rep.error( 'name', 'No name given' )
+  
+  try:
+    ver = int( fs.get('version',0) )
+  except ( ValueError, TypeError, OverflowError ):
+    ver = None
+  if ver not in ( 0, 1 ):
+    rep.error( 'version', 'Invalid version' )
+    return None
+  if 'version' not in fs:
+    rep.warn( 'version', 'Missing, so taken as version 0' )
+  
+  # Version 0: one level, all at the top
+  if ver == 0:
+    data = fs
+    cur = sch.CURRENCY_V0
+    levels = [ level( rep, '', fs, _str( rep, 'title', fs.get('title'), sch.MAX_TITLELEN ), 'charges' ) ]
+    lvi = 0
+  
+  # Version 1: levels in the data section
+  else:
+    data = fs.get('data')
+    if type(data) is not dict:
+      rep.error( 'data', 'Invalid data section' )
+      return None
+    cur = sch.CURRENCY
+    
+    lvf = data.get('levels')
+    if type(lvf) is dict:
+      rep.error( 'data.levels', 'Invalid levels section (must be a list of levels, each with a name, not an object keyed by name)' )
+      return None
+    if type(lvf) is not list:
+      rep.error( 'data.levels', 'Invalid levels section' )
+      return None
+    if len(lvf) == 0:
+      rep.error( 'data.levels', 'No levels defined' )
+      return None
+    names, levels = zip( *[ level_v1( rep, f'data.levels[{i}]', lvl ) for i, lvl in enumerate( lvf ) ] )
+    levels = list( levels )
+    
+    # The current level, by name (as cut to length, like the device does)
+    clname = data.get('currentLevel')
+    lvi = None
+    if clname is None and len(levels) == 1:
+      lvi = 0
+    elif clname in names:
+      lvi = names.index( clname )
+      if names.count( clname ) > 1:
+        rep.warn( 'data.currentLevel', f'More than one level is called "{clname}": the first is used' )
+    if lvi is None and None not in names:
+      msg = 'currentLevel does not match any level name'
+      if clname is None:
+        msg = 'No currentLevel, and there\'s more than one level'
+      elif any([ str(clname)[:sch.MAX_TITLELEN] == n for n in names ]):
+        msg += f' (level names are cut to {sch.MAX_TITLELEN} characters)'
+      rep.error( 'data.currentLevel', msg )
+  
+  xp = checked( rep, 'data.xp' if ver else 'xp', data, sch.XP )
+  currency = checked( rep, 'data.currency' if ver else 'currency', data, cur )
+  death = checked( rep, 'data.death' if ver else 'death', data, sch.DEATH )
+  
+  if rep.errors:
+    return None
+  return name, [ None, None, xp[0], array( 'H', currency ), None, None, None, None, bytearray( death ) ], levels, lvi
+
+# Check one character directory, and write its stats.bin if asked
+# Must be a module-level function so the pool can pickle it.
+def check( d:str, write_bin:bool ) -> Report:
+  f = Path(d) / common.CHAR_STATS
+  rep = Report( f )
+  
+  try:
+    raw = f.read_bytes()
+  except OSError as e:
+    rep.error( '', f'Could not read: {e.strerror}' )
+    return rep
+  
+  try:
+    fs = json.loads( raw )
+  except UnicodeDecodeError as e:
+    rep.error( '', f'Not UTF-8 (byte {e.start})' )
+    return rep
+  except ValueError as e:
+    rep.error( f'line {e.lineno} column {e.colno}', e.msg )
+    return rep
+  
+  body = savefile( rep, fs )
+  
+  # Binary copy, only rewritten if it would be different, so that its time doesn't keep moving
+  if write_bin and body is not None:
+    b = cbin.dumps( len(raw), *body )
+    fb = Path(d) / common.CHAR_STATS_BIN
+    try:
+      if fb.read_bytes() == b and fb.stat().st_mtime >= f.stat().st_mtime:
+        rep.bin = 'up to date'
+    except OSError:
+      pass
+    if rep.bin is None:
+      fb.write_bytes( b )
+      rep.bin = f'written, {len(b)} bytes'
+  
+  return rep
+
+# The character directories at or under p
+def find( p:Path ) -> list:
+  if ( p / common.CHAR_STATS ).is_file():
+    return [ p ]
+  for sub in ( Path( common.SD_DIR ) / common.CHAR_SUBDIR, Path( common.CHAR_SUBDIR ) ):
+    if ( p / sub ).is_dir():
+      p = p / sub
+      break
+  return sorted( x for x in p.iterdir() if x.is_dir() and ( x / common.CHAR_STATS ).is_file() )
+
+def main( argv=None ):
+  ap = ArgumentParser( description='Check character savefiles the way the device loads them, and optionally write their stats.bin' )
+  ap.add_argument( 'dirs', type=Path, nargs='+', help='SD card, TTRPG or Characters directory, or a character directory' )
+  ap.add_argument( '--bin', '-b', action='store_true', help='Write stats.bin for each valid savefile' )
+  ap.add_argument( '--warnings', '-w', action='store_true', help='Also show things that load, but maybe not as intended' )
+  ap.add_argument( '--jobs', '-j', type=int, default=os.cpu_count(), help='Number of worker processes' )
+  args = ap.parse_args( argv )
+  
+  t_start = perf_counter()
+  
+  dirs = []
+  for p in args.dirs:
+    if not p.is_dir():
+      ap.error(f'{p} is not a directory')
+    dirs += find( p )
+  
+  # Not worth starting processes for a few files
+  if args.jobs > 1 and len(dirs) > 32:
+    with ProcessPoolExecutor( max_workers=args.jobs ) as pool:
+      reps = list( pool.map( check, map( str, dirs ), [ args.bin ] * len(dirs), chunksize=16 ) )
+  else:
+    reps = [ check( str(d), args.bin ) for d in dirs ]
+  
+  bad = 0
+  for rep in reps:
+    for where, msg in rep.errors:
+      print(f'{rep.f}: {where + ": " if where else ""}{msg}')
+    if args.warnings:
+      for where, msg in rep.warnings:
+        print(f'{rep.f}: warning: {where + ": " if where else ""}{msg}')
+    if rep.bin is not None:
+      print(f'{rep.f.parent / common.CHAR_STATS_BIN}: {rep.bin}')
+    bad += len(rep.errors) > 0
+  
+  print(f'{len(reps)} savefiles, {bad} invalid, in {perf_counter() - t_start:.2f} s')
+  return 1 if bad else 0
+
+if __name__ == '__main__':
+  sys.exit( main() )
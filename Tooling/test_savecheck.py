@@ -0,0 +1,168 @@
+# Tests for savecheck.py
+# Checks the errors it reports (and where) for some broken savefiles, and that
+# the stats.bin it writes loads back through the device's _char_bin.load().
+#
+# Usage:
+#   python -m unittest test_savecheck      (from the Tooling directory)
+#
+# 19 Oct 2026
+
+from copy import deepcopy
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import json
+import unittest
+
+import savecheck
+
+# The example savefile from the README
+GOOD = {
+  'name': 'Hemlock',
+  'system': 'dnd-5e',
+  'version': 1,
+  'data': {
+    'xp': 9256,
+    'currency': { 'platinum': 0, 'gold': 11, 'electrum': 0, 'silver': 0, 'copper': 0 },
+    'currentLevel': 'L5 Wizard',
+    'levels': [
+      {
+        'name': 'L5 Wizard',
+        'hp': { 'current': 0, 'max': 512, 'temporary': 1740 },
+        'hitdice': { 'current': 5, 'max': 10 },
+        'spells': [
+          { 'current': 4, 'max': 4 },
+          { 'current': 1, 'max': 3 },
+          { 'current': 0, 'max': 2 },
+        ],
+        'items': [
+          { 'current': 1, 'max': 1, 'name': 'Arcane Recovery', 'reset': ['lr'] },
+          { 'current': 3, 'max': 3, 'name': 'Fey Step', 'reset': ['lr'] },
+          { 'current': 0, 'max': 1, 'name': 'Cape of the Mountbank', 'reset': ['lr','dawn'] },
+          { 'current': 1, 'max': 1, 'name': 'Dagger of Venom', 'reset': ['lr','dawn'] },
+          { 'current': 1, 'max': 3, 'name': 'Rusty Bag of Tricks', 'reset': ['lr','dawn'] },
+        ],
+      },
+    ],
+  },
+}
+
+class SaveCheckTest( unittest.TestCase ):
+  
+  def setUp( self ):
+    self._tmp = TemporaryDirectory()
+    self.d = Path( self._tmp.name )
+  
+  def tearDown( self ):
+    self._tmp.cleanup()
+  
+  # Write fs (a dict, or the raw text) as the savefile, and check it
+  def check( self, fs, write_bin:bool=False ) -> savecheck.Report:
+    ( self.d / 'stats.json' ).write_text( fs if type(fs) is str else json.dumps( fs ) )
+    return savecheck.check( str(self.d), write_bin )
+  
+  # The README example, with edit( data ) applied to its data section
+  def edited( self, edit ) -> dict:
+    fs = deepcopy( GOOD )
+    edit( fs['data'] )
+    return fs
+  
+  def test_good( self ):
+    rep = self.check( GOOD )
+    self.assertEqual( rep.errors, [] )
+    self.assertEqual( rep.warnings, [] )
+  
+  def test_item_current_over_max( self ):
+    def edit( data ):
+      data['levels'][0]['items'][2].update( current=5, max=1 )
+    rep = self.check( self.edited( edit ) )
+    self.assertEqual( rep.errors, [ ( 'data.levels[0] "L5 Wizard".items[2]', 'Bad item #3 (current 5 is more than max 1)' ) ] )
+  
+  def test_currency_too_big( self ):
+    def edit( data ):
+      data['currency']['gold'] = 70000
+    rep = self.check( self.edited( edit ) )
+    self.assertEqual( rep.errors, [ ( 'data.currency', 'Invalid currency value' ) ] )
+  
+  def test_currency_not_a_number( self ):
+    def edit( data ):
+      data['currency']['silver'] = 'lots'
+    rep = self.check( self.edited( edit ) )
+    self.assertEqual( rep.errors, [ ( 'data.currency', 'Invalid currency' ) ] )
+  
+  def test_unmatched_current_level( self ):
+    def edit( data ):
+      data['currentLevel'] = 'L6 Wizard'
+    rep = self.check( self.edited( edit ) )
+    self.assertEqual( rep.errors, [ ( 'data.currentLevel', 'currentLevel does not match any level name' ) ] )
+  
+  def test_levels_keyed_by_name( self ):
+    def edit( data ):
+      lvl = data['levels'][0]
+      data['levels'] = { lvl.pop('name'): lvl }
+    rep = self.check( self.edited( edit ) )
+    self.assertEqual( rep.errors, [ ( 'data.levels', 'Invalid levels section (must be a list of levels, each with a name, not an object keyed by name)' ) ] )
+  
+  def test_every_error_reported( self ):
+    def edit( data ):
+      data['levels'][0]['hp']['current'] = 513
+      data['levels'][0]['spells'][1]['max'] = 7
+      data['death'] = { 'successes': 4 }
+    rep = self.check( self.edited( edit ) )
+    self.assertEqual( rep.errors, [
+      ( 'data.levels[0] "L5 Wizard".hp', 'Invalid hp' ),
+      ( 'data.levels[0] "L5 Wizard".spells[1]', 'Bad spell slot #2' ),
+      ( 'data.death', 'Invalid number of successful death saves' ),
+    ] )
+  
+  # Too big for a float, so it parses as inf, which int() can't take
+  def test_huge_number( self ):
+    rep = self.check( json.dumps( GOOD ).replace( '"xp": 9256', '"xp": 1e999' ) )
+    self.assertEqual( rep.errors, [ ( 'data.xp', 'Invalid XP' ) ] )
+    
+    rep = self.check( json.dumps( GOOD ).replace( '"version": 1', '"version": 1e999' ) )
+    self.assertEqual( rep.errors, [ ( 'version', 'Invalid version' ) ] )
+  
+  def test_json_syntax( self ):
+    rep = self.check( '{\n  "name": "Hemlock",\n  "version": 1,\n}' )
+    self.assertEqual( len( rep.errors ), 1 )
+    self.assertEqual( rep.errors[0][0], 'line 4 column 1' )
+  
+  def test_bin_loads_back( self ):
+    rep = self.check( GOOD, write_bin=True )
+    self.assertEqual( rep.errors, [] )
+    self.assertTrue( rep.bin.startswith('written') )
+    
+    jsize = ( self.d / 'stats.json' ).stat().st_size
+    name, xp, currency, death, lvi, levels = savecheck.cbin.load( str( self.d / 'stats.bin' ), jsize )
+    self.assertEqual( name, 'Hemlock' )
+    self.assertEqual( xp, 9256 )
+    self.assertEqual( list( currency ), [ 0, 0, 0, 11, 0 ] ) # Copper to platinum
+    self.assertEqual( list( death ), [ 0, 0, 0 ] )
+    self.assertEqual( lvi, 0 )
+    self.assertEqual( len( levels ), 1 )
+    
+    lvname, hp, hd, ( sp_curr, sp_max ), ( it_curr, it_max, it_rst, it_names ) = levels[0]
+    self.assertEqual( lvname, 'L5 Wizard' )
+    self.assertEqual( list( hp ), [ 0, 512, 1740, 1740 ] )
+    self.assertEqual( list( hd ), [ 5, 10 ] )
+    self.assertEqual( list( sp_curr ), [ 4, 1, 0 ] )
+    self.assertEqual( list( sp_max ), [ 4, 3, 2 ] )
+    self.assertEqual( list( it_curr ), [ 1, 3, 0, 1, 1 ] )
+    self.assertEqual( list( it_max ), [ 1, 3, 1, 1, 3 ] )
+    self.assertEqual( list( it_rst ), [ 2, 2, 6, 6, 6 ] ) # Bits in the order of RESETS: sr, lr, dawn
+    self.assertEqual( it_names.split('\n'), [ it['name'] for it in GOOD['data']['levels'][0]['items'] ] )
+    
+    # Left alone the second time
+    rep = savecheck.check( str(self.d), True )
+    self.assertEqual( rep.bin, 'up to date' )
+  
+  def test_no_bin_for_bad_savefile( self ):
+    def edit( data ):
+      data['xp'] = -1
+    rep = self.check( self.edited( edit ), write_bin=True )
+    self.assertEqual( rep.errors, [ ( 'data.xp', 'Invalid XP' ) ] )
+    self.assertIsNone( rep.bin )
+    self.assertFalse( ( self.d / 'stats.bin' ).exists() )
+
+if __name__ == '__main__':
+  unittest.main()